@@ -0,0 +1,113 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Benchmark converting DB-API results to Arrow in SupersetResultSet.
+
+Compares the legacy conversion (object structured array, per column type
+inference and `np.vectorize` stringification) with the type-directed conversion
+driven by `cursor.description`, on a mixed-type result set.
+
+Usage: SUPERSET_CONFIG=... python scripts/benchmark_result_set.py [rows] [cols]
+"""
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+from superset.app import create_app
+
+
+def generate_data(
+    num_rows: int, num_cols: int
+) -> Tuple[List[Tuple[Any, ...]], List[Tuple[str, str]]]:
+    generators: List[Tuple[str, Callable[[int], Any]]] = [
+        ("BIGINT", lambda i: i),
+        ("DOUBLE", lambda i: i * 0.5),
+        ("VARCHAR", lambda i: f"value_{i % 1000}"),
+        ("BOOLEAN", lambda i: i % 2 == 0),
+        ("TIMESTAMP", lambda i: datetime(2020, 1, 1) + timedelta(seconds=i)),
+        ("VARCHAR", lambda i: None if i % 10 == 0 else str(i)),
+        ("ARRAY", lambda i: [i, i + 1]),
+    ]
+    columns = [generators[i % len(generators)] for i in range(num_cols)]
+    cursor_description = [
+        (f"col_{i}", db_type) for i, (db_type, _) in enumerate(columns)
+    ]
+    data = [tuple(gen(row) for _, gen in columns) for row in range(num_rows)]
+    random.shuffle(data)
+    return data, cursor_description
+
+
+def legacy_conversion(
+    data: List[Tuple[Any, ...]], cursor_description: List[Tuple[str, str]]
+) -> pa.Table:
+    from superset.utils.core import json_iso_dttm_ser
+
+    vstringify = np.vectorize(lambda obj: json.dumps(obj, default=json_iso_dttm_ser))
+    column_names = [col[0] for col in cursor_description]
+    array = np.array(data, dtype=[(name, "object") for name in column_names])
+    pa_data = []
+    for column in column_names:
+        try:
+            pa_data.append(pa.array(array[column].tolist()))
+        except (pa.lib.ArrowInvalid, pa.lib.ArrowTypeError, TypeError):
+            pa_data.append(pa.array(vstringify(array[column]).tolist()))
+    for i, column in enumerate(column_names):
+        if pa.types.is_nested(pa_data[i].type):
+            pa_data[i] = pa.array(vstringify(array[column]).tolist())
+    return pa.Table.from_arrays(pa_data, names=column_names)
+
+
+def timeit(label: str, func: Callable[[], Any], repeat: int = 3) -> None:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    print(f"{label:<20} best of {repeat}: {min(timings):.3f}s")
+
+
+def main(num_rows: int = 100000, num_cols: int = 50) -> None:
+    from superset.db_engine_specs import BaseEngineSpec
+    from superset.result_set import SupersetResultSet
+
+    data, cursor_description = generate_data(num_rows, num_cols)
+    print(f"{num_rows} rows x {num_cols} columns")
+    timeit("legacy", lambda: legacy_conversion(data, cursor_description))
+    timeit(
+        "type-directed",
+        lambda: SupersetResultSet(
+            data, tuple(cursor_description), BaseEngineSpec
+        ).pa_table,
+    )
+    timeit(
+        "batched (10k rows)",
+        lambda: SupersetResultSet.from_batches(
+            (data[i : i + 10000] for i in range(0, len(data), 10000)),
+            tuple(cursor_description),
+            BaseEngineSpec,
+        ).pa_table,
+    )
+
+
+if __name__ == "__main__":
+    with create_app().app_context():
+        main(*[int(arg) for arg in sys.argv[1:3]])
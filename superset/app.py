@@ -135,6 +135,7 @@ class SupersetAppInitializer:
             SqlMetricInlineView,
             TableModelView,
             RowLevelSecurityFiltersModelView,
+            SqlaTableRollupModelView,
         )
         from superset.views.annotations import (
             AnnotationLayerModelView,
@@ -265,6 +266,15 @@ class SupersetAppInitializer:
                 category_label=__("Security"),
                 icon="fa-lock",
             )
+        if self.config["ENABLE_ROLLUP_TABLES"]:
+            appbuilder.add_view(
+                SqlaTableRollupModelView,
+                "Rollup Tables",
+                label=__("Rollup tables"),
+                category="Sources",
+                category_label=__("Sources"),
+                icon="fa-table",
+            )
 
         #
         # Setup views with no menu
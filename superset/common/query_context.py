@@ -14,10 +14,11 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import copy
 import logging
-import pickle as pkl
 from datetime import datetime, timedelta
-from typing import Any, ClassVar, Dict, List, Optional
+from functools import partial
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -25,14 +26,33 @@ import pandas as pd
 from superset import app, cache, db, security_manager
 from superset.connectors.base.models import BaseDatasource
 from superset.connectors.connector_registry import ConnectorRegistry
+from superset.dataframe import df_to_columnar
 from superset.stats_logger import BaseStatsLogger
 from superset.utils import core as utils
-from superset.utils.core import DTTM_ALIAS
+from superset.utils.cache import (
+    acquire_cache_lock,
+    CacheBatch,
+    cache_timeout_with_grace_period,
+    is_cache_value_stale,
+    release_cache_lock,
+    wait_for_cache_lock,
+    wait_for_cache_value,
+)
+from superset.utils.cache_codec import BaseCacheCodec
+from superset.utils.core import ChartDataResultFormat
+from superset.utils.incremental_refresh import (
+    can_refresh_incrementally,
+    get_cache_value_window,
+    get_incremental_windows,
+    get_window_time_range_endpoints,
+    merge_incremental_df,
+)
 
 from .query_object import QueryObject
 
 config = app.config
 stats_logger: BaseStatsLogger = config["STATS_LOGGER"]
+cache_codec: BaseCacheCodec = config["CHART_CACHE_CODEC"]
 logger = logging.getLogger(__name__)
 
 
@@ -49,6 +69,7 @@ class QueryContext:
     queries: List[QueryObject]
     force: bool
     custom_cache_timeout: Optional[int]
+    result_format: ChartDataResultFormat
 
     # TODO: Type datasource and query_object dictionary with TypedDict when it becomes
     # a vanilla python type https://github.com/python/mypy/issues/5288
@@ -58,13 +79,19 @@ class QueryContext:
         queries: List[Dict[str, Any]],
         force: bool = False,
         custom_cache_timeout: Optional[int] = None,
+        result_format: str = ChartDataResultFormat.RECORDS,
     ) -> None:
         self.datasource = ConnectorRegistry.get_datasource(
             str(datasource["type"]), int(datasource["id"]), db.session
         )
         self.queries = [QueryObject(**query_obj) for query_obj in queries]
         self.force = force
+        # kept to rebuild the queries when refreshing their cached data
+        self._datasource_dict = datasource
+        self._query_dicts = queries
         self.custom_cache_timeout = custom_cache_timeout
+        self.result_format = ChartDataResultFormat(result_format)
+        self.cache_batch = CacheBatch(cache, stats_logger)
 
     def get_query_result(self, query_object: QueryObject) -> Dict[str, Any]:
         """Returns a pandas dataframe based on the query object"""
@@ -73,33 +100,26 @@ class QueryContext:
         # is a valid assumption for current setting. In a long term, we may or maynot
         # support multiple queries from different data source.
 
-        timestamp_format = None
+        dttm_col = None
         if self.datasource.type == "table":
             dttm_col = self.datasource.get_column(query_object.granularity)
-            if dttm_col:
-                timestamp_format = dttm_col.python_date_format
 
         # The datasource here can be different backend but the interface is common
         result = self.datasource.query(query_object.to_dict())
 
         df = result.df
         # Transform the timestamp we received from database to pandas supported
-        # datetime format. If no python_date_format is specified, the pattern will
-        # be considered as the default ISO date format
-        # If the datetime format is unix, the parse will use the corresponding
-        # parsing logic
+        # datetime format, see `utils.normalize_dttm_col`
         if not df.empty:
-            if DTTM_ALIAS in df.columns:
-                if timestamp_format in ("epoch_s", "epoch_ms"):
-                    # Column has already been formatted as a timestamp.
-                    df[DTTM_ALIAS] = df[DTTM_ALIAS].apply(pd.Timestamp)
-                else:
-                    df[DTTM_ALIAS] = pd.to_datetime(
-                        df[DTTM_ALIAS], utc=False, format=timestamp_format
-                    )
-                if self.datasource.offset:
-                    df[DTTM_ALIAS] += timedelta(hours=self.datasource.offset)
-                df[DTTM_ALIAS] += query_object.time_shift
+            inferred_format = utils.normalize_dttm_col(
+                df,
+                timestamp_format=dttm_col.python_date_format if dttm_col else None,
+                offset=self.datasource.offset,
+                time_shift=query_object.time_shift,
+                inferred_format=dttm_col.inferred_date_format if dttm_col else None,
+            )
+            if dttm_col:
+                dttm_col.inferred_date_format = inferred_format
 
             if self.enforce_numerical_metrics:
                 self.df_metrics_to_num(df, query_object)
@@ -121,10 +141,9 @@ class QueryContext:
             if dtype.type == np.object_ and col in query_object.metrics:
                 df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    @staticmethod
-    def get_data(  # pylint: disable=invalid-name,no-self-use
-        df: pd.DataFrame
-    ) -> List[Dict]:
+    def get_data(self, df: pd.DataFrame) -> Union[List[Dict], Dict[str, Any]]:
+        if self.result_format == ChartDataResultFormat.COLUMNAR:
+            return df_to_columnar(df)
         return df.to_dict(orient="records")
 
     def get_single_payload(self, query_obj: QueryObject) -> Dict[str, Any]:
@@ -137,12 +156,27 @@ class QueryContext:
                 payload["error"] = "No data"
             else:
                 payload["data"] = self.get_data(df)
+                payload["result_format"] = self.result_format
         del payload["df"]
         return payload
 
     def get_payload(self) -> List[Dict[str, Any]]:
         """Get all the payloads from the arrays"""
-        return [self.get_single_payload(query_object) for query_object in self.queries]
+        self.datasource.load_query_relationships()
+        if cache and not self.force:
+            self.cache_batch.prefetch(
+                cache_key
+                for cache_key in map(self.cache_key, self.queries)
+                if cache_key
+            )
+        with self.cache_batch:
+            return utils.run_concurrently(
+                [
+                    partial(self.get_single_payload, query_obj)
+                    for query_obj in self.queries
+                ],
+                config["CHART_DATA_QUERY_CONCURRENCY"],
+            )
 
     @property
     def cache_timeout(self) -> int:
@@ -157,6 +191,110 @@ class QueryContext:
             return self.datasource.database.cache_timeout
         return config["CACHE_DEFAULT_TIMEOUT"]
 
+    @property
+    def stale_cache_timeout(self) -> int:
+        """The cache timeout, plus the grace period stale data is served for"""
+        return cache_timeout_with_grace_period(
+            self.cache_timeout, config["CHART_CACHE_STALE_GRACE_PERIOD"]
+        )
+
+    def is_incremental(self, query_obj: QueryObject) -> bool:
+        """Whether the cached data of the query is refreshed incrementally"""
+        return bool(
+            config["CHART_INCREMENTAL_REFRESH"]
+            and can_refresh_incrementally(self.datasource.type, query_obj.to_dict())
+        )
+
+    def get_incremental_result(
+        self,
+        query_obj: QueryObject,
+        cache_key: str,
+        cache_value: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Refresh cached data by only querying the time ranges that may have changed,
+        see `superset.utils.incremental_refresh`
+
+        :param query_obj: The query object
+        :param cache_key: The cache key of the query
+        :param cache_value: The expired cache value, read from the cache when
+            forcing a refresh if None
+        :return: The refreshed query result, or None if it can't be refreshed
+            incrementally
+        """
+        try:
+            if cache_value is None and self.force:
+                cache_binary = cache.get(cache_key)
+                cache_value = cache_codec.loads(cache_binary) if cache_binary else None
+            if not cache_value:
+                return None
+            windows = get_incremental_windows(
+                cache_value,
+                query_obj.from_dttm,
+                query_obj.to_dttm,
+                shift=timedelta(hours=self.datasource.offset or 0)
+                + (query_obj.time_shift or timedelta()),
+                overlap=timedelta(seconds=config["CHART_INCREMENTAL_REFRESH_OVERLAP"]),
+                row_limit=query_obj.row_limit,
+            )
+            if not windows:
+                return None
+
+            results = []
+            for window in filter(None, (windows.head, windows.tail)):
+                window_query_obj = copy.copy(query_obj)
+                window_query_obj.from_dttm, window_query_obj.to_dttm = window
+                window_query_obj.extras = dict(
+                    query_obj.extras,
+                    time_range_endpoints=get_window_time_range_endpoints(
+                        window,
+                        query_obj.to_dttm,
+                        query_obj.extras.get("time_range_endpoints"),
+                    ),
+                )
+                result = self.get_query_result(window_query_obj)
+                if result["status"] == utils.QueryStatus.FAILED:
+                    return None
+                results.append(result)
+
+            df = merge_incremental_df(
+                cache_value["df"], windows, [result["df"] for result in results]
+            )
+            if query_obj.row_limit and len(df.index) >= query_obj.row_limit:
+                return None
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Could not refresh cache key %s incrementally", cache_key)
+            logger.exception(e)
+            return None
+        stats_logger.incr("incremental_refresh")
+        return {
+            "query": ";\n\n".join(result["query"] for result in results),
+            "status": results[-1]["status"],
+            "error_message": None,
+            "df": df,
+        }
+
+    def refresh_stale_cache(self, query_obj: QueryObject, cache_key: str) -> None:
+        """Refresh stale cached data in the background, unless already refreshing"""
+        if not acquire_cache_lock(cache, cache_key, config["CHART_CACHE_LOCK_TIMEOUT"]):
+            return
+        from superset.tasks.cache import refresh_query_context_cache
+
+        query_context = {
+            "datasource": self._datasource_dict,
+            "queries": [self._query_dicts[self.queries.index(query_obj)]],
+            "custom_cache_timeout": self.custom_cache_timeout,
+        }
+        try:
+            refresh_query_context_cache.delay(
+                query_context, cache_key, utils.get_username()
+            )
+            stats_logger.incr("refresh_stale_cache_key")
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Could not refresh stale cache key %s", cache_key)
+            logger.exception(e)
+            release_cache_lock(cache, cache_key)
+
     def cache_key(self, query_obj: QueryObject, **kwargs) -> Optional[str]:
         extra_cache_keys = self.datasource.get_extra_cache_keys(query_obj.to_dict())
         cache_key = (
@@ -172,6 +310,47 @@ class QueryContext:
         )
         return cache_key
 
+    def load_cache_value(  # pylint: disable=too-many-arguments
+        self,
+        query_obj: QueryObject,
+        cache_key: str,
+        cache_binary: bytes,
+        cache_timeout: int,
+        incremental: bool,
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Load a value read from the cache, and refresh it if it's stale.
+
+        :return: The value to serve, and the expired value to refresh incrementally,
+            both None if the value couldn't be read
+        """
+        stats_logger.incr("loading_from_cache")
+        try:
+            cache_value = cache_codec.loads(cache_binary)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception(e)
+            logger.error("Error reading cache: %s", utils.error_msg_from_exception(e))
+            return None, None
+        if incremental and is_cache_value_stale(
+            cache_value["dttm"], self.stale_cache_timeout
+        ):
+            # expired, only kept to be refreshed incrementally
+            return None, cache_value
+        stats_logger.incr("loaded_from_cache")
+        try:
+            if not cache_codec.is_current(cache_binary):
+                # rewrite values cached in another format, e.g. pickled
+                stats_logger.incr("rewrite_cache_key")
+                self.cache_batch.set(
+                    cache_key, cache_codec.dumps(cache_value), timeout=cache_timeout
+                )
+            if is_cache_value_stale(cache_value["dttm"], self.cache_timeout):
+                self.refresh_stale_cache(query_obj, cache_key)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception(e)
+            logger.error("Error reading cache: %s", utils.error_msg_from_exception(e))
+        return cache_value, None
+
     def get_df_payload(  # pylint: disable=too-many-locals,too-many-statements
         self, query_obj: QueryObject, **kwargs
     ) -> Dict[str, Any]:
@@ -186,58 +365,110 @@ class QueryContext:
         status = None
         query = ""
         error_message = None
-        if cache_key and cache and not self.force:
-            cache_value = cache.get(cache_key)
-            if cache_value:
-                stats_logger.incr("loading_from_cache")
-                try:
-                    cache_value = pkl.loads(cache_value)
+        is_locked = False
+        incremental = self.is_incremental(query_obj)
+        cache_timeout = self.stale_cache_timeout
+        if incremental:
+            # keep expired data as the base of incremental refreshes
+            cache_timeout = cache_timeout_with_grace_period(
+                cache_timeout, config["CHART_INCREMENTAL_REFRESH_RETENTION"]
+            )
+        base_value = None
+        try:
+            if cache_key and cache and not self.force:
+                cache_value = self.cache_batch.get(cache_key)
+                if not cache_value and config["CHART_CACHE_LOCK_WAIT"]:
+                    is_locked = acquire_cache_lock(
+                        cache, cache_key, config["CHART_CACHE_LOCK_TIMEOUT"]
+                    )
+                    if not is_locked:
+                        # another request is running the same query, wait for it
+                        stats_logger.incr("waiting_for_cache_lock")
+                        cache_value = wait_for_cache_value(
+                            cache, cache_key, config["CHART_CACHE_LOCK_WAIT"]
+                        )
+                if cache_value:
+                    cache_value, base_value = self.load_cache_value(
+                        query_obj, cache_key, cache_value, cache_timeout, incremental
+                    )
+                if base_value and not is_locked and config["CHART_CACHE_LOCK_WAIT"]:
+                    # expired values are refreshed incrementally by a single
+                    # request too, the others wait for the refreshed value
+                    is_locked = acquire_cache_lock(
+                        cache, cache_key, config["CHART_CACHE_LOCK_TIMEOUT"]
+                    )
+                    if not is_locked:
+                        stats_logger.incr("waiting_for_cache_lock")
+                        cache_value = wait_for_cache_lock(
+                            cache, cache_key, config["CHART_CACHE_LOCK_WAIT"]
+                        )
+                        if cache_value:
+                            cache_value, base_value = self.load_cache_value(
+                                query_obj,
+                                cache_key,
+                                cache_value,
+                                cache_timeout,
+                                incremental,
+                            )
+                if cache_value:
                     df = cache_value["df"]
                     query = cache_value["query"]
                     status = utils.QueryStatus.SUCCESS
                     is_loaded = True
-                    stats_logger.incr("loaded_from_cache")
+                    logger.info("Serving from cache")
+
+            if query_obj and not is_loaded:
+                try:
+                    query_result = None
+                    if incremental and cache_key and cache:
+                        query_result = self.get_incremental_result(
+                            query_obj, cache_key, base_value
+                        )
+                    if query_result is None:
+                        query_result = self.get_query_result(query_obj)
+                    status = query_result["status"]
+                    query = query_result["query"]
+                    error_message = query_result["error_message"]
+                    df = query_result["df"]
+                    if status != utils.QueryStatus.FAILED:
+                        stats_logger.incr("loaded_from_source")
+                        is_loaded = True
                 except Exception as e:  # pylint: disable=broad-except
                     logger.exception(e)
-                    logger.error(
-                        "Error reading cache: %s", utils.error_msg_from_exception(e)
-                    )
-                logger.info("Serving from cache")
-
-        if query_obj and not is_loaded:
-            try:
-                query_result = self.get_query_result(query_obj)
-                status = query_result["status"]
-                query = query_result["query"]
-                error_message = query_result["error_message"]
-                df = query_result["df"]
-                if status != utils.QueryStatus.FAILED:
-                    stats_logger.incr("loaded_from_source")
-                    is_loaded = True
-            except Exception as e:  # pylint: disable=broad-except
-                logger.exception(e)
-                if not error_message:
-                    error_message = "{}".format(e)
-                status = utils.QueryStatus.FAILED
-                stacktrace = utils.get_stacktrace()
-
-            if is_loaded and cache_key and cache and status != utils.QueryStatus.FAILED:
-                try:
-                    cache_value = dict(dttm=cached_dttm, df=df, query=query)
-                    cache_binary = pkl.dumps(cache_value, protocol=pkl.HIGHEST_PROTOCOL)
+                    if not error_message:
+                        error_message = "{}".format(e)
+                    status = utils.QueryStatus.FAILED
+                    stacktrace = utils.get_stacktrace()
 
-                    logger.info(
-                        "Caching %d chars at key %s", len(cache_binary), cache_key
-                    )
+                if (
+                    is_loaded
+                    and cache_key
+                    and cache
+                    and status != utils.QueryStatus.FAILED
+                ):
+                    try:
+                        cache_value = dict(dttm=cached_dttm, df=df, query=query)
+                        if incremental:
+                            cache_value.update(
+                                get_cache_value_window(query_obj.to_dict())
+                            )
+                        cache_binary = cache_codec.dumps(cache_value)
 
-                    stats_logger.incr("set_cache_key")
-                    cache.set(cache_key, cache_binary, timeout=self.cache_timeout)
-                except Exception as e:  # pylint: disable=broad-except
-                    # cache.set call can fail if the backend is down or if
-                    # the key is too large or whatever other reasons
-                    logger.warning("Could not cache key %s", cache_key)
-                    logger.exception(e)
-                    cache.delete(cache_key)
+                        logger.info(
+                            "Caching %d chars at key %s", len(cache_binary), cache_key
+                        )
+
+                        stats_logger.incr("set_cache_key")
+                        cache.set(cache_key, cache_binary, timeout=cache_timeout)
+                    except Exception as e:  # pylint: disable=broad-except
+                        # cache.set call can fail if the backend is down or if
+                        # the key is too large or whatever other reasons
+                        logger.warning("Could not cache key %s", cache_key)
+                        logger.exception(e)
+                        cache.delete(cache_key)
+        finally:
+            if is_locked:
+                release_cache_lock(cache, cache_key)
         return {
             "cache_key": cache_key,
             "cached_dttm": cache_value["dttm"] if cache_value is not None else None,
@@ -36,6 +36,7 @@ from flask_appbuilder.security.manager import AUTH_DB
 
 from superset.stats_logger import DummyStatsLogger
 from superset.typing import CacheConfig
+from superset.utils.cache_codec import ArrowCacheCodec, BaseCacheCodec
 from superset.utils.log import DBEventLogger
 from superset.utils.logging_configurator import DefaultLoggingConfigurator
 
@@ -320,6 +321,57 @@ IMG_UPLOAD_URL = "/static/uploads/"
 
 CACHE_DEFAULT_TIMEOUT = 60 * 60 * 24
 CACHE_CONFIG: CacheConfig = {"CACHE_TYPE": "null"}
+# Serializes the results of chart queries stored in the CACHE_CONFIG cache.
+# ArrowCacheCodec stores DataFrames as compressed Arrow, PickleCacheCodec pickles
+# them. Values written by the other codec are still read, and rewritten.
+CHART_CACHE_CODEC: BaseCacheCodec = ArrowCacheCodec(compression="lz4")
+# Concurrent requests missing the chart data cache on the same key run a single
+# query: the first one takes a lock in the cache, the others wait up to
+# CHART_CACHE_LOCK_WAIT seconds for its result before running the query
+# themselves. The lock expires after CHART_CACHE_LOCK_TIMEOUT seconds should the
+# request holding it die. Set CHART_CACHE_LOCK_WAIT to 0 to disable.
+CHART_CACHE_LOCK_WAIT = 30
+CHART_CACHE_LOCK_TIMEOUT = SUPERSET_WEBSERVER_TIMEOUT
+# Seconds chart data is kept in the cache past its cache timeout. During this
+# grace period the stale data is served right away, and refreshed in the
+# background by a Celery task. Set to 0 to expire chart data at its timeout.
+CHART_CACHE_STALE_GRACE_PERIOD = 0
+# Refresh the cached data of time series charts incrementally: once expired, the
+# data is kept for CHART_INCREMENTAL_REFRESH_RETENTION more seconds, and only the
+# time buckets from the last cached one on are queried again, merged with the
+# cached ones. The buckets within CHART_INCREMENTAL_REFRESH_OVERLAP seconds of the
+# last one are queried again too, for data arriving late. Only applies to tables.
+CHART_INCREMENTAL_REFRESH = False
+CHART_INCREMENTAL_REFRESH_OVERLAP = 60 * 60
+CHART_INCREMENTAL_REFRESH_RETENTION = 60 * 60 * 24
+# Compute the rolling windows, cumulative sums and contributions of time series
+# charts in the database with window functions, instead of in pandas, when the
+# database engine supports them and the results are the same.
+CHART_POST_PROCESSING_PUSHDOWN = False
+
+# Seconds the latest partitions of Presto and Hive tables, looked up by the
+# `latest_partition` template macros and table previews, are cached for in the
+# CACHE_CONFIG cache, e.g. 60 * 10. Cached partitions older than
+# LATEST_PARTITION_CACHE_REFRESH seconds are served while being refreshed in the
+# background, and refreshing the metadata of a table invalidates them.
+LATEST_PARTITION_CACHE_TIMEOUT = 0
+LATEST_PARTITION_CACHE_REFRESH = 60
+
+# Maximum number of SQLAlchemy engines kept per process, one per database, schema,
+# impersonated user and query source. The least recently used engines are
+# disposed of, closing their pooled connections, and so are engines older than
+# the timeout in seconds if set.
+SQLALCHEMY_ENGINE_CACHE_SIZE = 100
+SQLALCHEMY_ENGINE_CACHE_TIMEOUT: Optional[int] = None
+
+# Maximum number of sibling queries of a chart run concurrently, e.g. the time
+# comparison queries of line charts, the queries of each filter of filter boxes,
+# or the queries of a query context. Set to 1 to run them one after the other.
+CHART_DATA_QUERY_CONCURRENCY = 4
+
+# Maximum number of charts whose data is loaded concurrently when the charts of a
+# dashboard are requested at once, see the `dashboard_chart_data` endpoint.
+DASHBOARD_CHART_DATA_CONCURRENCY = 8
 TABLE_NAMES_CACHE_CONFIG: CacheConfig = {"CACHE_TYPE": "null"}
 
 # CORS Options
@@ -437,6 +489,21 @@ MAPBOX_API_KEY = os.environ.get("MAPBOX_API_KEY", "")
 # in the results backend. This also becomes the limit when exporting CSVs
 SQL_MAX_ROW = 100000
 
+# When set, SQL Lab fetches query results from the cursor in batches of this
+# many rows and converts each batch to Arrow as it goes, instead of pulling the
+# whole result into memory as Python objects first. This keeps the peak memory of
+# workers close to one batch plus the final columnar result.
+SQLLAB_FETCH_BATCH_SIZE: Optional[int] = None
+
+# When enabled, the cursors of the queries run asynchronously on Presto and Hive
+# are polled by a single thread per worker process, instead of by the thread
+# running each query. Each round of polls reads the status of all the running
+# queries with one query to the metadata database, and writes their progress in
+# one batch, instead of loading and committing every query row on every poll.
+# This pays off with Celery pools of threads or greenlets running many queries
+# per process.
+SQLLAB_MULTIPLEXED_POLLING = False
+
 # Maximum number of rows displayed in SQL Lab UI
 # Is set to avoid out of memory/localstorage issues in browsers. Does not affect
 # exported CSVs
@@ -535,6 +602,16 @@ RESULTS_BACKEND = None
 # in order to disable should breaking issues be discovered.
 RESULTS_BACKEND_USE_MSGPACK = True
 
+# Compression codec applied to the Arrow data of results stored when
+# RESULTS_BACKEND_USE_MSGPACK is enabled. One of "lz4", "zstd", "snappy", "gzip",
+# "brotli" or None to store the data uncompressed.
+RESULTS_BACKEND_COMPRESSION: Optional[str] = "lz4"
+
+# Number of rows in each independently compressed batch of stored results. Pages
+# of results requested through the `offset`/`limit` arguments of
+# /superset/results/<key>/ only decompress the batches they span.
+RESULTS_BACKEND_BATCH_SIZE = 10000
+
 # The S3 bucket where you want to store your external hive tables created
 # from CSV files. For example, 'companyname-superset'
 CSV_TO_HIVE_UPLOAD_S3_BUCKET = None
@@ -744,6 +821,17 @@ TALISMAN_CONFIG = {
 # tables that users do not have access to.
 ENABLE_ROW_LEVEL_SECURITY = True
 
+# Seconds the permissions and row level security filters resolved for a user are
+# cached for in the CACHE_CONFIG cache, on top of being cached for the duration of
+# each request. Changes to roles, permissions and filters made through Superset
+# invalidate the cache right away. Set to 0 to only cache them per request.
+SECURITY_CACHE_TIMEOUT = 60
+
+# Route the queries of tables to the smallest of their rollups able to answer
+# them: pre-aggregated tables with a subset of the dimensions of the table, and
+# metrics that can be re-aggregated. Also adds the menu to register them.
+ENABLE_ROLLUP_TABLES = False
+
 #
 # Flask session cookie options
 #
@@ -255,6 +255,13 @@ class BaseDatasource(
         understand what is taking place behind the scene"""
         raise NotImplementedError()
 
+    def load_query_relationships(self) -> None:
+        """Load the lazy relationships used when querying the datasource
+
+        Queries of the datasource can then run in other threads without lazily
+        loading them through the datasource's session, which isn't thread safe"""
+        _ = (list(self.columns), list(self.metrics))
+
     def query(self, query_obj) -> QueryResult:
         """Executes the query and returns a dataframe
 
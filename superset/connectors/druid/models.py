@@ -988,6 +988,10 @@ class DruidDatasource(Model, BaseDatasource):
         df = client.export_pandas()
         return df[column_name].to_list()
 
+    def load_query_relationships(self) -> None:
+        super().load_query_relationships()
+        _ = self.cluster
+
     def get_query_str(self, query_obj, phase=1, client=None):
         return self.run_query(client=client, phase=phase, **query_obj)
 
@@ -15,6 +15,7 @@
 # specific language governing permissions and limitations
 # under the License.
 # pylint: disable=C,R,W
+import json
 import logging
 import re
 from collections import OrderedDict
@@ -30,12 +31,16 @@ from flask_babel import lazy_gettext as _
 from sqlalchemy import (
     and_,
     asc,
+    BigInteger,
     Boolean,
+    case,
     Column,
     DateTime,
     desc,
     ForeignKey,
+    func,
     Integer,
+    null,
     or_,
     select,
     String,
@@ -44,6 +49,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.exc import CompileError
 from sqlalchemy.orm import backref, Query, relationship, RelationshipProperty, Session
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.schema import UniqueConstraint
 from sqlalchemy.sql import column, ColumnElement, literal_column, table, text
@@ -54,7 +60,7 @@ from superset.connectors.base.models import BaseColumn, BaseDatasource, BaseMetr
 from superset.constants import NULL_STRING
 from superset.db_engine_specs.base import TimestampExpression
 from superset.exceptions import DatabaseNotFound
-from superset.jinja_context import get_template_processor
+from superset.jinja_context import BaseTemplateProcessor, get_template_processor
 from superset.models.annotations import Annotation
 from superset.models.core import Database
 from superset.models.helpers import AuditMixinNullable, QueryResult
@@ -145,6 +151,16 @@ class TableColumn(Model, BaseColumn):
     update_from_object_fields = [s for s in export_fields if s not in ("table_id",)]
     export_parent = "table"
 
+    @property
+    def inferred_date_format(self) -> Optional[str]:
+        """The date format inferred from the values of the column, if any"""
+        return getattr(self, "_inferred_date_format", None)
+
+    @inferred_date_format.setter
+    def inferred_date_format(self, value: Optional[str]) -> None:
+        # not persisted, only reused by the queries of the same instance
+        self._inferred_date_format = value
+
     def get_sqla_col(self, label: Optional[str] = None) -> Column:
         label = label or self.column_name
         if self.expression:
@@ -588,6 +604,52 @@ class SqlaTable(Model, BaseDatasource):
     def get_template_processor(self, **kwargs):
         return get_template_processor(table=self, database=self.database, **kwargs)
 
+    def get_query_template_processor(
+        self, query_obj: Dict[str, Any], extra_cache_keys: List[Any]
+    ) -> BaseTemplateProcessor:
+        """
+        Return the template processor of the templates of a query, whose renderings
+        are memoized for the request.
+
+        :param query_obj: The query, the template context includes its time range,
+            groupby, metrics, row limit and filters
+        :param extra_cache_keys: The list the calls to `cache_key_wrapper` add to
+        :returns: The template processor
+        """
+        template_kwargs = {
+            "from_dttm": query_obj.get("from_dttm"),
+            "groupby": query_obj.get("groupby"),
+            "metrics": query_obj.get("metrics"),
+            "row_limit": query_obj.get("row_limit"),
+            "to_dttm": query_obj.get("to_dttm"),
+            "filter": query_obj.get("filter"),
+            "columns": {col.column_name: col for col in self.columns},
+        }
+        template_kwargs.update(self.template_params_dict)
+        context = {
+            key: value for key, value in template_kwargs.items() if key != "columns"
+        }
+        render_cache_key: Optional[str] = None
+        try:
+            context_json = json.dumps(
+                context, default=utils.json_iso_dttm_ser, sort_keys=True
+            )
+            render_cache_key = f"{self.uid}/{self.full_name}/{context_json}"
+        except (TypeError, ValueError):
+            pass
+        template_kwargs["extra_cache_keys"] = extra_cache_keys
+        return self.get_template_processor(
+            render_cache_key=render_cache_key, **template_kwargs
+        )
+
+    def load_query_relationships(self) -> None:
+        super().load_query_relationships()
+        _ = self.database
+        if config["ENABLE_ROLLUP_TABLES"] and self.id:
+            # queries can be routed to rollups, see `get_rollup`
+            for rollup in self.rollups:
+                _ = rollup.table
+
     def get_query_str_extended(self, query_obj: Dict[str, Any]) -> QueryStringExtended:
         sqlaq = self.get_sqla_query(**query_obj)
         sql = self.database.compile_sqla_query(sqlaq.sqla_query)
@@ -599,6 +661,11 @@ class SqlaTable(Model, BaseDatasource):
         )
 
     def get_query_str(self, query_obj: Dict[str, Any]) -> str:
+        rollup = self.get_rollup(query_obj)
+        if rollup:
+            return rollup.query_comment + rollup.get_table().get_query_str(
+                rollup.get_query_obj(query_obj)
+            )
         query_str_ext = self.get_query_str_extended(query_obj)
         all_queries = query_str_ext.prequeries + [query_str_ext.sql]
         return ";\n\n".join(all_queries) + ";"
@@ -679,19 +746,18 @@ class SqlaTable(Model, BaseDatasource):
         order_desc=True,
     ) -> SqlaQuery:
         """Querying any sqla table from this common interface"""
-        template_kwargs = {
+        query_obj = {
             "from_dttm": from_dttm,
             "groupby": groupby,
             "metrics": metrics,
             "row_limit": row_limit,
             "to_dttm": to_dttm,
             "filter": filter,
-            "columns": {col.column_name: col for col in self.columns},
         }
-        template_kwargs.update(self.template_params_dict)
         extra_cache_keys: List[Any] = []
-        template_kwargs["extra_cache_keys"] = extra_cache_keys
-        template_processor = self.get_template_processor(**template_kwargs)
+        template_processor = self.get_query_template_processor(
+            query_obj, extra_cache_keys
+        )
         db_engine_spec = self.database.db_engine_spec
         prequeries: List[str] = []
 
@@ -959,13 +1025,110 @@ class SqlaTable(Model, BaseDatasource):
                     result.df, dimensions, groupby_exprs_sans_timestamp
                 )
                 qry = qry.where(top_groups)
+        qry = qry.select_from(tbl)
+
+        post_processing = extras.get("post_processing") if extras else None
+        if (
+            post_processing
+            and is_timeseries
+            and granularity
+            and metrics_exprs
+            and db_engine_spec.allows_window_functions
+        ):
+            if not row_limit:
+                # only kept in subqueries limiting the rows
+                qry = qry.order_by(None)
+            qry = self.get_post_processing_query(
+                qry,
+                metrics_exprs,
+                timestamp,
+                list(groupby_exprs_sans_timestamp.values()),
+                post_processing,
+            )
         return SqlaQuery(
             extra_cache_keys=extra_cache_keys,
             labels_expected=labels_expected,
-            sqla_query=qry.select_from(tbl),
+            sqla_query=qry,
             prequeries=prequeries,
         )
 
+    def get_post_processing_query(  # pylint: disable=too-many-locals
+        self,
+        qry: Select,
+        metrics_exprs: List[ColumnElement],
+        timestamp: ColumnElement,
+        groupby_exprs: List[ColumnElement],
+        post_processing: Dict[str, Any],
+    ) -> Select:
+        """
+        Compute the rolling window, cumulative sum or contribution of the metrics of
+        a time series query with window functions, as done in pandas by
+        `NVD3TimeSeriesViz.process_data` otherwise. The windows are computed in an
+        outer query, over the rows the query returns once ordered and limited, as
+        pandas does.
+
+        :param qry: The time series query
+        :param metrics_exprs: The metrics of the query
+        :param timestamp: The time bucket of the query
+        :param groupby_exprs: The dimensions of the query, besides the time bucket
+        :param post_processing: The `rolling_type`, `rolling_periods`,
+            `min_periods` and `contribution` options of the chart
+        :return: The query selecting the same columns, with the metrics replaced
+            with their post processed values
+        """
+        subq = qry.alias("time_series")
+        metrics_by_name = {expr.name: expr for expr in metrics_exprs}
+        rolling_type = post_processing.get("rolling_type")
+        rolling_periods = int(post_processing.get("rolling_periods") or 0)
+        min_periods = int(post_processing.get("min_periods") or 0)
+        partition_by = [subq.c[expr.name] for expr in groupby_exprs] or None
+        order_by = subq.c[timestamp.name]
+
+        total = None
+        if post_processing.get("contribution"):
+            # the share of each value in the sum of all the values of its time bucket
+            total = func.nullif(
+                func.sum(
+                    sum(func.coalesce(subq.c[name], 0) for name in metrics_by_name)
+                ).over(partition_by=order_by),
+                0,
+            )
+
+        select_exprs = []
+        for col in subq.c:
+            if col.name not in metrics_by_name:
+                select_exprs.append(col)
+                continue
+            expr = col
+            if rolling_type in ("mean", "sum") and rolling_periods:
+                window = dict(
+                    partition_by=partition_by,
+                    order_by=order_by,
+                    rows=(1 - rolling_periods, 0),
+                )
+                aggregate = func.avg if rolling_type == "mean" else func.sum
+                rolled = aggregate(col).over(**window)
+                if min_periods:
+                    rolled = case(
+                        [(func.count(col).over(**window) >= min_periods, rolled)],
+                        else_=null(),
+                    )
+                expr = rolled
+            elif rolling_type == "cumsum":
+                rolled = func.sum(col).over(
+                    partition_by=partition_by, order_by=order_by, rows=(None, 0)
+                )
+                # pandas leaves missing values missing
+                expr = case([(col.is_(None), null())], else_=rolled)
+            elif total is not None:
+                expr = col * literal_column("1.0") / total
+            select_exprs.append(
+                self.make_sqla_column_compatible(
+                    expr, metrics_by_name[col.name]._df_label_expected
+                )
+            )
+        return select(select_exprs)
+
     def _get_timeseries_orderby(self, timeseries_limit_metric, metrics_dict, cols):
         if utils.is_adhoc_metric(timeseries_limit_metric):
             ob = self.adhoc_metric_to_sqla(timeseries_limit_metric, cols)
@@ -991,7 +1154,33 @@ class SqlaTable(Model, BaseDatasource):
 
         return or_(*groups)
 
+    def get_rollup(self, query_obj: Dict[str, Any]) -> Optional["SqlaTableRollup"]:
+        """
+        The smallest rollup of the table able to answer a query, if any
+
+        :param query_obj: The query of the table
+        :return: The rollup with the fewest rows that can answer the query
+        """
+        if not config["ENABLE_ROLLUP_TABLES"] or not self.id or not self.rollups:
+            return None
+        # row level security filters refer to columns rollups may not have
+        if security_manager.get_rls_filters(self):
+            return None
+        rollups = [rollup for rollup in self.rollups if rollup.can_answer(query_obj)]
+        if not rollups:
+            return None
+        return min(
+            rollups,
+            key=lambda rollup: (rollup.row_count is None, rollup.row_count or 0),
+        )
+
     def query(self, query_obj: Dict[str, Any]) -> QueryResult:
+        rollup = self.get_rollup(query_obj)
+        if rollup:
+            result = rollup.get_table().query(rollup.get_query_obj(query_obj))
+            result.query = rollup.query_comment + result.query
+            return result
+
         qry_start_dttm = datetime.now()
         query_str_ext = self.get_query_str_extended(query_obj)
         sql = query_str_ext.sql
@@ -1055,6 +1244,9 @@ class SqlaTable(Model, BaseDatasource):
         metrics = []
         any_date_col = None
         db_engine_spec = self.database.db_engine_spec
+        db_engine_spec.invalidate_latest_partition(
+            self.table_name, self.schema, self.database
+        )
         db_dialect = self.database.get_dialect()
         dbcols = (
             db.session.query(TableColumn)
@@ -1195,8 +1387,31 @@ class SqlaTable(Model, BaseDatasource):
         """
         extra_cache_keys = super().get_extra_cache_keys(query_obj)
         if self.has_calls_to_cache_key_wrapper(query_obj):
-            sqla_query = self.get_sqla_query(**query_obj)
-            extra_cache_keys += sqla_query.extra_cache_keys
+            extra_cache_keys += self.get_template_extra_cache_keys(query_obj)
+        return extra_cache_keys
+
+    def get_template_extra_cache_keys(self, query_obj: Dict[str, Any]) -> List[Any]:
+        """
+        The keys added by the calls to `cache_key_wrapper` in the templates of a
+        query, in the order `get_sqla_query` renders them. Only the templates calling
+        it are rendered, and their renderings are reused to run the query.
+
+        :param query_obj: query object to analyze
+        :return: The keys added by the templates
+        """
+        extra_cache_keys: List[Any] = []
+        template_processor = self.get_query_template_processor(
+            query_obj, extra_cache_keys
+        )
+        extras = query_obj.get("extras") or {}
+        templates = (
+            [self.sql]
+            + [f.clause for f in security_manager.get_rls_filters(self)]
+            + [extras.get("where"), extras.get("having")]
+        )
+        for template in templates:
+            if template and "cache_key_wrapper" in template:
+                template_processor.process_template(template)
         return extra_cache_keys
 
 
@@ -1229,3 +1444,248 @@ class RowLevelSecurityFilter(Model, AuditMixinNullable):
     table_id = Column(Integer, ForeignKey("tables.id"), nullable=False)
     table = relationship(SqlaTable, backref="row_level_security_filters")
     clause = Column(Text, nullable=False)
+
+
+for identifier in ("after_insert", "after_update", "after_delete"):
+    sa.event.listen(
+        RowLevelSecurityFilter, identifier, security_manager.on_security_model_change
+    )
+
+
+# the unit of time the buckets of each time grain are a whole number of, from
+# seconds to years: buckets can be computed from those of a finer or equal unit
+TIME_GRAIN_UNITS: Dict[Optional[str], int] = {
+    "PT1S": 0,
+    "PT1M": 1,
+    "PT5M": 1,
+    "PT10M": 1,
+    "PT15M": 1,
+    "PT0.5H": 1,
+    "PT1H": 2,
+    "P1D": 3,
+    "P1W": 3,
+    "1969-12-28T00:00:00Z/P1W": 3,
+    "1969-12-29T00:00:00Z/P1W": 3,
+    "P1W/1970-01-03T00:00:00Z": 3,
+    "P1W/1970-01-04T00:00:00Z": 3,
+    "P1M": 4,
+    "P0.25Y": 4,
+    "P1Y": 5,
+}
+# the time grains rollups can be aggregated at, one bucket per unit
+ROLLUP_TIME_GRAINS = ("PT1S", "PT1M", "PT1H", "P1D", "P1M", "P1Y")
+
+
+def is_time_grain_aligned(dttm: datetime, unit: int) -> bool:
+    """Whether a datetime is the start of a bucket of a unit of TIME_GRAIN_UNITS"""
+    fields = [
+        dttm.microsecond,
+        dttm.second,
+        dttm.minute,
+        dttm.hour,
+        dttm.day - 1,
+        dttm.month - 1,
+    ]
+    return not any(fields[: unit + 1])
+
+
+def get_rollup_metric_key(metric: Union[str, Dict]) -> Optional[str]:
+    """
+    The key of a metric in the metrics of rollups: the name of saved metrics, or
+    "AGGREGATE(column)" for simple adhoc metrics
+    """
+    if isinstance(metric, str):
+        return metric
+    if (
+        utils.is_adhoc_metric(metric)
+        and metric.get("expressionType")
+        == utils.ADHOC_METRIC_EXPRESSION_TYPES["SIMPLE"]
+    ):
+        column_name = (metric.get("column") or {}).get("column_name")
+        return f"{metric['aggregate']}({column_name})"
+    return None
+
+
+class SqlaTableRollup(Model, AuditMixinNullable):
+    """
+    A pre-aggregated rollup of a table, which the queries of the table are routed
+    to when it can answer them.
+
+    The rollup table has a column for each of its dimensions, named after the
+    columns of the table, and the timestamps of `time_column` truncated to
+    `time_grain`. Its metrics map the metrics of the table, see
+    `get_rollup_metric_key`, to the SQL expressions re-aggregating them, e.g.
+    `{"count": "SUM(cnt)", "MAX(num)": "MAX(max_num)"}`. Metrics that can't be
+    re-aggregated, such as distinct counts, can't be answered by rollups.
+    """
+
+    __tablename__ = "table_rollups"
+    id = Column(Integer, primary_key=True)  # pylint: disable=invalid-name
+    table_id = Column(Integer, ForeignKey("tables.id"), nullable=False)
+    table = relationship(
+        SqlaTable, backref=backref("rollups", cascade="all, delete-orphan")
+    )
+    rollup_table_name = Column(String(250), nullable=False)
+    schema = Column(String(255))
+    time_column = Column(String(255))
+    time_grain = Column(String(255))
+    dimensions = Column(Text, default="[]")
+    metrics = Column(Text, default="{}")
+    row_count = Column(BigInteger)
+
+    def __repr__(self) -> str:
+        return self.full_name
+
+    @property
+    def full_name(self) -> str:
+        if self.schema:
+            return f"{self.schema}.{self.rollup_table_name}"
+        return self.rollup_table_name
+
+    @property
+    def query_comment(self) -> str:
+        """Comment prepended to the queries routed to the rollup"""
+        return f"-- Rollup: {self.full_name}\n"
+
+    @property
+    def dimension_names(self) -> List[str]:
+        try:
+            return json.loads(self.dimensions or "[]")
+        except ValueError:
+            return []
+
+    @property
+    def metric_expressions(self) -> Dict[str, str]:
+        try:
+            return json.loads(self.metrics or "{}")
+        except ValueError:
+            return {}
+
+    def _can_answer_time(self, query_obj: Dict[str, Any]) -> bool:
+        table = self.table
+        extras = query_obj.get("extras") or {}
+        granularity = query_obj.get("granularity")
+        if granularity not in table.dttm_cols:
+            granularity = table.main_dttm_col
+        bounds = [
+            query_obj.get(key)
+            for key in ("from_dttm", "to_dttm", "inner_from_dttm", "inner_to_dttm")
+        ]
+        is_timeseries = query_obj.get("is_timeseries", True)
+        if not granularity or not (is_timeseries or any(bounds)):
+            return True
+        if (
+            granularity != self.time_column
+            or self.time_grain not in ROLLUP_TIME_GRAINS
+            or (
+                table.database.db_engine_spec.time_secondary_columns
+                and table.main_dttm_col != granularity
+            )
+        ):
+            return False
+        unit = TIME_GRAIN_UNITS[self.time_grain]
+        time_grain = extras.get("time_grain_sqla")
+        if is_timeseries and TIME_GRAIN_UNITS.get(time_grain, -1) < unit:
+            return False
+        # buckets are filtered on their start, which only matches the filter of the
+        # rows of the table for [start, end) ranges aligned with them
+        time_range_endpoints = extras.get("time_range_endpoints")
+        if any(bounds[1::2]) and (
+            not time_range_endpoints
+            or time_range_endpoints[1] != utils.TimeRangeEndpoint.EXCLUSIVE
+        ):
+            return False
+        return all(is_time_grain_aligned(dttm, unit) for dttm in bounds if dttm)
+
+    def can_answer(self, query_obj: Dict[str, Any]) -> bool:
+        """Whether the rollup can answer a query of its table"""
+        extras = query_obj.get("extras") or {}
+        if query_obj.get("columns") or extras.get("where") or extras.get("having"):
+            return False
+        dimensions = set(self.dimension_names)
+        metrics = self.metric_expressions
+        groupby = query_obj.get("groupby") or []
+        filter_cols = [
+            flt["col"]
+            for flt in query_obj.get("filter") or []
+            if flt.get("col") and flt.get("op")
+        ]
+        if not dimensions.issuperset(groupby + filter_cols):
+            return False
+        orderby = [col for col, _ in query_obj.get("orderby") or []]
+        if query_obj.get("timeseries_limit_metric"):
+            orderby.append(query_obj["timeseries_limit_metric"])
+        for metric in query_obj.get("metrics") or []:
+            if get_rollup_metric_key(metric) not in metrics:
+                return False
+        for col in orderby:
+            if isinstance(col, str) and col in dimensions:
+                continue
+            if get_rollup_metric_key(col) not in metrics:
+                return False
+        return self._can_answer_time(query_obj)
+
+    def _get_metric(self, metric: Union[str, Dict]) -> Union[str, Dict]:
+        if not utils.is_adhoc_metric(metric):
+            return metric
+        return {
+            "expressionType": utils.ADHOC_METRIC_EXPRESSION_TYPES["SQL"],
+            "sqlExpression": self.metric_expressions[get_rollup_metric_key(metric)],
+            "label": utils.get_metric_name(metric),
+        }
+
+    def get_query_obj(self, query_obj: Dict[str, Any]) -> Dict[str, Any]:
+        """The query of the rollup answering a query of its table"""
+        query_obj = dict(query_obj)
+        query_obj["metrics"] = [
+            self._get_metric(metric) for metric in query_obj.get("metrics") or []
+        ]
+        query_obj["orderby"] = [
+            (self._get_metric(col), ascending)
+            for col, ascending in query_obj.get("orderby") or []
+        ]
+        if query_obj.get("timeseries_limit_metric"):
+            query_obj["timeseries_limit_metric"] = self._get_metric(
+                query_obj["timeseries_limit_metric"]
+            )
+        if query_obj.get("granularity"):
+            query_obj["granularity"] = self.time_column
+        return query_obj
+
+    def get_table(self) -> SqlaTable:
+        """
+        A table querying the rollup table, with its dimensions and metrics, which
+        is never added to the session
+        """
+        table_columns = {col.column_name: col for col in self.table.columns}
+        column_names = self.dimension_names
+        if self.time_column:
+            column_names = column_names + [self.time_column]
+        columns = []
+        for column_name in column_names:
+            table_column = table_columns.get(column_name)
+            columns.append(
+                TableColumn(
+                    column_name=column_name,
+                    type=table_column.type if table_column else None,
+                    is_dttm=column_name == self.time_column,
+                    python_date_format=table_column.python_date_format
+                    if table_column
+                    else None,
+                )
+            )
+        metrics = [
+            SqlMetric(metric_name=key, expression=expression)
+            for key, expression in self.metric_expressions.items()
+        ]
+        rollup_table = SqlaTable(
+            table_name=self.rollup_table_name,
+            schema=self.schema,
+            main_dttm_col=self.time_column,
+            database_id=self.table.database_id,
+            columns=columns,
+            metrics=metrics,
+        )
+        # setting the relationship would add the table to the tables of the database
+        set_committed_value(rollup_table, "database", self.table.database)
+        return rollup_table
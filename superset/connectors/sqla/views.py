@@ -257,6 +257,73 @@ class RowLevelSecurityFiltersModelView(SupersetModelView, DeleteMixin):
     }
 
 
+class SqlaTableRollupModelView(SupersetModelView, DeleteMixin):
+    datamodel = SQLAInterface(models.SqlaTableRollup)
+
+    list_title = _("Rollup tables")
+    show_title = _("Show Rollup table")
+    add_title = _("Add Rollup table")
+    edit_title = _("Edit Rollup table")
+
+    list_columns = [
+        "table.table_name",
+        "rollup_table_name",
+        "time_grain",
+        "row_count",
+        "modified",
+    ]
+    order_columns = ["table.table_name", "rollup_table_name", "row_count", "modified"]
+    edit_columns = [
+        "table",
+        "schema",
+        "rollup_table_name",
+        "time_column",
+        "time_grain",
+        "dimensions",
+        "metrics",
+        "row_count",
+    ]
+    show_columns = edit_columns
+    search_columns = ("table", "schema", "rollup_table_name")
+    add_columns = edit_columns
+    base_order = ("changed_on", "desc")
+    description_columns = {
+        "table": _("This is the table whose queries may be routed to the rollup."),
+        "time_column": _(
+            "The temporal column of the table the rollup is aggregated over, with "
+            "its timestamps truncated to the time grain, under the same name."
+        ),
+        "time_grain": _(
+            "The time grain the rollup is aggregated at, one of PT1S, PT1M, PT1H, "
+            "P1D, P1M or P1Y."
+        ),
+        "dimensions": _(
+            "A JSON list of the columns of the table the rollup is grouped by, "
+            "under the same names."
+        ),
+        "metrics": _(
+            "A JSON object mapping the names of metrics of the table, or "
+            "AGGREGATE(column) for simple metrics, to the SQL expressions "
+            'computing them from the rollup, e.g. {"count": "SUM(cnt)"}.'
+        ),
+        "row_count": _(
+            "The number of rows of the rollup, the smallest rollup able to answer "
+            "a query is used."
+        ),
+    }
+    label_columns = {
+        "table": _("Table"),
+        "schema": _("Schema"),
+        "rollup_table_name": _("Rollup Table Name"),
+        "time_column": _("Time Column"),
+        "time_grain": _("Time Grain"),
+        "dimensions": _("Dimensions"),
+        "metrics": _("Metrics"),
+        "row_count": _("Row Count"),
+        "modified": _("Modified"),
+    }
+
+
 class TableModelView(DatasourceModelView, DeleteMixin, YamlExportMixin):
     datamodel = SQLAInterface(models.SqlaTable)
     include_route_methods = RouteMethod.CRUD_SET
@@ -291,6 +358,7 @@ class TableModelView(DatasourceModelView, DeleteMixin, YamlExportMixin):
         TableColumnInlineView,
         SqlMetricInlineView,
         RowLevelSecurityFiltersModelView,
+        SqlaTableRollupModelView,
     ]
     base_order = ("changed_on", "desc")
     search_columns = ("database", "schema", "table_name", "owners", "is_sqllab_view")
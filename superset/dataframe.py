@@ -16,20 +16,129 @@
 # under the License.
 """ Superset utilities for pandas.DataFrame.
 """
-from typing import Any, Dict, List
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
+import numpy as np
 import pandas as pd
 
 from superset.utils.core import JS_MAX_INTEGER
 
 
+def _is_js_int_overflow(value: Any) -> bool:
+    return isinstance(value, int) and abs(value) > JS_MAX_INTEGER
+
+
+def _js_int_overflow_mask(series: pd.Series) -> np.ndarray:
+    """Boolean mask of the integers in `series` too big for JavaScript to handle"""
+    if pd.api.types.is_integer_dtype(series.dtype):
+        if series.empty or (
+            series.max() <= JS_MAX_INTEGER and series.min() >= -JS_MAX_INTEGER
+        ):
+            return np.zeros(len(series), dtype=bool)
+        return ((series > JS_MAX_INTEGER) | (series < -JS_MAX_INTEGER)).to_numpy()
+    if pd.api.types.is_object_dtype(series.dtype):
+        inferred_type = pd.api.types.infer_dtype(series, skipna=True)
+        if inferred_type == "integer":
+            # python ints, possibly mixed with nulls, of unbounded size
+            notnull = series.notna().to_numpy()
+            mask = np.zeros(len(series), dtype=bool)
+            mask[notnull] = np.abs(series.to_numpy()[notnull]) > JS_MAX_INTEGER
+            return mask
+        if inferred_type.startswith("mixed-integer"):
+            return series.map(_is_js_int_overflow).to_numpy(dtype=bool)
+    return np.zeros(len(series), dtype=bool)
+
+
+def _column_values(series: pd.Series) -> List[Any]:
+    """The values of `series`, with integers too big for JavaScript as strings"""
+    values = series.tolist()
+    mask = _js_int_overflow_mask(series)
+    for i in np.flatnonzero(mask):
+        values[i] = str(values[i])
+    return values
+
+
+def _columnar_values(series: pd.Series) -> Tuple[str, List[Any]]:
+    """The type and the JSON serializable values of a column"""
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return "BOOLEAN", series.tolist()
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return "INT", _column_values(series)
+
+    if pd.api.types.is_float_dtype(series.dtype):
+        column_type, values = "FLOAT", series.tolist()
+    elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+        if getattr(series.dtype, "tz", None) is not None:
+            # consistent with `datetime_to_epoch`, which ignores the timezone
+            series = series.dt.tz_localize(None)
+        epoch_ms = series.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        column_type, values = "DATETIME", epoch_ms.tolist()
+    elif pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        column_type, values = "STRING", series.tolist()
+    else:
+        column_type, values = "OBJECT", _column_values(series)
+
+    for i in np.flatnonzero(series.isna().to_numpy()):
+        values[i] = None
+    return column_type, values
+
+
+def df_to_columnar(dframe: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Convert a DataFrame to a columnar payload, holding one array of values per
+    column and the schema shared by all rows::
+
+        {
+            "columns": [{"name": "__timestamp", "type": "DATETIME"}, ...],
+            "data": [[1577836800000, ...], ...],
+            "rowcount": 100,
+        }
+
+    Datetimes are encoded as milliseconds since the epoch, integers too big for
+    JavaScript to handle as strings, and missing values as null.
+    """
+    columns = []
+    data = []
+    for column, series in dframe.items():
+        column_type, values = _columnar_values(series)
+        columns.append({"name": column, "type": column_type})
+        data.append(values)
+    return {"columns": columns, "data": data, "rowcount": len(dframe.index)}
+
+
 def df_to_records(dframe: pd.DataFrame) -> List[Dict[str, Any]]:
-    data: List[Dict[str, Any]] = dframe.to_dict(orient="records")
-    # TODO: refactor this
-    for d in data:
-        for k, v in list(d.items()):
-            # if an int is too big for JavaScript to handle
-            # convert it to a string
-            if isinstance(v, int) and abs(v) > JS_MAX_INTEGER:
-                d[k] = str(v)
-    return data
+    """
+    Convert a DataFrame to a list of records, with integers too big for JavaScript
+    to handle converted to strings.
+
+    Overflowing integers are found with vectorized checks on each column, and the
+    records are built from the column values rather than cell by cell.
+    """
+    columns = list(dframe.columns)
+    values = [_column_values(series) for _, series in dframe.items()]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def df_batches_to_csv(
+    dframes: Iterable[pd.DataFrame], compress: bool = False, **kwargs: Any
+) -> Iterator[bytes]:
+    """
+    Lazily convert a sequence of DataFrames sharing the same columns to CSV
+
+    :param dframes: DataFrames to write, in order
+    :param compress: Whether to gzip the output
+    :param kwargs: Keyword arguments passed to `pd.DataFrame.to_csv`
+    :return: Iterator over chunks of the encoded CSV file
+    """
+    encoding = kwargs.pop("encoding", None) or "utf-8"
+    header = kwargs.pop("header", True)
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    for i, dframe in enumerate(dframes):
+        chunk = dframe.to_csv(header=header and i == 0, **kwargs).encode(encoding)
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
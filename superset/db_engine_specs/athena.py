@@ -22,6 +22,7 @@ from superset.db_engine_specs.base import BaseEngineSpec
 
 class AthenaEngineSpec(BaseEngineSpec):
     engine = "awsathena"
+    allows_window_functions = True
 
     _time_grain_functions = {
         None: "{col}",
@@ -20,7 +20,17 @@ import os
 import re
 from contextlib import closing
 from datetime import datetime
-from typing import Any, Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING, Union
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
 
 import pandas as pd
 import sqlparse
@@ -129,6 +139,8 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
     allows_joins = True
     allows_subqueries = True
     allows_column_aliases = True
+    # supports aggregate window functions over rows, e.g. for rolling averages
+    allows_window_functions = False
     force_column_alias_quotes = False
     arraysize = 0
     max_column_name_length = 0
@@ -242,6 +254,31 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
             return cursor.fetchmany(limit)
         return cursor.fetchall()
 
+    @classmethod
+    def fetch_data_in_batches(
+        cls, cursor: Any, limit: Optional[int], batch_size: int
+    ) -> Iterator[List[Tuple]]:
+        """
+        Lazily fetch the result of a query in batches, so callers can convert
+        the rows incrementally instead of materializing the full result at once.
+
+        :param cursor: Cursor instance
+        :param limit: Maximum number of rows to be returned by the cursor
+        :param batch_size: Maximum number of rows in each batch
+        :return: Iterator over lists of rows
+        """
+        if cls.arraysize:
+            cursor.arraysize = cls.arraysize
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            data = cursor.fetchmany(size)
+            if not data:
+                return
+            yield data
+            if remaining is not None:
+                remaining -= len(data)
+
     @classmethod
     def expand_data(
         cls, columns: List[dict], data: List[dict]
@@ -612,6 +649,18 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         # TODO: Fix circular import caused by importing Database, TableColumn
         return None
 
+    @classmethod
+    def invalidate_latest_partition(
+        cls, table_name: str, schema: Optional[str], database: "Database"
+    ) -> None:
+        """
+        Invalidate the cached latest partition of a table, for engines caching it
+
+        :param table_name: Table name
+        :param schema: Schema name
+        :param database: Database instance
+        """
+
     @classmethod
     def _get_fields(cls, cols: List[Dict[str, Any]]) -> List[Any]:
         return [column(c["name"]) for c in cols]
@@ -758,6 +807,17 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         """
         return {}
 
+    @classmethod
+    def get_streaming_cursor(cls, connection: Any) -> Any:
+        """
+        Get a cursor sending the rows of a query as they are fetched, e.g. a
+        server-side cursor, instead of buffering the whole result client-side
+
+        :param connection: DBAPI connection
+        :return: Cursor instance, a regular cursor if streaming isn't supported
+        """
+        return connection.cursor()
+
     @classmethod
     def execute(cls, cursor: Any, query: str, **kwargs: Any) -> None:
         """
@@ -17,7 +17,7 @@
 import hashlib
 import re
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
 
 import pandas as pd
 from sqlalchemy import literal_column
@@ -36,6 +36,7 @@ class BigQueryEngineSpec(BaseEngineSpec):
 
     engine = "bigquery"
     max_column_name_length = 128
+    allows_window_functions = True
 
     """
     https://www.python.org/dev/peps/pep-0249/#arraysize
@@ -79,6 +80,15 @@ class BigQueryEngineSpec(BaseEngineSpec):
             data = [r.values() for r in data]  # type: ignore
         return data
 
+    @classmethod
+    def fetch_data_in_batches(
+        cls, cursor: Any, limit: Optional[int], batch_size: int
+    ) -> Iterator[List[Tuple]]:
+        for data in super().fetch_data_in_batches(cursor, limit, batch_size):
+            if type(data[0]).__name__ == "Row":
+                data = [r.values() for r in data]  # type: ignore
+            yield data
+
     @staticmethod
     def _mutate_label(label: str) -> str:
         """
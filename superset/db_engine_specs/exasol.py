@@ -14,7 +14,7 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
-from typing import Any, List, Tuple
+from typing import Any, Iterator, List, Optional, Tuple
 
 from superset.db_engine_specs.base import BaseEngineSpec
 
@@ -43,3 +43,10 @@ class ExasolEngineSpec(BaseEngineSpec):  # pylint: disable=abstract-method
         data = super().fetch_data(cursor, limit)
         # Lists of `pyodbc.Row` need to be unpacked further
         return cls.pyodbc_rows_to_tuples(data)
+
+    @classmethod
+    def fetch_data_in_batches(
+        cls, cursor: Any, limit: Optional[int], batch_size: int
+    ) -> Iterator[List[Tuple]]:
+        for data in super().fetch_data_in_batches(cursor, limit, batch_size):
+            yield cls.pyodbc_rows_to_tuples(data)
@@ -17,9 +17,8 @@
 import logging
 import os
 import re
-import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
 from urllib import parse
 
 import pandas as pd
@@ -27,7 +26,6 @@ from sqlalchemy import Column
 from sqlalchemy.engine.base import Engine
 from sqlalchemy.engine.reflection import Inspector
 from sqlalchemy.engine.url import make_url, URL
-from sqlalchemy.orm import Session
 from sqlalchemy.sql.expression import ColumnClause, Select
 from wtforms.form import Form
 
@@ -36,6 +34,7 @@ from superset.db_engine_specs.base import BaseEngineSpec
 from superset.db_engine_specs.presto import PrestoEngineSpec
 from superset.models.sql_lab import Query
 from superset.utils import core as utils
+from superset.utils.cursor_poller import PolledCursor
 
 if TYPE_CHECKING:
     # prevent circular imports
@@ -104,6 +103,23 @@ class HiveEngineSpec(PrestoEngineSpec):
         except pyhive.exc.ProgrammingError:
             return []
 
+    @classmethod
+    def fetch_data_in_batches(
+        cls, cursor: Any, limit: Optional[int], batch_size: int
+    ) -> Iterator[List[Tuple]]:
+        import pyhive
+        from TCLIService import ttypes
+
+        state = cursor.poll()
+        if state.operationState == ttypes.TOperationState.ERROR_STATE:
+            raise Exception("Query error", state.errorMessage)
+        try:
+            yield from super(HiveEngineSpec, cls).fetch_data_in_batches(
+                cursor, limit, batch_size
+            )
+        except pyhive.exc.ProgrammingError:
+            return
+
     @classmethod
     def create_table_from_csv(  # pylint: disable=too-many-locals
         cls, form: Form, database: "Database"
@@ -250,50 +266,42 @@ class HiveEngineSpec(PrestoEngineSpec):
         return None
 
     @classmethod
-    def handle_cursor(  # pylint: disable=too-many-locals
-        cls, cursor: Any, query: Query, session: Session
-    ) -> None:
-        """Updates progress information"""
+    def get_polled_cursor(cls, cursor: Any, query: Query) -> PolledCursor:
+        """The cursor of a running query, polled for its progress and tracking url"""
         from pyhive import hive  # pylint: disable=no-name-in-module
 
         unfinished_states = (
             hive.ttypes.TOperationState.INITIALIZED_STATE,
             hive.ttypes.TOperationState.RUNNING_STATE,
         )
-        polled = cursor.poll()
         last_log_line = 0
-        tracking_url = None
         job_id = None
         query_id = query.id
-        while polled.operationState in unfinished_states:
-            query = session.query(type(query)).filter_by(id=query_id).one()
-            if query.status == QueryStatus.STOPPED:
-                cursor.cancel()
-                break
 
+        def poll() -> Optional[Dict[str, Any]]:
+            nonlocal last_log_line, job_id
+            if cursor.poll().operationState not in unfinished_states:
+                return None
+
+            values: Dict[str, Any] = {}
             log = cursor.fetch_logs() or ""
             if log:
                 log_lines = log.splitlines()
                 progress = cls.progress(log_lines)
                 logger.info(f"Query {query_id}: Progress total: {progress}")
-                needs_commit = False
-                if progress > query.progress:
-                    query.progress = progress
-                    needs_commit = True
-                if not tracking_url:
-                    tracking_url = cls.get_tracking_url(log_lines)
-                    if tracking_url:
-                        job_id = tracking_url.split("/")[-2]
-                        logger.info(
-                            f"Query {query_id}: Found the tracking url: {tracking_url}"
-                        )
-                        tracking_url = tracking_url_trans(tracking_url)
-                        logger.info(
-                            f"Query {query_id}: Transformation applied: {tracking_url}"
-                        )
-                        query.tracking_url = tracking_url
-                        logger.info(f"Query {query_id}: Job id: {job_id}")
-                        needs_commit = True
+                values["progress"] = progress
+                tracking_url = None if job_id else cls.get_tracking_url(log_lines)
+                if tracking_url:
+                    job_id = tracking_url.split("/")[-2]
+                    logger.info(
+                        f"Query {query_id}: Found the tracking url: {tracking_url}"
+                    )
+                    tracking_url = tracking_url_trans(tracking_url)
+                    logger.info(
+                        f"Query {query_id}: Transformation applied: {tracking_url}"
+                    )
+                    values["tracking_url"] = tracking_url
+                    logger.info(f"Query {query_id}: Job id: {job_id}")
                 if job_id and len(log_lines) > last_log_line:
                     # Wait for job id before logging things out
                     # this allows for prefixing all log lines and becoming
@@ -301,10 +309,16 @@ class HiveEngineSpec(PrestoEngineSpec):
                     for l in log_lines[last_log_line:]:
                         logger.info(f"Query {query_id}: [{job_id}] {l}")
                     last_log_line = len(log_lines)
-                if needs_commit:
-                    session.commit()
-            time.sleep(hive_poll_interval)
-            polled = cursor.poll()
+            return values
+
+        return PolledCursor(
+            query_id,
+            poll,
+            cursor.cancel,
+            (QueryStatus.STOPPED,),
+            progress=query.progress,
+            interval=hive_poll_interval,
+        )
 
     @classmethod
     def get_columns(
@@ -26,6 +26,7 @@ class ImpalaEngineSpec(BaseEngineSpec):
     """Engine spec for Cloudera's Impala"""
 
     engine = "impala"
+    allows_window_functions = True
 
     _time_grain_functions = {
         None: "{col}",
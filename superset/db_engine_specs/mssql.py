@@ -16,7 +16,7 @@
 # under the License.
 import re
 from datetime import datetime
-from typing import Any, List, Optional, Tuple
+from typing import Any, Iterator, List, Optional, Tuple
 
 from sqlalchemy.engine.interfaces import Dialect
 from sqlalchemy.types import String, TypeEngine, UnicodeText
@@ -28,6 +28,7 @@ class MssqlEngineSpec(BaseEngineSpec):
     engine = "mssql"
     limit_method = LimitMethod.WRAP_SQL
     max_column_name_length = 128
+    allows_window_functions = True
 
     _time_grain_functions = {
         None: "{col}",
@@ -66,6 +67,13 @@ class MssqlEngineSpec(BaseEngineSpec):
         # Lists of `pyodbc.Row` need to be unpacked further
         return cls.pyodbc_rows_to_tuples(data)
 
+    @classmethod
+    def fetch_data_in_batches(
+        cls, cursor: Any, limit: Optional[int], batch_size: int
+    ) -> Iterator[List[Tuple]]:
+        for data in super().fetch_data_in_batches(cursor, limit, batch_size):
+            yield cls.pyodbc_rows_to_tuples(data)
+
     column_types = [
         (String(), re.compile(r"^(?<!N)((VAR){0,1}CHAR|TEXT|STRING)", re.IGNORECASE)),
         (UnicodeText(), re.compile(r"^N((VAR){0,1}CHAR|TEXT)", re.IGNORECASE)),
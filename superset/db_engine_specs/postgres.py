@@ -14,8 +14,9 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import uuid
 from datetime import datetime
-from typing import Any, List, Optional, Tuple, TYPE_CHECKING
+from typing import Any, Iterator, List, Optional, Tuple, TYPE_CHECKING
 
 from pytz import _FixedOffset  # type: ignore
 from sqlalchemy.dialects.postgresql.base import PGInspector
@@ -37,6 +38,7 @@ class PostgresBaseEngineSpec(BaseEngineSpec):
     """ Abstract class for Postgres 'like' databases """
 
     engine = ""
+    allows_window_functions = True
 
     _time_grain_functions = {
         None: "{col}",
@@ -59,6 +61,16 @@ class PostgresBaseEngineSpec(BaseEngineSpec):
             return cursor.fetchmany(limit)
         return cursor.fetchall()
 
+    @classmethod
+    def fetch_data_in_batches(
+        cls, cursor: Any, limit: Optional[int], batch_size: int
+    ) -> Iterator[List[Tuple]]:
+        cursor.tzinfo_factory = FixedOffsetTimezone
+        # the description of named cursors is only known after the first fetch
+        if not cursor.description and not getattr(cursor, "name", None):
+            return
+        yield from super().fetch_data_in_batches(cursor, limit, batch_size)
+
     @classmethod
     def epoch_to_dttm(cls) -> str:
         return "(timestamp 'epoch' + {col} * interval '1 second')"
@@ -69,6 +81,15 @@ class PostgresEngineSpec(PostgresBaseEngineSpec):
     max_column_name_length = 63
     try_remove_schema_from_table_name = False
 
+    @classmethod
+    def get_streaming_cursor(cls, connection: Any) -> Any:
+        try:
+            # psycopg2 named cursors are server-side cursors
+            return connection.cursor(name=f"superset_{uuid.uuid4().hex}")
+        except TypeError:
+            # the driver doesn't support named cursors, e.g. pg8000
+            return connection.cursor()
+
     @classmethod
     def get_table_names(
         cls, database: "Database", inspector: PGInspector, schema: Optional[str]
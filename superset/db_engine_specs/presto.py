@@ -17,6 +17,7 @@
 import logging
 import re
 import textwrap
+import threading
 import time
 from collections import defaultdict, deque
 from contextlib import closing
@@ -27,12 +28,14 @@ from urllib import parse
 
 import pandas as pd
 import simplejson as json
+from flask import current_app, Flask
 from sqlalchemy import Column, literal_column
 from sqlalchemy.engine.base import Engine
 from sqlalchemy.engine.reflection import Inspector
 from sqlalchemy.engine.result import RowProxy
 from sqlalchemy.engine.url import URL
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.sql.expression import ColumnClause, Select
 
 from superset import app, cache, is_feature_enabled, security_manager
@@ -42,6 +45,8 @@ from superset.models.sql_lab import Query
 from superset.models.sql_types.presto_sql_types import type_map as presto_type_map
 from superset.sql_parse import ParsedQuery
 from superset.utils import core as utils
+from superset.utils.cache import acquire_cache_lock, release_cache_lock
+from superset.utils.cursor_poller import get_cursor_poller, poll_cursor, PolledCursor
 
 if TYPE_CHECKING:
     # prevent circular imports
@@ -50,6 +55,7 @@ if TYPE_CHECKING:
 QueryStatus = utils.QueryStatus
 config = app.config
 logger = logging.getLogger(__name__)
+stats_logger = config["STATS_LOGGER"]
 
 
 def get_children(column: Dict[str, str]) -> List[Dict[str, str]]:
@@ -99,6 +105,7 @@ def get_children(column: Dict[str, str]) -> List[Dict[str, str]]:
 
 class PrestoEngineSpec(BaseEngineSpec):
     engine = "presto"
+    allows_window_functions = True
 
     _time_grain_functions = {
         None: "{col}",
@@ -723,43 +730,53 @@ class PrestoEngineSpec(BaseEngineSpec):
     @classmethod
     def handle_cursor(cls, cursor: Any, query: Query, session: Session) -> None:
         """Updates progress information"""
+        polled_cursor = cls.get_polled_cursor(cursor, query)
+        if not config["SQLLAB_MULTIPLEXED_POLLING"]:
+            poll_cursor(polled_cursor, session)
+            return
+        poller = get_cursor_poller(config["SQLALCHEMY_DATABASE_URI"])
+        poller.wait(polled_cursor)
+        # the poller wrote these values with its own session
+        for key, value in polled_cursor.values.items():
+            set_committed_value(query, key, value)
+
+    @classmethod
+    def get_polled_cursor(cls, cursor: Any, query: Query) -> PolledCursor:
+        """The cursor of a running query, polled for its progress"""
         query_id = query.id
-        logger.info(f"Query {query_id}: Polling the cursor for progress")
-        polled = cursor.poll()
-        # poll returns dict -- JSON status information or ``None``
-        # if the query is done
-        # https://github.com/dropbox/PyHive/blob/
-        # b34bdbf51378b3979eaf5eca9e956f06ddc36ca0/pyhive/presto.py#L178
-        while polled:
-            # Update the object and wait for the kill signal.
-            stats = polled.get("stats", {})
 
-            query = session.query(type(query)).filter_by(id=query_id).one()
-            if query.status in [QueryStatus.STOPPED, QueryStatus.TIMED_OUT]:
-                cursor.cancel()
-                break
-
-            if stats:
-                state = stats.get("state")
-
-                # if already finished, then stop polling
-                if state == "FINISHED":
-                    break
-
-                completed_splits = float(stats.get("completedSplits"))
-                total_splits = float(stats.get("totalSplits"))
-                if total_splits and completed_splits:
-                    progress = 100 * (completed_splits / total_splits)
-                    logger.info(
-                        "Query {} progress: {} / {} "  # pylint: disable=logging-format-interpolation
-                        "splits".format(query_id, completed_splits, total_splits)
-                    )
-                    if progress > query.progress:
-                        query.progress = progress
-                    session.commit()
-            time.sleep(1)
+        def poll() -> Optional[Dict[str, Any]]:
             logger.info(f"Query {query_id}: Polling the cursor for progress")
             polled = cursor.poll()
+            # poll returns dict -- JSON status information or ``None``
+            # if the query is done
+            # https://github.com/dropbox/PyHive/blob/
+            # b34bdbf51378b3979eaf5eca9e956f06ddc36ca0/pyhive/presto.py#L178
+            if not polled:
+                return None
+            stats = polled.get("stats", {})
+            if not stats:
+                return {}
+            # if already finished, then stop polling
+            if stats.get("state") == "FINISHED":
+                return None
+            completed_splits = float(stats.get("completedSplits"))
+            total_splits = float(stats.get("totalSplits"))
+            if not total_splits or not completed_splits:
+                return {}
+            logger.info(
+                "Query {} progress: {} / {} "  # pylint: disable=logging-format-interpolation
+                "splits".format(query_id, completed_splits, total_splits)
+            )
+            return {"progress": 100 * (completed_splits / total_splits)}
+
+        return PolledCursor(
+            query_id,
+            poll,
+            cursor.cancel,
+            (QueryStatus.STOPPED, QueryStatus.TIMED_OUT),
+            progress=query.progress,
+        )
 
     @classmethod
     def _extract_error_message(cls, e: Exception) -> Optional[str]:
@@ -891,6 +908,19 @@ class PrestoEngineSpec(BaseEngineSpec):
         >>> latest_partition('foo_table')
         (['ds'], ('2018-01-01',))
         """
+        column_names, values = cls._get_latest_partition(table_name, schema, database)
+        if not show_first and len(column_names) > 1:
+            raise SupersetTemplateException(
+                "The table should have a single partitioned field "
+                "to use this function. You may want to use "
+                "`presto.latest_sub_partition`"
+            )
+        return column_names, values
+
+    @classmethod
+    def _query_latest_partition(
+        cls, table_name: str, schema: Optional[str], database: "Database"
+    ) -> Tuple[List[str], Optional[List[str]]]:
         indexes = database.get_indexes(table_name, schema)
         if not indexes:
             raise SupersetTemplateException(
@@ -902,18 +932,94 @@ class PrestoEngineSpec(BaseEngineSpec):
             raise SupersetTemplateException(
                 "The table should have one partitioned field"
             )
-        elif not show_first and len(indexes[0]["column_names"]) > 1:
-            raise SupersetTemplateException(
-                "The table should have a single partitioned field "
-                "to use this function. You may want to use "
-                "`presto.latest_sub_partition`"
-            )
         column_names = indexes[0]["column_names"]
         part_fields = [(column_name, True) for column_name in column_names]
         sql = cls._partition_query(table_name, database, 1, part_fields)
         df = database.get_df(sql, schema)
         return column_names, cls._latest_partition_from_df(df)
 
+    @staticmethod
+    def _latest_partition_cache_key(
+        table_name: str, schema: Optional[str], database_id: int
+    ) -> str:
+        return f"latest_partition/{database_id}/{schema}/{table_name}"
+
+    @classmethod
+    def _get_latest_partition(
+        cls, table_name: str, schema: Optional[str], database: "Database"
+    ) -> Tuple[List[str], Optional[List[str]]]:
+        """
+        Get the partition columns and latest partition of a table, cached for
+        LATEST_PARTITION_CACHE_TIMEOUT seconds. Cached values older than
+        LATEST_PARTITION_CACHE_REFRESH seconds are refreshed in the background.
+
+        Databases impersonating users aren't cached, as the partitions visible
+        depend on the user.
+        """
+        timeout = config["LATEST_PARTITION_CACHE_TIMEOUT"]
+        if not timeout or not cache or database.impersonate_user:
+            return cls._query_latest_partition(table_name, schema, database)
+
+        key = cls._latest_partition_cache_key(table_name, schema, database.id)
+        cached = cache.get(key)
+        if cached is None:
+            stats_logger.incr("latest_partition_cache_miss")
+            value = cls._query_latest_partition(table_name, schema, database)
+            cache.set(key, {"value": value, "time": time.time()}, timeout=timeout)
+            return value
+
+        stats_logger.incr("latest_partition_cache_hit")
+        age = time.time() - cached["time"]
+        if age > config["LATEST_PARTITION_CACHE_REFRESH"] and acquire_cache_lock(
+            cache, key, timeout=timeout
+        ):
+            thread = threading.Thread(
+                target=cls._refresh_latest_partition,
+                args=(
+                    current_app._get_current_object(),  # pylint: disable=protected-access
+                    table_name,
+                    schema,
+                    database.id,
+                ),
+                daemon=True,
+            )
+            thread.start()
+        return cached["value"]
+
+    @classmethod
+    def _refresh_latest_partition(
+        cls, flask_app: Flask, table_name: str, schema: Optional[str], database_id: int
+    ) -> None:
+        from superset import db
+        from superset.models.core import Database
+
+        key = cls._latest_partition_cache_key(table_name, schema, database_id)
+        with flask_app.app_context():
+            try:
+                database = db.session.query(Database).get(database_id)
+                value = cls._query_latest_partition(table_name, schema, database)
+                cache.set(
+                    key,
+                    {"value": value, "time": time.time()},
+                    timeout=config["LATEST_PARTITION_CACHE_TIMEOUT"],
+                )
+                stats_logger.incr("latest_partition_cache_refresh")
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("Could not refresh the latest partition of %s", key)
+                logger.exception(e)
+            finally:
+                release_cache_lock(cache, key)
+                db.session.remove()
+
+    @classmethod
+    def invalidate_latest_partition(
+        cls, table_name: str, schema: Optional[str], database: "Database"
+    ) -> None:
+        if cache:
+            cache.delete(
+                cls._latest_partition_cache_key(table_name, schema, database.id)
+            )
+
     @classmethod
     def latest_sub_partition(
         cls, table_name: str, schema: Optional[str], database: "Database", **kwargs: Any
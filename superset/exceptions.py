@@ -50,3 +50,7 @@ class SpatialException(SupersetException):
 
 class DatabaseNotFound(SupersetException):
     status = 400
+
+
+class ResultsPayloadException(SupersetException):
+    pass
@@ -17,9 +17,9 @@
 """Defines the templating context for SQL Lab"""
 import inspect
 import json
-from typing import Any, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-from flask import g, request
+from flask import g, has_request_context, request
 from jinja2.sandbox import SandboxedEnvironment
 
 from superset import jinja_base_context
@@ -174,10 +174,13 @@ class BaseTemplateProcessor:  # pylint: disable=too-few-public-methods
         query=None,
         table=None,
         extra_cache_keys: Optional[List[Any]] = None,
+        render_cache_key: Optional[str] = None,
         **kwargs
     ):
         self.database = database
         self.query = query
+        self.extra_cache_keys = extra_cache_keys
+        self.render_cache_key = render_cache_key
         self.schema = None
         if query and query.schema:
             self.schema = query.schema
@@ -204,9 +207,35 @@ class BaseTemplateProcessor:  # pylint: disable=too-few-public-methods
         >>> process_template(sql)
         "SELECT '2017-01-01T00:00:00'"
         """
-        template = self.env.from_string(sql)
-        kwargs.update(self.context)
-        return template.render(kwargs)
+        extra_cache_keys = self.extra_cache_keys
+        renderings = self._get_renderings() if not kwargs else None
+        if renderings is None or extra_cache_keys is None:
+            template = self.env.from_string(sql)
+            kwargs.update(self.context)
+            return template.render(kwargs)
+
+        key = (self.render_cache_key, sql)
+        if key not in renderings:
+            num_extra_cache_keys = len(extra_cache_keys)
+            rendered_sql = self.env.from_string(sql).render(self.context)
+            renderings[key] = (rendered_sql, extra_cache_keys[num_extra_cache_keys:])
+            return rendered_sql
+        rendered_sql, added_cache_keys = renderings[key]
+        extra_cache_keys.extend(added_cache_keys)
+        return rendered_sql
+
+    def _get_renderings(self) -> Optional[Dict[Tuple[str, str], Tuple[str, List[Any]]]]:
+        """
+        The templates rendered during the request by processors with the same
+        `render_cache_key`, along with the cache keys they added: templates with
+        expensive calls are rendered both to compute the cache key of a query and
+        to run it.
+        """
+        if not self.render_cache_key or not has_request_context():
+            return None
+        if "rendered_templates" not in g:
+            g.rendered_templates = {}
+        return g.rendered_templates
 
 
 class PrestoTemplateProcessor(BaseTemplateProcessor):
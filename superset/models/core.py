@@ -19,10 +19,11 @@
 import json
 import logging
 import textwrap
-from contextlib import closing
+import time
+from contextlib import closing, contextmanager
 from copy import deepcopy
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Type
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Type
 
 import numpy
 import pandas as pd
@@ -46,7 +47,7 @@ from sqlalchemy.engine import Dialect, Engine, url
 from sqlalchemy.engine.reflection import Inspector
 from sqlalchemy.engine.url import make_url, URL
 from sqlalchemy.orm import relationship
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, QueuePool
 from sqlalchemy.schema import UniqueConstraint
 from sqlalchemy.sql import Select
 from sqlalchemy_utils import EncryptedType
@@ -56,6 +57,7 @@ from superset.db_engine_specs.base import TimeGrain
 from superset.models.dashboard import Dashboard
 from superset.models.helpers import AuditMixinNullable, ImportMixin
 from superset.models.tags import DashboardUpdater, FavStarUpdater
+from superset.sql_parse import ParsedQuery
 from superset.utils import cache as cache_util, core as utils
 
 config = app.config
@@ -67,6 +69,14 @@ logger = logging.getLogger(__name__)
 
 PASSWORD_MASK = "X" * 10
 DB_CONNECTION_MUTATOR = config["DB_CONNECTION_MUTATOR"]
+# settings of the ``engine_pool`` extra, passed to `create_engine`
+ENGINE_POOL_PARAMS = (
+    "pool_size",
+    "max_overflow",
+    "pool_recycle",
+    "pool_pre_ping",
+    "pool_timeout",
+)
 
 
 class Url(Model, AuditMixinNullable):
@@ -272,18 +282,66 @@ class Database(
                 effective_username = g.user.username
         return effective_username
 
-    @utils.memoized(watch=("impersonate_user", "sqlalchemy_uri_decrypted", "extra"))
     def get_sqla_engine(
         self,
         schema: Optional[str] = None,
-        nullpool: bool = True,
+        nullpool: Optional[bool] = None,
         user_name: Optional[str] = None,
         source: Optional[utils.QuerySource] = None,
+    ) -> Engine:
+        """
+        Get the engine connecting to the database
+
+        :param schema: The schema the engine connects to
+        :param nullpool: Whether to open a new connection for each query instead
+            of pooling them, defaults to True unless pooling is enabled in the
+            ``engine_pool`` extra
+        :param user_name: The user to impersonate, the current user if None
+        :param source: Where the query comes from, passed to the
+            ``DB_CONNECTION_MUTATOR``
+        :return: The engine
+        """
+        if nullpool is None:
+            nullpool = "engine_pool" not in self.get_extra()
+        effective_username = self.get_effective_user(
+            make_url(self.sqlalchemy_uri_decrypted), user_name
+        )
+        if DB_CONNECTION_MUTATOR:
+            if not source and request and request.referrer:
+                if "/superset/dashboard/" in request.referrer:
+                    source = utils.QuerySource.DASHBOARD
+                elif "/superset/explore/" in request.referrer:
+                    source = utils.QuerySource.CHART
+                elif "/superset/sqllab/" in request.referrer:
+                    source = utils.QuerySource.SQL_LAB
+        # engines, and so their pools, are keyed on the effective user so
+        # connections are never shared by impersonated users, and shared by the
+        # instances of the same database
+        return self._get_sqla_engine(schema, nullpool, effective_username, source)
+
+    @utils.memoized(
+        watch=(
+            "id",
+            "impersonate_user",
+            "sqlalchemy_uri_decrypted",
+            "extra",
+            "encrypted_extra",
+        ),
+        shared=True,
+        max_size=config["SQLALCHEMY_ENGINE_CACHE_SIZE"],
+        timeout=config["SQLALCHEMY_ENGINE_CACHE_TIMEOUT"],
+        on_evict=lambda engine: engine.dispose(),
+    )
+    def _get_sqla_engine(
+        self,
+        schema: Optional[str],
+        nullpool: bool,
+        effective_username: Optional[str],
+        source: Optional[utils.QuerySource],
     ) -> Engine:
         extra = self.get_extra()
         sqlalchemy_url = make_url(self.sqlalchemy_uri_decrypted)
         self.db_engine_spec.adjust_database_uri(sqlalchemy_url, schema)
-        effective_username = self.get_effective_user(sqlalchemy_url, user_name)
         # If using MySQL or Presto for example, will set url.username
         # If using Hive, will not do anything yet since that relies on a
         # configuration parameter instead.
@@ -297,6 +355,15 @@ class Database(
         params = extra.get("engine_params", {})
         if nullpool:
             params["poolclass"] = NullPool
+        else:
+            params["poolclass"] = QueuePool
+            params.update(
+                {
+                    key: value
+                    for key, value in extra.get("engine_pool", {}).items()
+                    if key in ENGINE_POOL_PARAMS
+                }
+            )
 
         connect_args = params.get("connect_args", {})
         configuration = connect_args.get("configuration", {})
@@ -314,14 +381,6 @@ class Database(
         params.update(self.get_encrypted_extra())
 
         if DB_CONNECTION_MUTATOR:
-            if not source and request and request.referrer:
-                if "/superset/dashboard/" in request.referrer:
-                    source = utils.QuerySource.DASHBOARD
-                elif "/superset/explore/" in request.referrer:
-                    source = utils.QuerySource.CHART
-                elif "/superset/sqllab/" in request.referrer:
-                    source = utils.QuerySource.SQL_LAB
-
             sqlalchemy_url, params = DB_CONNECTION_MUTATOR(
                 sqlalchemy_url, params, effective_username, security_manager, source
             )
@@ -334,22 +393,29 @@ class Database(
     def get_quoter(self):
         return self.get_dialect().identifier_preparer.quote
 
-    def get_df(  # pylint: disable=too-many-locals
-        self, sql: str, schema: Optional[str] = None, mutator: Optional[Callable] = None
-    ) -> pd.DataFrame:
+    @contextmanager
+    def _execute_sql(
+        self, sql: str, schema: Optional[str] = None, stream: bool = False
+    ) -> Iterator[Any]:
+        """
+        Run the statements in `sql`, yielding the cursor of the last statement
+
+        If `stream`, a last SELECT statement runs on the engine spec's streaming
+        cursor, e.g. a server-side cursor, so its rows are sent as they're fetched.
+        """
         sqls = [str(s).strip(" ;") for s in sqlparse.parse(sql)]
 
         engine = self.get_sqla_engine(schema=schema)
         username = utils.get_username()
 
-        def needs_conversion(df_series: pd.Series) -> bool:
-            return not df_series.empty and isinstance(df_series[0], (list, dict))
-
         def _log_query(sql: str) -> None:
             if log_query:
                 log_query(engine.url, sql, schema, username, __name__, security_manager)
 
+        start = time.monotonic()
         with closing(engine.raw_connection()) as conn:
+            if not isinstance(engine.pool, NullPool):
+                self._log_pool_stats(engine, time.monotonic() - start)
             with closing(conn.cursor()) as cursor:
                 for sql_ in sqls[:-1]:
                     _log_query(sql_)
@@ -357,24 +423,170 @@ class Database(
                     cursor.fetchall()
 
                 _log_query(sqls[-1])
-                self.db_engine_spec.execute(cursor, sqls[-1])
-
-                if cursor.description is not None:
-                    columns = [col_desc[0] for col_desc in cursor.description]
+                if stream and ParsedQuery(sqls[-1]).is_select():
+                    with closing(
+                        self.db_engine_spec.get_streaming_cursor(conn)
+                    ) as streaming_cursor:
+                        self.db_engine_spec.execute(streaming_cursor, sqls[-1])
+                        yield streaming_cursor
                 else:
-                    columns = []
+                    self.db_engine_spec.execute(cursor, sqls[-1])
+                    yield cursor
+
+    def _log_pool_stats(self, engine: Engine, checkout_wait: float) -> None:
+        """Report the size of the connection pool and how long a checkout waited"""
+        pool = engine.pool
+        key = f"engine_pool.{self.id}"
+        stats_logger.timing(f"{key}.checkout_wait", checkout_wait * 1000)
+        if isinstance(pool, QueuePool):
+            stats_logger.set_gauge(f"{key}.size", pool.checkedin() + pool.checkedout())
+            stats_logger.set_gauge(f"{key}.checked_out", pool.checkedout())
+
+    @staticmethod
+    def _stringify_nested_columns(df: pd.DataFrame) -> None:
+        def needs_conversion(df_series: pd.Series) -> bool:
+            return not df_series.empty and isinstance(df_series[0], (list, dict))
+
+        for k, v in df.dtypes.items():
+            if v.type == numpy.object_ and needs_conversion(df[k]):
+                df[k] = df[k].apply(utils.json_dumps_w_dates)
+
+    @staticmethod
+    def _keep_integer_nulls(df: pd.DataFrame, data: List[Any]) -> pd.DataFrame:
+        """
+        Keep the integer columns with nulls of a batch of rows as Python integers,
+        as Arrow's `integer_object_nulls` does, instead of the floats inferred by
+        pandas, so they have the same values in batches with and without nulls
+        """
+        series = [df.iloc[:, i] for i in range(len(df.columns))]
+        is_converted = False
+        for i, column in enumerate(series):
+            if column.dtype.kind != "f" or not column.isna().any():
+                continue
+            values = [row[i] for row in data]
+            if all(
+                value is None
+                or (isinstance(value, int) and not isinstance(value, bool))
+                for value in values
+            ):
+                series[i] = pd.Series(values, index=df.index, dtype=object)
+                is_converted = True
+        if not is_converted:
+            return df
+        converted = pd.concat(series, axis=1)
+        converted.columns = df.columns
+        return converted
+
+    def _fetch_df_batches(
+        self,
+        sql: str,
+        schema: Optional[str],
+        batch_size: int,
+        integer_object_nulls: bool = False,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Run `sql` on a streaming cursor, lazily converting each batch of rows it
+        fetches to a DataFrame, or yield an empty DataFrame if there's no row
 
+        :param integer_object_nulls: Whether to keep integer columns with nulls as
+            Python integers, see `_keep_integer_nulls`
+        """
+        with self._execute_sql(sql, schema, stream=True) as cursor:
+            columns = None
+            for data in self.db_engine_spec.fetch_data_in_batches(
+                cursor, None, batch_size
+            ):
+                # only known after the first fetch on some server-side cursors
+                if columns is None:
+                    columns = [col_desc[0] for col_desc in cursor.description]
                 df = pd.DataFrame.from_records(
-                    data=list(cursor.fetchall()), columns=columns, coerce_float=True
+                    data=data, columns=columns, coerce_float=True
                 )
+                if integer_object_nulls:
+                    df = self._keep_integer_nulls(df, data)
+                yield df
+            if columns is None and cursor.description is not None:
+                columns = [col_desc[0] for col_desc in cursor.description]
+                yield pd.DataFrame.from_records(data=[], columns=columns)
+
+    @staticmethod
+    def _concat_df_batches(dfs: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Concatenate DataFrames converted from batches of rows of the same result,
+        with the types `pd.DataFrame.from_records` would infer from all the rows
+        """
+        if len(dfs) == 1:
+            return dfs[0]
+        columns = dfs[0].columns
+        df = pd.concat(dfs, ignore_index=True)
+        # e.g. a batch with only nulls in a column inferred as object, and other
+        # batches inferred as float
+        mismatched = [
+            i for i in range(len(columns)) if len({d.dtypes.iat[i] for d in dfs}) > 1
+        ]
+        if not mismatched:
+            return df
+        series = [df.iloc[:, i] for i in range(len(columns))]
+        for i in mismatched:
+            series[i] = pd.DataFrame.from_records(
+                data=list(zip(series[i].to_numpy(dtype=object))),
+                columns=[columns[i]],
+                coerce_float=True,
+            ).iloc[:, 0]
+        df = pd.concat(series, axis=1)
+        df.columns = columns
+        return df
+
+    def get_df(
+        self,
+        sql: str,
+        schema: Optional[str] = None,
+        mutator: Optional[Callable] = None,
+        batch_size: int = 10000,
+    ) -> pd.DataFrame:
+        """
+        Run `sql` and return its result as a DataFrame
 
-                if mutator:
-                    mutator(df)
+        The rows are fetched in batches from a server-side cursor where the engine
+        spec supports them, and each batch is converted to a DataFrame before
+        fetching the next one, so the whole result is never held as Python objects.
+
+        :param sql: The SQL to run
+        :param schema: The schema to run the SQL in
+        :param mutator: Function called with the DataFrame to modify it
+        :param batch_size: Maximum number of rows fetched at once
+        :return: The result of the last statement of `sql`
+        """
+        dfs = list(self._fetch_df_batches(sql, schema, batch_size))
+        df = self._concat_df_batches(dfs) if dfs else pd.DataFrame()
+        del dfs
 
-                for k, v in df.dtypes.items():
-                    if v.type == numpy.object_ and needs_conversion(df[k]):
-                        df[k] = df[k].apply(utils.json_dumps_w_dates)
-                return df
+        if mutator:
+            mutator(df)
+
+        self._stringify_nested_columns(df)
+        return df
+
+    def get_df_batches(
+        self, sql: str, schema: Optional[str] = None, batch_size: int = 10000
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Run `sql` and lazily yield its result as DataFrames of at most `batch_size`
+        rows, so large results never need to be held in memory at once.
+
+        As batches are typed separately, integer columns with nulls are kept as
+        Python integers rather than floats, so they're the same in every batch.
+
+        :param sql: The SQL to run
+        :param schema: The schema to run the SQL in
+        :param batch_size: Maximum number of rows in each DataFrame
+        :return: Iterator over DataFrames
+        """
+        for df in self._fetch_df_batches(
+            sql, schema, batch_size, integer_object_nulls=True
+        ):
+            self._stringify_nested_columns(df)
+            yield df
 
     def compile_sqla_query(self, qry: Select, schema: Optional[str] = None) -> str:
         engine = self.get_sqla_engine(schema=schema)
@@ -21,9 +21,8 @@ import datetime
 import json
 import logging
 import re
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Sequence, Tuple, Type
 
-import numpy as np
 import pandas as pd
 import pyarrow as pa
 
@@ -32,6 +31,41 @@ from superset.utils import core as utils
 
 logger = logging.getLogger(__name__)
 
+# Arrow types that values are converted to when the generic database type
+# returned by `db_engine_spec.get_datatype` is known. Anything not matched here
+# (temporal, decimal and nested types, or missing type codes) falls back to
+# letting PyArrow infer the type from the values.
+DB_TYPE_TO_PA_TYPE: List[Tuple[Pattern, pa.DataType]] = [
+    (
+        re.compile(
+            r"^(TINY|SHORT|LONG|LONGLONG|INT24|((TINY|SMALL|MEDIUM|BIG)?INT(EGER)?))$",
+            re.IGNORECASE,
+        ),
+        pa.int64(),
+    ),
+    (
+        re.compile(
+            r"^(FLOAT|DOUBLE|REAL|DOUBLE PRECISION|FLOAT4|FLOAT8)$", re.IGNORECASE
+        ),
+        pa.float64(),
+    ),
+    (re.compile(r"^BOOL(EAN)?$", re.IGNORECASE), pa.bool_()),
+    (
+        re.compile(
+            r"^(STRING|TEXT|VAR_STRING|(N)?(VAR)?CHAR(ACTER)?(\(\d+\))?)$",
+            re.IGNORECASE,
+        ),
+        pa.string(),
+    ),
+]
+
+ARROW_CONVERSION_ERRORS = (
+    pa.lib.ArrowInvalid,
+    pa.lib.ArrowTypeError,
+    pa.lib.ArrowNotImplementedError,
+    TypeError,  # this is super hackey, https://issues.apache.org/jira/browse/ARROW-7855
+)
+
 
 def dedup(l: List[str], suffix: str = "__", case_sensitive: bool = True) -> List[str]:
     """De-duplicates a list of string by suffixing a counter
@@ -59,13 +93,17 @@ def dedup(l: List[str], suffix: str = "__", case_sensitive: bool = True) -> List
     return new_l
 
 
+# `json.dumps` builds a new encoder on every call when `default` is passed, which
+# adds up when stringifying every cell of a column
+_json_encoder = json.JSONEncoder(default=utils.json_iso_dttm_ser)
+
+
 def stringify(obj: Any) -> str:
-    return json.dumps(obj, default=utils.json_iso_dttm_ser)
+    return _json_encoder.encode(obj)
 
 
-def stringify_values(array: np.ndarray) -> np.ndarray:
-    vstringify: Callable = np.vectorize(stringify)
-    return vstringify(array)
+def stringify_values(array: Sequence[Any]) -> List[str]:
+    return [stringify(value) for value in array]
 
 
 class SupersetResultSet:
@@ -75,12 +113,31 @@ class SupersetResultSet:
         cursor_description: Tuple[Any, ...],
         db_engine_spec: Type[db_engine_specs.BaseEngineSpec],
     ):
-        data = data or []
+        self._load([data] if data else [], cursor_description, db_engine_spec)
+
+    @classmethod
+    def from_batches(
+        cls,
+        batches: Iterable[List[Tuple[Any, ...]]],
+        cursor_description: Tuple[Any, ...],
+        db_engine_spec: Type[db_engine_specs.BaseEngineSpec],
+    ) -> "SupersetResultSet":
+        """Build a result set from an iterable of row batches, e.g. the output of
+        `BaseEngineSpec.fetch_data_in_batches`. Each batch is converted to Arrow
+        as soon as it is consumed, so only one batch of Python objects is held
+        in memory at any time."""
+        result_set = cls.__new__(cls)
+        result_set._load(batches, cursor_description, db_engine_spec)
+        return result_set
+
+    def _load(
+        self,
+        batches: Iterable[List[Tuple[Any, ...]]],
+        cursor_description: Tuple[Any, ...],
+        db_engine_spec: Type[db_engine_specs.BaseEngineSpec],
+    ) -> None:
         column_names: List[str] = []
-        pa_data: List[pa.Array] = []
         deduped_cursor_desc: List[Tuple[Any, ...]] = []
-        numpy_dtype: List[Tuple[str, ...]] = []
-        stringified_arr: np.ndarray
 
         if cursor_description:
             # get deduped list of column names
@@ -92,54 +149,6 @@ class SupersetResultSet:
                 for column_name, description in zip(column_names, cursor_description)
             ]
 
-            # generate numpy structured array dtype
-            numpy_dtype = [(column_name, "object") for column_name in column_names]
-
-        # put data in a structured array so we can efficiently access each column.
-        # cast `data` as list due to MySQL (others?) wrapping results with a tuple.
-        array = np.array(list(data), dtype=numpy_dtype)
-        if array.size > 0:
-            for column in column_names:
-                try:
-                    pa_data.append(pa.array(array[column].tolist()))
-                except (
-                    pa.lib.ArrowInvalid,
-                    pa.lib.ArrowTypeError,
-                    pa.lib.ArrowNotImplementedError,
-                    TypeError,  # this is super hackey, https://issues.apache.org/jira/browse/ARROW-7855
-                ):
-                    # attempt serialization of values as strings
-                    stringified_arr = stringify_values(array[column])
-                    pa_data.append(pa.array(stringified_arr.tolist()))
-
-        if pa_data:
-            for i, column in enumerate(column_names):
-                if pa.types.is_nested(pa_data[i].type):
-                    # TODO: revisit nested column serialization once PyArrow updated with:
-                    # https://github.com/apache/arrow/pull/6199
-                    # Related issue: https://github.com/apache/incubator-superset/issues/8978
-                    stringified_arr = stringify_values(array[column])
-                    pa_data[i] = pa.array(stringified_arr.tolist())
-
-                elif pa.types.is_temporal(pa_data[i].type):
-                    # workaround for bug converting `psycopg2.tz.FixedOffsetTimezone` tzinfo values.
-                    # related: https://issues.apache.org/jira/browse/ARROW-5248
-                    sample = self.first_nonempty(array[column])
-                    if sample and isinstance(sample, datetime.datetime):
-                        try:
-                            if sample.tzinfo:
-                                tz = sample.tzinfo
-                                series = pd.Series(
-                                    array[column], dtype="datetime64[ns]"
-                                )
-                                series = pd.to_datetime(series).dt.tz_localize(tz)
-                                pa_data[i] = pa.Array.from_pandas(
-                                    series, type=pa.timestamp("ns", tz=tz)
-                                )
-                        except Exception as e:
-                            logger.exception(e)
-
-        self.table = pa.Table.from_arrays(pa_data, names=column_names)
         self._type_dict: Dict[str, Any] = {}
         try:
             # The driver may not be passing a cursor.description
@@ -151,6 +160,131 @@ class SupersetResultSet:
         except Exception as e:
             logger.exception(e)
 
+        # build the target schema up front so each column is converted straight
+        # to its type rather than having PyArrow infer it for every batch
+        pa_types = [
+            self.convert_db_type(self._type_dict.get(col)) for col in column_names
+        ]
+
+        chunks: List[List[pa.Array]] = [[] for _ in column_names]
+        for batch in batches:
+            for i, pa_array in enumerate(self._convert_batch(batch, pa_types)):
+                chunks[i].append(pa_array)
+
+        pa_data: List[pa.ChunkedArray] = []
+        if any(chunks):
+            pa_data = [self._combine_chunks(column_chunks) for column_chunks in chunks]
+
+        self.table = pa.Table.from_arrays(pa_data, names=column_names)
+
+    def _convert_batch(
+        self, data: List[Tuple[Any, ...]], pa_types: List[Optional[pa.DataType]]
+    ) -> List[pa.Array]:
+        """Convert a batch of rows to one Arrow array per column"""
+        if not data:
+            return []
+
+        # transpose the rows so each column can be accessed efficiently.
+        # cast `data` as list due to MySQL (others?) wrapping results with a tuple.
+        columns = list(zip(*list(data)))
+        return [
+            self._convert_column(values, pa_type)
+            for values, pa_type in zip(columns, pa_types)
+        ]
+
+    def _convert_column(
+        self, values: Sequence[Any], pa_type: Optional[pa.DataType]
+    ) -> pa.Array:
+        if pa_type is not None:
+            try:
+                return pa.array(values, type=pa_type)
+            except ARROW_CONVERSION_ERRORS:
+                # the driver returned values that don't match the reported type
+                pass
+
+        if isinstance(self.first_nonempty(values), (list, tuple, dict)):
+            # nested values always end up being stringified below, so skip
+            # having PyArrow infer a nested type first
+            return pa.array(stringify_values(values), type=pa.string())
+
+        try:
+            pa_array = pa.array(values)
+        except ARROW_CONVERSION_ERRORS:
+            # attempt serialization of values as strings
+            return pa.array(stringify_values(values), type=pa.string())
+
+        if pa.types.is_nested(pa_array.type):
+            # TODO: revisit nested column serialization once PyArrow updated with:
+            # https://github.com/apache/arrow/pull/6199
+            # Related issue: https://github.com/apache/incubator-superset/issues/8978
+            return pa.array(stringify_values(values), type=pa.string())
+
+        if pa.types.is_temporal(pa_array.type):
+            # workaround for bug converting `psycopg2.tz.FixedOffsetTimezone` tzinfo values.
+            # related: https://issues.apache.org/jira/browse/ARROW-5248
+            sample = self.first_nonempty(values)
+            if sample and isinstance(sample, datetime.datetime):
+                try:
+                    if sample.tzinfo:
+                        tz = sample.tzinfo
+                        series = pd.Series(values, dtype="datetime64[ns]")
+                        series = pd.to_datetime(series).dt.tz_localize(tz)
+                        return pa.Array.from_pandas(
+                            series, type=pa.timestamp("ns", tz=tz)
+                        )
+                except Exception as e:
+                    logger.exception(e)
+
+        return pa_array
+
+    @staticmethod
+    def _combine_chunks(chunks: List[pa.Array]) -> pa.ChunkedArray:
+        """Combine the per-batch arrays of a column into a single chunked array.
+
+        Batches are typed independently, so a column can end up with different
+        types across batches (e.g. a batch of only NULLs, or ints followed by
+        floats). These are reconciled into a single type, falling back to
+        strings when no common type can be inferred."""
+        types = {chunk.type for chunk in chunks if not pa.types.is_null(chunk.type)}
+        if len(types) > 1:
+            try:
+                return pa.chunked_array(
+                    [
+                        pa.array(
+                            [value for chunk in chunks for value in chunk.to_pylist()]
+                        )
+                    ]
+                )
+            except ARROW_CONVERSION_ERRORS:
+                chunks = [
+                    chunk
+                    if pa.types.is_string(chunk.type) or pa.types.is_null(chunk.type)
+                    else pa.array([stringify(value) for value in chunk.to_pylist()])
+                    for chunk in chunks
+                ]
+                types = {pa.string()}
+
+        pa_type = types.pop() if types else pa.null()
+        return pa.chunked_array(
+            [
+                chunk
+                if chunk.type == pa_type
+                else pa.array([None] * len(chunk), type=pa_type)
+                for chunk in chunks
+            ],
+            type=pa_type,
+        )
+
+    @staticmethod
+    def convert_db_type(db_type_str: Optional[str]) -> Optional[pa.DataType]:
+        """Given a generic database type, returns the Arrow type to convert to"""
+        if not db_type_str:
+            return None
+        for regex, pa_type in DB_TYPE_TO_PA_TYPE:
+            if regex.match(db_type_str):
+                return pa_type
+        return None
+
     @staticmethod
     def convert_pa_dtype(pa_dtype: pa.DataType) -> Optional[str]:
         if pa.types.is_boolean(pa_dtype):
@@ -17,9 +17,22 @@
 # pylint: disable=C,R,W
 """A set of constants and methods to manage permissions and security"""
 import logging
-from typing import Any, Callable, List, Optional, Set, Tuple, TYPE_CHECKING, Union
+import uuid
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
 
-from flask import current_app, g
+from flask import current_app, g, has_request_context
 from flask_appbuilder import Model
 from flask_appbuilder.security.sqla import models as ab_models
 from flask_appbuilder.security.sqla.manager import SecurityManager
@@ -35,8 +48,9 @@ from flask_appbuilder.security.views import (
     ViewMenuModelView,
 )
 from flask_appbuilder.widgets import ListWidget
-from sqlalchemy import or_
+from sqlalchemy import event, inspect, or_
 from sqlalchemy.engine.base import Connection
+from sqlalchemy.orm import object_session
 from sqlalchemy.orm.mapper import Mapper
 
 from superset import sql_parse
@@ -53,6 +67,13 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+SECURITY_CACHE_VERSION_KEY = "security_cache_version"
+
+
+class RLSFilterClause(NamedTuple):
+    id: int  # pylint: disable=invalid-name
+    clause: str
+
 
 class SupersetSecurityListWidget(ListWidget):
     """
@@ -121,6 +142,8 @@ class SupersetSecurityManager(SecurityManager):
         "LogModelView",
         "Security",
         "RowLevelSecurityFiltersModelView",
+        "Rollup Tables",
+        "SqlaTableRollupModelView",
     } | USER_MODEL_VIEWS
 
     ALPHA_ONLY_VIEW_MENUS = {"Upload a CSV"}
@@ -152,6 +175,162 @@ class SupersetSecurityManager(SecurityManager):
 
     ACCESSIBLE_PERMS = {"can_userinfo"}
 
+    def __init__(self, appbuilder: Any) -> None:
+        super().__init__(appbuilder)
+        for model in (self.role_model, self.permissionview_model):
+            for identifier in ("after_insert", "after_update", "after_delete"):
+                event.listen(model, identifier, self.on_security_model_change)
+        event.listen(self.user_model, "after_update", self.on_user_update)
+
+    def _get_security_cache_version(self, request_cache: Dict[str, Any]) -> Any:
+        from superset.extensions import cache_manager
+
+        if SECURITY_CACHE_VERSION_KEY not in request_cache:
+            version = cache_manager.cache.get(SECURITY_CACHE_VERSION_KEY)
+            request_cache[SECURITY_CACHE_VERSION_KEY] = version or 0
+        return request_cache[SECURITY_CACHE_VERSION_KEY]
+
+    def get_security_cache_value(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Return a value resolved from the security model, cached for the duration of
+        the request and for `SECURITY_CACHE_TIMEOUT` seconds in the shared cache.
+
+        The shared cache keys are versioned, the version being bumped whenever
+        roles, permissions or row level security filters change, see
+        `invalidate_security_cache`.
+
+        :param key: The cache key of the value, e.g. including the user id
+        :param func: Resolves the value from the metadata database
+        :returns: The value
+        """
+        from superset.extensions import cache_manager
+
+        request_cache: Dict[str, Any] = {}
+        if has_request_context():
+            if "security_cache" not in g:
+                g.security_cache = {}
+            request_cache = g.security_cache
+        if key in request_cache:
+            return request_cache[key]
+
+        timeout = current_app.config["SECURITY_CACHE_TIMEOUT"]
+        cache = cache_manager.cache if timeout else None
+        value = None
+        if cache:
+            version = self._get_security_cache_version(request_cache)
+            cache_key = f"security/{version}/{key}"
+            value = cache.get(cache_key)
+        if value is None:
+            value = func()
+            if cache:
+                cache.set(cache_key, value, timeout=timeout)
+        request_cache[key] = value
+        return value
+
+    def invalidate_security_cache(self) -> None:
+        """Invalidate the cached permissions and row level security filters"""
+        from superset.extensions import cache_manager
+
+        if has_request_context():
+            g.pop("security_cache", None)
+        if cache_manager.cache:
+            cache_manager.cache.set(
+                SECURITY_CACHE_VERSION_KEY, uuid.uuid4().hex, timeout=0
+            )
+
+    def on_security_model_change(
+        self, mapper: Mapper, connection: Connection, target: Model
+    ) -> None:
+        """
+        Invalidate the security cache once the change of a role, permission or row
+        level security filter is committed, so the values cached in between can't
+        be the ones from before the change.
+        """
+        session = object_session(target)
+        if session is None:
+            self.invalidate_security_cache()
+            return
+        event.listen(
+            session,
+            "after_commit",
+            lambda session: self.invalidate_security_cache(),
+            once=True,
+        )
+
+    def on_user_update(
+        self, mapper: Mapper, connection: Connection, target: Model
+    ) -> None:
+        # users are updated on each login, only their roles matter
+        if inspect(target).attrs.roles.history.has_changes():
+            self.on_security_model_change(mapper, connection, target)
+
+    def _query_permissions(
+        self, user_id: Optional[int] = None, role_name: Optional[str] = None
+    ) -> FrozenSet[Tuple[str, str]]:
+        from superset import db
+
+        permission_view = self.permissionview_model
+        query = (
+            db.session.query(self.permission_model.name, self.viewmenu_model.name)
+            .select_from(permission_view)
+            .join(
+                self.permission_model,
+                permission_view.permission_id == self.permission_model.id,
+            )
+            .join(
+                self.viewmenu_model,
+                permission_view.view_menu_id == self.viewmenu_model.id,
+            )
+            .join(
+                assoc_permissionview_role,
+                assoc_permissionview_role.c.permission_view_id == permission_view.id,
+            )
+        )
+        if user_id is not None:
+            query = query.join(
+                assoc_user_role,
+                assoc_user_role.c.role_id == assoc_permissionview_role.c.role_id,
+            ).filter(assoc_user_role.c.user_id == user_id)
+        else:
+            query = query.join(
+                self.role_model,
+                self.role_model.id == assoc_permissionview_role.c.role_id,
+            ).filter(self.role_model.name == role_name)
+        return frozenset(tuple(row) for row in query.all())
+
+    def get_user_permissions(self, user: Model) -> FrozenSet[Tuple[str, str]]:
+        """
+        Return the permission and view menu names of the permissions of the user,
+        through all of their roles.
+
+        :param user: The user
+        :returns: The permission/view menu name pairs
+        """
+        return self.get_security_cache_value(
+            f"user/{user.id}/permissions", lambda: self._query_permissions(user.id)
+        )
+
+    def get_role_permissions(self, role_name: str) -> FrozenSet[Tuple[str, str]]:
+        """
+        Return the permission and view menu names of the permissions of the role.
+
+        :param role_name: The role name
+        :returns: The permission/view menu name pairs
+        """
+        return self.get_security_cache_value(
+            f"role/{role_name}/permissions",
+            lambda: self._query_permissions(role_name=role_name),
+        )
+
+    def _has_view_access(
+        self, user: Model, permission_name: str, view_name: str
+    ) -> bool:
+        return (permission_name, view_name) in self.get_user_permissions(user)
+
+    def is_item_public(self, permission_name: str, view_name: str) -> bool:
+        permissions = self.get_role_permissions(self.auth_role_public)
+        return (permission_name, view_name) in permissions
+
     def get_schema_perm(
         self, database: Union["Database", str], schema: Optional[str] = None
     ) -> Optional[str]:
@@ -417,37 +596,16 @@ class SupersetSecurityManager(SecurityManager):
         return db.session.query(self.role_model).filter_by(name="Public").first()
 
     def user_view_menu_names(self, permission_name: str) -> Set[str]:
-        from superset import db
-
-        base_query = (
-            db.session.query(self.viewmenu_model.name)
-            .join(self.permissionview_model)
-            .join(self.permission_model)
-            .join(assoc_permissionview_role)
-            .join(self.role_model)
-        )
+        from superset import conf
 
         if not g.user.is_anonymous:
-            # filter by user id
-            view_menu_names = (
-                base_query.join(assoc_user_role)
-                .join(self.user_model)
-                .filter(self.user_model.id == g.user.id)
-                .filter(self.permission_model.name == permission_name)
-            ).all()
-            return set([s.name for s in view_menu_names])
-
-        # Properly treat anonymous user
-        public_role = self.get_public_role()
-        if public_role:
-            # filter by public role
-            view_menu_names = (
-                base_query.filter(self.role_model.id == public_role.id).filter(
-                    self.permission_model.name == permission_name
-                )
-            ).all()
-            return set([s.name for s in view_menu_names])
-        return set()
+            permissions = self.get_user_permissions(g.user)
+        elif conf.get("PUBLIC_ROLE_LIKE_GAMMA", False):
+            # Properly treat anonymous user
+            permissions = self.get_role_permissions("Public")
+        else:
+            return set()
+        return {view_name for name, view_name in permissions if name == permission_name}
 
     def schemas_accessible_by_user(
         self, database: "Database", schemas: List[str], hierarchical: bool = True
@@ -893,38 +1051,53 @@ class SupersetSecurityManager(SecurityManager):
 
         self.assert_datasource_permission(viz.datasource)
 
-    def get_rls_filters(self, table: "BaseDatasource"):
+    def _query_rls_filters(self, user_id: int) -> Dict[int, List[RLSFilterClause]]:
+        from superset import db
+        from superset.connectors.sqla.models import (
+            RLSFilterRoles,
+            RowLevelSecurityFilter,
+        )
+
+        user_roles = (
+            db.session.query(assoc_user_role.c.role_id)
+            .filter(assoc_user_role.c.user_id == user_id)
+            .subquery()
+        )
+        filter_roles = (
+            db.session.query(RLSFilterRoles.c.rls_filter_id)
+            .filter(RLSFilterRoles.c.role_id.in_(user_roles))
+            .subquery()
+        )
+        query = (
+            db.session.query(
+                RowLevelSecurityFilter.table_id,
+                RowLevelSecurityFilter.id,
+                RowLevelSecurityFilter.clause,
+            )
+            .filter(RowLevelSecurityFilter.id.in_(filter_roles))
+            .order_by(RowLevelSecurityFilter.id)
+        )
+        filters: Dict[int, List[RLSFilterClause]] = {}
+        for table_id, filter_id, clause in query.all():
+            filters.setdefault(table_id, []).append(RLSFilterClause(filter_id, clause))
+        return filters
+
+    def get_rls_filters(self, table: "BaseDatasource") -> List[RLSFilterClause]:
         """
         Retrieves the appropriate row level security filters for the current user and the passed table.
 
+        The filters of all the tables are resolved at once for the user, and cached,
+        see `get_security_cache_value`.
+
         :param table: The table to check against
         :returns: A list of filters.
         """
         if hasattr(g, "user") and hasattr(g.user, "id"):
-            from superset import db
-            from superset.connectors.sqla.models import (
-                RLSFilterRoles,
-                RowLevelSecurityFilter,
-            )
-
-            user_roles = (
-                db.session.query(assoc_user_role.c.role_id)
-                .filter(assoc_user_role.c.user_id == g.user.id)
-                .subquery()
-            )
-            filter_roles = (
-                db.session.query(RLSFilterRoles.c.id)
-                .filter(RLSFilterRoles.c.role_id.in_(user_roles))
-                .subquery()
-            )
-            query = (
-                db.session.query(
-                    RowLevelSecurityFilter.id, RowLevelSecurityFilter.clause
-                )
-                .filter(RowLevelSecurityFilter.table_id == table.id)
-                .filter(RowLevelSecurityFilter.id.in_(filter_roles))
+            user_id = g.user.id
+            filters = self.get_security_cache_value(
+                f"user/{user_id}/rls_filters", lambda: self._query_rls_filters(user_id)
             )
-            return query.all()
+            return filters.get(table.id, [])
         return []
 
     def get_rls_ids(self, table: "BaseDatasource") -> List[int]:
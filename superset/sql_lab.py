@@ -22,7 +22,6 @@ from sys import getsizeof
 from typing import Dict, List, Optional, Tuple, Union
 
 import backoff
-import msgpack
 import pyarrow as pa
 import simplejson as json
 import sqlalchemy
@@ -45,6 +44,7 @@ from superset.extensions import celery_app
 from superset.models.sql_lab import Query
 from superset.result_set import SupersetResultSet
 from superset.sql_parse import ParsedQuery
+from superset.utils import results_payload
 from superset.utils.core import (
     json_iso_dttm_ser,
     QuerySource,
@@ -59,7 +59,10 @@ stats_logger = config["STATS_LOGGER"]
 SQLLAB_TIMEOUT = config["SQLLAB_ASYNC_TIME_LIMIT_SEC"]
 SQLLAB_HARD_TIMEOUT = SQLLAB_TIMEOUT + 60
 SQL_MAX_ROW = config["SQL_MAX_ROW"]
+SQLLAB_FETCH_BATCH_SIZE = config["SQLLAB_FETCH_BATCH_SIZE"]
 SQL_QUERY_MUTATOR = config["SQL_QUERY_MUTATOR"]
+RESULTS_BACKEND_COMPRESSION = config["RESULTS_BACKEND_COMPRESSION"]
+RESULTS_BACKEND_BATCH_SIZE = config["RESULTS_BACKEND_BATCH_SIZE"]
 log_query = config["QUERY_LOGGER"]
 logger = logging.getLogger(__name__)
 
@@ -244,6 +247,14 @@ def execute_sql_statement(sql_statement, query, user_name, session, cursor, log_
                 query.id,
                 str(query.to_dict()),
             )
+            if SQLLAB_FETCH_BATCH_SIZE:
+                batches = db_engine_spec.fetch_data_in_batches(
+                    cursor, query.limit, SQLLAB_FETCH_BATCH_SIZE
+                )
+                logger.debug("Query %d: Fetching cursor description", query.id)
+                return SupersetResultSet.from_batches(
+                    batches, cursor.description, db_engine_spec
+                )
             data = db_engine_spec.fetch_data(cursor, query.limit)
 
     except SoftTimeLimitExceeded as e:
@@ -268,7 +279,9 @@ def _serialize_payload(
 ) -> Union[bytes, str]:
     logger.debug(f"Serializing to msgpack: {use_msgpack}")
     if use_msgpack:
-        return msgpack.dumps(payload, default=json_iso_dttm_ser, use_bin_type=True)
+        return results_payload.serialize_payload(
+            payload, RESULTS_BACKEND_COMPRESSION, RESULTS_BACKEND_BATCH_SIZE
+        )
 
     return json.dumps(payload, default=json_iso_dttm_ser, ignore_nan=True)
 
@@ -278,22 +291,14 @@ def _serialize_and_expand_data(
     db_engine_spec: BaseEngineSpec,
     use_msgpack: Optional[bool] = False,
     expand_data: bool = False,
-) -> Tuple[Union[bytes, str], list, list, list]:
+) -> Tuple[Union[list, pa.Table], list, list, list]:
     selected_columns: List[Dict] = result_set.columns
     expanded_columns: List[Dict]
 
     if use_msgpack:
-        with stats_timing(
-            "sqllab.query.results_backend_pa_serialization", stats_logger
-        ):
-            data = (
-                pa.default_serialization_context()
-                .serialize(result_set.pa_table)
-                .to_buffer()
-                .to_pybytes()
-            )
-
-        # expand when loading data from results backend
+        # the table is serialized along with the rest of the payload, and
+        # expanded when loading data from results backend
+        data = result_set.pa_table
         all_columns, expanded_columns = (selected_columns, [])
     else:
         df = result_set.to_pandas_df()
@@ -424,7 +429,11 @@ def execute_sql_statements(
             if cache_timeout is None:
                 cache_timeout = config["CACHE_DEFAULT_TIMEOUT"]
 
-            compressed = zlib_compress(serialized_payload)
+            if results_payload.is_versioned_payload(serialized_payload):
+                # the data of versioned payloads is already compressed
+                compressed = serialized_payload
+            else:
+                compressed = zlib_compress(serialized_payload)
             logger.debug(
                 f"*** serialized payload size: {getsizeof(serialized_payload)}"
             )
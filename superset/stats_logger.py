@@ -47,6 +47,9 @@ class BaseStatsLogger:
         """Setup a gauge"""
         raise NotImplementedError()
 
+    def set_gauge(self, key, value):
+        """Set the value of a gauge, not reported unless implemented"""
+
 
 class DummyStatsLogger(BaseStatsLogger):
     def incr(self, key):
@@ -65,6 +68,11 @@ class DummyStatsLogger(BaseStatsLogger):
             (Fore.CYAN + "[stats_logger] (gauge) " + f"{key}" + Style.RESET_ALL)
         )
 
+    def set_gauge(self, key, value):
+        logger.debug(
+            (Fore.CYAN + f"[stats_logger] (gauge) {key} | {value}" + Style.RESET_ALL)
+        )
+
 
 try:
     from statsd import StatsClient
@@ -97,6 +105,9 @@ try:
             # pylint: disable=no-value-for-parameter
             self.client.gauge(key)
 
+        def set_gauge(self, key, value):
+            self.client.gauge(key, value)
+
 
 except Exception:  # pylint: disable=broad-except
     pass
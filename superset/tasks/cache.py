@@ -22,14 +22,18 @@ from urllib import request
 from urllib.error import URLError
 
 from celery.utils.log import get_task_logger
+from flask import g
 from sqlalchemy import and_, func
 
-from superset import app, db
+from superset import app, cache, db, security_manager, viz
+from superset.common.query_context import QueryContext
+from superset.connectors.connector_registry import ConnectorRegistry
 from superset.extensions import celery_app
 from superset.models.core import Log
 from superset.models.dashboard import Dashboard
 from superset.models.slice import Slice
 from superset.models.tags import Tag, TaggedObject
+from superset.utils.cache import release_cache_lock
 from superset.utils.core import parse_human_datetime
 
 logger = get_task_logger(__name__)
@@ -292,3 +296,52 @@ def cache_warmup(strategy_name, *args, **kwargs):
             results["errors"].append(url)
 
     return results
+
+
+def refresh_request_context(form_data=None):
+    """
+    The request context refreshing cached data runs in.
+
+    A request context is required by the Jinja macros reading the request, such as
+    `url_param` and `filter_values`. They read the URL parameters and filters from
+    the posted form data, so the chart's form data is posted as in explore.
+    """
+    data = {"form_data": json.dumps(form_data)} if form_data else None
+    return app.test_request_context(method="POST", data=data)
+
+
+@celery_app.task(name="cache-refresh-chart")
+def refresh_chart_cache(
+    datasource_type, datasource_id, form_data, refresh_key, username=None
+):
+    """
+    Refresh the stale cached data of a chart, while it's served to its viewers.
+
+    The chart's queries are run as the user who requested the stale data, so row
+    level security filters, and thus the cache keys, are the same. All of them are
+    refreshed at once, under the lock on the chart's `refresh_key`.
+    """
+    with refresh_request_context(form_data):
+        try:
+            g.user = security_manager.find_user(username=username) if username else None
+            datasource = ConnectorRegistry.get_datasource(
+                datasource_type, datasource_id, db.session
+            )
+            viz_type = form_data.get("viz_type", "table")
+            viz_obj = viz.viz_types[viz_type](
+                datasource, form_data=form_data, force=True
+            )
+            viz_obj.get_payload()
+        finally:
+            release_cache_lock(cache, refresh_key)
+
+
+@celery_app.task(name="cache-refresh-query-context")
+def refresh_query_context_cache(query_context, cache_key, username=None):
+    """Refresh the stale cached data of a query context, see `refresh_chart_cache`"""
+    with refresh_request_context():
+        try:
+            g.user = security_manager.find_user(username=username) if username else None
+            QueryContext(**query_context, force=True).get_payload()
+        finally:
+            release_cache_lock(cache, cache_key)
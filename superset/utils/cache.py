@@ -14,9 +14,20 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, DefaultDict, Dict, Iterable, Optional
+
 from flask import request
+from flask_caching import Cache
 
 from superset.extensions import cache_manager
+from superset.stats_logger import BaseStatsLogger
+
+logger = logging.getLogger(__name__)
 
 
 def view_cache_key(*_, **__) -> str:
@@ -71,3 +82,170 @@ def memoized_func(key=view_cache_key, attribute_in_key=None):
         return wrapped_f
 
     return wrap
+
+
+def _lock_key(key: str) -> str:
+    return f"{key}__lock"
+
+
+def acquire_cache_lock(cache: Cache, key: str, timeout: int) -> bool:
+    """
+    Try to acquire a lock on computing the value of a cache key, so concurrent
+    requests missing the cache on the same key don't all compute it.
+
+    The lock relies on the atomicity of the backend's `add`, and expires after
+    `timeout` seconds should its holder never release it.
+
+    :param cache: The cache the value is stored in
+    :param key: The cache key of the value
+    :param timeout: Seconds after which the lock expires
+    :return: Whether the lock was acquired
+    """
+    return bool(cache.add(_lock_key(key), True, timeout=timeout))
+
+
+def release_cache_lock(cache: Cache, key: str) -> None:
+    cache.delete(_lock_key(key))
+
+
+def wait_for_cache_value(
+    cache: Cache, key: str, timeout: float, interval: float = 0.1
+) -> Optional[Any]:
+    """
+    Wait for the holder of the lock on a cache key to store its value.
+
+    :param cache: The cache the value is stored in
+    :param key: The cache key of the value
+    :param timeout: Maximum number of seconds to wait
+    :param interval: Seconds between polls of the cache
+    :return: The cached value, or None if the lock was released without storing
+        a value or the timeout expired
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if not cache.get(_lock_key(key)) or time.monotonic() >= deadline:
+            return None
+        time.sleep(interval)
+
+
+def wait_for_cache_lock(
+    cache: Cache, key: str, timeout: float, interval: float = 0.1
+) -> Optional[Any]:
+    """
+    Wait for the holder of the lock on a cache key to release it, e.g. to refresh
+    a value already in the cache.
+
+    :param cache: The cache the value is stored in
+    :param key: The cache key of the value
+    :param timeout: Maximum number of seconds to wait
+    :param interval: Seconds between polls of the cache
+    :return: The value cached once the lock is released or the timeout expired
+    """
+    deadline = time.monotonic() + timeout
+    while cache.get(_lock_key(key)) and time.monotonic() < deadline:
+        time.sleep(interval)
+    return cache.get(key)
+
+
+def is_cache_value_stale(cached_dttm: Optional[str], timeout: Optional[int]) -> bool:
+    """
+    Whether a value cached at `cached_dttm`, an ISO formatted UTC datetime, has
+    outlived its cache timeout but is kept in the cache for a grace period.
+    """
+    if not cached_dttm or not timeout:
+        return False
+    age = datetime.utcnow() - datetime.strptime(cached_dttm, "%Y-%m-%dT%H:%M:%S")
+    return age.total_seconds() > timeout
+
+
+def cache_timeout_with_grace_period(timeout: int, grace_period: int) -> int:
+    """The timeout to store a value with to serve it stale for a grace period"""
+    # a timeout of 0 means the value never expires
+    return timeout + grace_period if timeout else timeout
+
+
+class CacheBatch:
+    """
+    Batches the cache round trips of queries resolved together, e.g. the charts of
+    a dashboard or the queries of a chart.
+
+    The values of all the queries are read with one `get_many` by `prefetch`, then
+    served by `get` without a round trip. Writes that don't need to be visible to
+    other requests right away are queued with `set` while the batch is open, i.e.
+    within `with batch:`, and written with one `set_many` per timeout when the
+    outermost block exits. Backends like Redis implement both with a single
+    command or pipeline. The batch can be shared by threads.
+    """
+
+    def __init__(
+        self, cache: Cache, stats_logger: Optional[BaseStatsLogger] = None
+    ) -> None:
+        self.cache = cache
+        self.stats_logger = stats_logger
+        self.hits = 0
+        self.misses = 0
+        self._values: Dict[str, Any] = {}
+        self._pending: DefaultDict[Optional[int], Dict[str, Any]] = defaultdict(dict)
+        self._depth = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "CacheBatch":
+        with self._lock:
+            self._depth += 1
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        with self._lock:
+            self._depth -= 1
+            pending = self._pending if self._depth == 0 else {}
+            if pending:
+                self._pending = defaultdict(dict)
+        for timeout, values in pending.items():
+            try:
+                self.cache.set_many(values, timeout=timeout)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("Could not cache %d keys", len(values))
+                logger.exception(e)
+
+    def prefetch(self, keys: Iterable[str]) -> None:
+        """Read the values of cache keys in a single round trip"""
+        with self._lock:
+            keys = [key for key in dict.fromkeys(keys) if key not in self._values]
+        if not keys:
+            return
+        values = self.cache.get_many(*keys)
+        hits = sum(value is not None for value in values)
+        with self._lock:
+            self._values.update(zip(keys, values))
+            self.hits += hits
+            self.misses += len(keys) - hits
+        logger.info(
+            "Prefetched %d cache keys: %d hits, %d misses",
+            len(keys),
+            hits,
+            len(keys) - hits,
+        )
+        if self.stats_logger:
+            # timings aggregate the counts of all prefetches, unlike gauges
+            self.stats_logger.incr("cache_batch_get_many")
+            self.stats_logger.timing("cache_batch_hits", hits)
+            self.stats_logger.timing("cache_batch_misses", len(keys) - hits)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a prefetched value, or read it from the cache if not prefetched"""
+        with self._lock:
+            if key in self._values:
+                # values are only read once, don't keep them around
+                return self._values.pop(key)
+        return self.cache.get(key)
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None) -> None:
+        """Write a value, once the batch is closed if it's open"""
+        with self._lock:
+            if self._depth:
+                self._pending[timeout][key] = value
+                return
+        self.cache.set(key, value, timeout=timeout)
@@ -0,0 +1,158 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+""" Codecs serializing the chart query payloads stored in the data cache.
+
+Chart queries cache a dict holding the resulting DataFrame under the `df` key,
+along with metadata such as the query and the time it was cached. Versioned values
+are laid out as::
+
+    | magic | version | format | codec | meta size | data size | meta    | data |
+    | 4B    | 1B      | 1B     | 1B    | 4B        | 8B        | msgpack |      |
+
+where the data is the DataFrame as an Arrow IPC stream, compressed with the codec,
+or the whole value pickled when the DataFrame can't be represented in Arrow.
+
+Values that don't start with the magic bytes are the pickled dicts written by
+previous versions, which every codec can still read.
+"""
+import logging
+import pickle as pkl
+import struct
+from typing import Any, Dict, Optional
+
+import msgpack
+import pandas as pd
+import pyarrow as pa
+
+from superset.utils.core import json_iso_dttm_ser
+from superset.utils.results_payload import (
+    CODEC_NAMES,
+    CODECS,
+    ipc_to_table,
+    table_to_ipc,
+)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SSCV"
+VERSION = 1
+HEADER = struct.Struct("!4sBBBIQ")
+
+FORMAT_ARROW = 0
+FORMAT_PICKLE = 1
+
+
+def is_versioned_value(blob: Any) -> bool:
+    return isinstance(blob, bytes) and blob[: len(MAGIC)] == MAGIC
+
+
+class BaseCacheCodec:
+    """
+    Serializes chart query payloads to the values stored in the data cache.
+
+    All codecs read values written by any other codec, so the codec can be changed
+    without flushing the cache. Values read that aren't in the format of the
+    configured codec are rewritten, see `is_current`.
+    """
+
+    def dumps(self, value: Dict[str, Any]) -> bytes:
+        raise NotImplementedError()
+
+    def is_current(self, blob: bytes) -> bool:
+        """Whether `blob` is in the format written by this codec"""
+        raise NotImplementedError()
+
+    def loads(self, blob: bytes) -> Dict[str, Any]:
+        if not is_versioned_value(blob):
+            return pkl.loads(blob)
+
+        _, version, data_format, codec_id, meta_size, data_size = HEADER.unpack_from(
+            blob
+        )
+        if version > VERSION:
+            raise ValueError(f"Unsupported cache value version: {version}")
+        position = HEADER.size + meta_size
+        data = pa.py_buffer(blob).slice(position)
+
+        if data_format == FORMAT_PICKLE:
+            return pkl.loads(data)
+
+        value = msgpack.loads(blob[HEADER.size : position], raw=False)
+        compression = CODEC_NAMES[codec_id]
+        if compression:
+            data = pa.decompress(data, decompressed_size=data_size, codec=compression)
+        # integer columns with nulls are read back as Python integers, as built by
+        # the pandas frames of query results, not as floats losing precision
+        value["df"] = ipc_to_table(data).to_pandas(
+            date_as_object=True, integer_object_nulls=True
+        )
+        return value
+
+
+class PickleCacheCodec(BaseCacheCodec):
+    """Pickles the whole value, as done by previous versions"""
+
+    def dumps(self, value: Dict[str, Any]) -> bytes:
+        return pkl.dumps(value, protocol=pkl.HIGHEST_PROTOCOL)
+
+    def is_current(self, blob: bytes) -> bool:
+        return not is_versioned_value(blob)
+
+
+class ArrowCacheCodec(BaseCacheCodec):
+    """
+    Stores the DataFrame as a compressed Arrow IPC stream, which is more compact
+    and much faster to load than a pickled DataFrame, and doesn't depend on the
+    version of pandas.
+
+    :param compression: Arrow compression codec, one of "lz4", "zstd", "snappy",
+        "gzip", "brotli" or None
+    """
+
+    def __init__(self, compression: Optional[str] = "lz4") -> None:
+        if compression not in CODECS:
+            raise ValueError(f"Unsupported compression codec: {compression}")
+        self.compression = compression
+
+    def dumps(self, value: Dict[str, Any]) -> bytes:
+        df: pd.DataFrame = value["df"]
+        try:
+            buf = table_to_ipc(pa.Table.from_pandas(df))
+        except (pa.lib.ArrowException, TypeError, ValueError) as ex:
+            # e.g. object columns mixing types, or duplicate column names
+            logger.info("Pickling cache value not representable in Arrow: %s", ex)
+            data = pkl.dumps(value, protocol=pkl.HIGHEST_PROTOCOL)
+            header = HEADER.pack(MAGIC, VERSION, FORMAT_PICKLE, 0, 0, len(data))
+            return header + data
+
+        meta = {key: val for key, val in value.items() if key != "df"}
+        meta_bytes = msgpack.dumps(meta, default=json_iso_dttm_ser, use_bin_type=True)
+        data_size = buf.size
+        if self.compression:
+            buf = pa.compress(buf, codec=self.compression)
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            FORMAT_ARROW,
+            CODECS[self.compression],
+            len(meta_bytes),
+            data_size,
+        )
+        return b"".join([header, meta_bytes, buf.to_pybytes()])
+
+    def is_current(self, blob: bytes) -> bool:
+        return is_versioned_value(blob)
@@ -24,9 +24,12 @@ import logging
 import os
 import signal
 import smtplib
+import threading
 import traceback
 import uuid
 import zlib
+from collections import OrderedDict
+from concurrent.futures import as_completed, ThreadPoolExecutor
 from datetime import date, datetime, time, timedelta
 from email.mime.application import MIMEApplication
 from email.mime.image import MIMEImage
@@ -34,8 +37,20 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formatdate
 from enum import Enum
-from time import struct_time
-from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+from time import monotonic, struct_time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 from urllib.parse import unquote_plus
 
 import bleach
@@ -46,7 +61,16 @@ import parsedatetime
 import sqlalchemy as sa
 from dateutil.parser import parse
 from dateutil.relativedelta import relativedelta
-from flask import current_app, flash, Flask, g, Markup, render_template
+from flask import (
+    copy_current_request_context,
+    current_app,
+    flash,
+    Flask,
+    g,
+    has_request_context,
+    Markup,
+    render_template,
+)
 from flask_appbuilder import SQLA
 from flask_appbuilder.security.sqla.models import User
 from flask_babel import gettext as __, lazy_gettext as _
@@ -63,6 +87,11 @@ try:
 except ImportError:
     pass
 
+try:
+    from pandas.core.tools.datetimes import _guess_datetime_format_for_array
+except ImportError:
+    _guess_datetime_format_for_array = None
+
 
 logging.getLogger("MARKDOWN").setLevel(logging.INFO)
 logger = logging.getLogger(__name__)
@@ -103,6 +132,16 @@ def flasher(msg, severity=None):
             logger.info(msg)
 
 
+MEMOIZED_MAX_SIZE = 1024
+
+
+class MemoizedInfo(NamedTuple):
+    hits: int
+    misses: int
+    size: int
+    max_size: Optional[int]
+
+
 class _memoized:
     """Decorator that caches a function's return value each time it is called
 
@@ -110,31 +149,102 @@ class _memoized:
     not re-evaluated.
 
     Define ``watch`` as a tuple of attribute names if this Decorator
-    should account for instance variable changes.
+    should account for instance variable changes. Methods cache their values per
+    instance, unless ``shared`` is True, in which case instances whose watched
+    attributes are equal share their values.
+
+    At most ``max_size`` values are cached, evicting the least recently used ones,
+    and values expire after ``timeout`` seconds if set. ``on_evict`` is called with
+    the values evicted or expired, e.g. to release their resources. The cache is
+    thread safe, and counts its hits and misses, see `cache_info`.
     """
 
-    def __init__(self, func, watch=()):
+    def __init__(
+        self,
+        func,
+        watch=(),
+        shared=False,
+        max_size=MEMOIZED_MAX_SIZE,
+        timeout=None,
+        on_evict=None,
+    ):
         self.func = func
-        self.cache = {}
+        self.cache = OrderedDict()
         self.is_method = False
-        self.watch = watch
-
-    def __call__(self, *args, **kwargs):
+        self.watch = watch or ()
+        self.shared = shared
+        self.max_size = max_size
+        self.timeout = timeout
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _key(self, args, kwargs):
         key = [args, frozenset(kwargs.items())]
         if self.is_method:
             key.append(tuple([getattr(args[0], v, None) for v in self.watch]))
-        key = tuple(key)
-        if key in self.cache:
-            return self.cache[key]
+            if self.shared:
+                key[0] = args[1:]
+        return tuple(key)
+
+    def _evict(self, values):
+        if self.on_evict:
+            for value in values:
+                try:
+                    self.on_evict(value)
+                except Exception as e:
+                    logger.exception(e)
+
+    def __call__(self, *args, **kwargs):
         try:
-            value = self.func(*args, **kwargs)
-            self.cache[key] = value
-            return value
+            key = self._key(args, kwargs)
+            hash(key)
         except TypeError:
             # uncachable -- for instance, passing a list as an argument.
             # Better to not cache than to blow up entirely.
             return self.func(*args, **kwargs)
 
+        now = monotonic()
+        expired = []
+        with self.lock:
+            if key in self.cache:
+                value, expires_at = self.cache[key]
+                if expires_at is None or now < expires_at:
+                    self.cache.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.cache[key]
+                expired.append(value)
+            self.misses += 1
+        self._evict(expired)
+
+        # not holding the lock while computing the value, which can be slow
+        value = self.func(*args, **kwargs)
+
+        expires_at = now + self.timeout if self.timeout else None
+        evicted = []
+        with self.lock:
+            if key in self.cache:
+                # computed concurrently by another thread, keep the cached value
+                evicted.append(value)
+                value = self.cache[key][0]
+            else:
+                self.cache[key] = (value, expires_at)
+                while self.max_size and len(self.cache) > self.max_size:
+                    evicted.append(self.cache.popitem(last=False)[1][0])
+        self._evict(evicted)
+        return value
+
+    def cache_info(self) -> MemoizedInfo:
+        return MemoizedInfo(self.hits, self.misses, len(self.cache), self.max_size)
+
+    def clear(self) -> None:
+        with self.lock:
+            values = [value for value, _ in self.cache.values()]
+            self.cache.clear()
+        self._evict(values)
+
     def __repr__(self):
         """Return the function's docstring."""
         return self.func.__doc__
@@ -146,13 +256,27 @@ class _memoized:
         return functools.partial(self.__call__, obj)
 
 
-def memoized(func=None, watch=None):
+def memoized(
+    func=None,
+    watch=None,
+    shared=False,
+    max_size=MEMOIZED_MAX_SIZE,
+    timeout=None,
+    on_evict=None,
+):
     if func:
         return _memoized(func)
     else:
 
         def wrapper(f):
-            return _memoized(f, watch)
+            return _memoized(
+                f,
+                watch,
+                shared=shared,
+                max_size=max_size,
+                timeout=timeout,
+                on_evict=on_evict,
+            )
 
         return wrapper
 
@@ -1088,6 +1212,76 @@ def add_ago_to_since(since: str) -> str:
     return since
 
 
+def normalize_dttm_col(
+    df: pd.DataFrame,
+    timestamp_format: Optional[str],
+    offset: int,
+    time_shift: Optional[timedelta],
+    inferred_format: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Convert the temporal column of a query result to datetimes in place.
+
+    The conversion is picked once for the whole column from its dtype, rather than
+    converting the values one at a time: epoch numbers are converted with the unit
+    of the `epoch_s` or `epoch_ms` format, and strings are parsed with the Python
+    date format of the column, or else with a format inferred from the first value,
+    which is returned so it can be reused for the next results of the same column.
+
+    :param df: The query result, with the temporal column as `DTTM_ALIAS`
+    :param timestamp_format: The Python date format of the column, if any
+    :param offset: Number of hours added to the datetimes
+    :param time_shift: Time added to the datetimes
+    :param inferred_format: A format previously inferred for the column
+    :returns: The format inferred for the strings of the column, if any
+    """
+    if DTTM_ALIAS not in df.columns:
+        return inferred_format
+
+    series = df[DTTM_ALIAS]
+    is_epoch = timestamp_format in ("epoch_s", "epoch_ms")
+    if not is_epoch and timestamp_format:
+        # explicitly configured formats are expected to match all values
+        inferred_format = None
+        dttm = pd.to_datetime(series, utc=False, format=timestamp_format)
+    elif (
+        is_epoch
+        and pd.api.types.is_numeric_dtype(series)
+        and not pd.api.types.is_bool_dtype(series)
+    ):
+        unit = "ms" if timestamp_format == "epoch_ms" else "s"
+        dttm = pd.to_datetime(series, utc=False, unit=unit, origin="unix")
+    elif pd.api.types.infer_dtype(series, skipna=True) == "string":
+        numbers = pd.to_numeric(series, errors="coerce") if is_epoch else None
+        if numbers is not None and numbers.notna().sum() == series.notna().sum():
+            unit = "ms" if timestamp_format == "epoch_ms" else "s"
+            dttm = pd.to_datetime(numbers, utc=False, unit=unit, origin="unix")
+        else:
+            if not inferred_format and _guess_datetime_format_for_array:
+                inferred_format = _guess_datetime_format_for_array(
+                    series.to_numpy(dtype=object)
+                )
+            dttm = None
+            # pandas already has a fast path for ISO 8601 strings, which also
+            # preserves their timezone offsets
+            if inferred_format and not inferred_format.startswith("%Y-%m-%d"):
+                try:
+                    dttm = pd.to_datetime(series, utc=False, format=inferred_format)
+                except (TypeError, ValueError):
+                    inferred_format = None
+            if dttm is None:
+                dttm = pd.to_datetime(series, utc=False)
+    else:
+        dttm = pd.to_datetime(series, utc=False)
+
+    if offset:
+        dttm += timedelta(hours=offset)
+    if time_shift is not None:
+        dttm += time_shift
+    df[DTTM_ALIAS] = dttm
+    return inferred_format
+
+
 def convert_legacy_filters_into_adhoc(fd):
     mapping = {"having": "having_filters", "where": "filters"}
 
@@ -1151,6 +1345,72 @@ def split_adhoc_filters_into_base_filters(fd):
         fd["filters"] = simple_where_filters
 
 
+def _in_current_context(func: Callable[[], Any]) -> Callable[[], Any]:
+    """Wrap a function to run in another thread within the current context"""
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    user = getattr(g, "user", None)
+
+    def run() -> Any:
+        g.user = user
+        return func()
+
+    if has_request_context():
+        # each copy of the request context can only be pushed by one thread
+        return copy_current_request_context(run)
+
+    def run_in_app_context() -> Any:
+        with app.app_context():
+            return run()
+
+    return run_in_app_context
+
+
+def run_concurrently(funcs: Sequence[Callable[[], Any]], max_workers: int) -> List[Any]:
+    """
+    Run functions in a bounded pool of threads, returning their results in order.
+
+    Each function runs within a copy of the current request context, or a new app
+    context outside of requests, and with the same `g.user`, so it can query and
+    check permissions as the calling thread would. Exceptions raised by a function
+    are raised again in the calling thread.
+
+    :param funcs: The functions to run, which don't take any argument
+    :param max_workers: The maximum number of functions running at once
+    :return: The return values of the functions
+    """
+    if max_workers <= 1 or len(funcs) <= 1:
+        return [func() for func in funcs]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(funcs))) as executor:
+        futures = [executor.submit(_in_current_context(func)) for func in funcs]
+        return [future.result() for future in futures]
+
+
+def iter_concurrently(
+    funcs: Sequence[Callable[[], Any]], max_workers: int
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Run functions like `run_concurrently`, yielding their results as they finish
+
+    :param funcs: The functions to run, which don't take any argument
+    :param max_workers: The maximum number of functions running at once
+    :return: Iterator over the index of each function and its return value, in the
+        order the functions finish
+    """
+    if max_workers <= 1 or len(funcs) <= 1:
+        for i, func in enumerate(funcs):
+            yield i, func()
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(funcs))) as executor:
+        futures = {
+            executor.submit(_in_current_context(func)): i
+            for i, func in enumerate(funcs)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
 def get_username() -> Optional[str]:
     """Get username if within the flask context, otherwise return noffin'"""
     try:
@@ -1225,6 +1485,17 @@ class TimeRangeEndpoint(str, Enum):
     UNKNOWN = "unknown"
 
 
+class ChartDataResultFormat(str, Enum):
+    """
+    The format of the data in chart payloads. Records repeat the column names in
+    every row, while the columnar format holds one array per column along with a
+    shared schema.
+    """
+
+    RECORDS = "records"
+    COLUMNAR = "columnar"
+
+
 class ReservedUrlParameters(Enum):
     """
     Reserved URL parameters that are used internally by Superset. These will not be
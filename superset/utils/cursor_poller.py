@@ -0,0 +1,231 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+""" Polling of the cursors of queries running asynchronously, e.g. on Presto or Hive.
+
+Once such a query is submitted, its cursor is polled until the query finishes, to
+report its progress and to cancel it when it's stopped from SQL Lab. Polled from
+the thread running the query, each poll loads the query row from the metadata
+database and commits its progress, for every running query.
+
+`CursorPoller` instead polls the cursors of all the queries running in a process
+from a single thread, while the threads running them wait for their query to
+finish. Each round of polls reads the status of all the polled queries with one
+query, and writes the progress of those that changed in one batch.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import sqlalchemy
+from sqlalchemy.orm import Session, sessionmaker
+
+from superset.models.sql_lab import Query
+
+logger = logging.getLogger(__name__)
+
+# returns the values of the query row to update, or None once the query finished
+PollFunc = Callable[[], Optional[Dict[str, Any]]]
+
+
+class PolledCursor:  # pylint: disable=too-many-instance-attributes
+    """
+    The cursor of a running query, polled until the query finishes
+
+    :param query_id: Id of the query running on the cursor
+    :param poll: Polls the cursor, returning the values of the query row to update,
+        or None once the query finished
+    :param cancel: Cancels the query
+    :param stop_statuses: Statuses of the query row the query is cancelled at
+    :param progress: Current progress of the query, only higher progress is written
+    :param interval: Seconds between consecutive polls
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        query_id: int,
+        poll: PollFunc,
+        cancel: Callable[[], Any],
+        stop_statuses: Tuple[str, ...],
+        progress: int = 0,
+        interval: float = 1,
+    ) -> None:
+        self.query_id = query_id
+        self.poll = poll
+        self.cancel = cancel
+        self.stop_statuses = stop_statuses
+        self.progress = progress or 0
+        self.interval = interval
+        self.next_poll = time.time()
+        self.pending: Dict[str, Any] = {}
+        self.values: Dict[str, Any] = {}
+        self.done = threading.Event()
+        self.error: Optional[Exception] = None
+
+    def add_values(self, values: Dict[str, Any]) -> None:
+        """Queue values of the query row to write, progress only ever increases"""
+        values = dict(values)
+        progress = values.pop("progress", None)
+        if progress is not None and progress > self.progress:
+            self.progress = values["progress"] = progress
+        self.pending.update(values)
+
+    def flushed(self) -> None:
+        self.values.update(self.pending)
+        self.pending = {}
+
+    def finish(self, error: Optional[Exception] = None) -> None:
+        self.error = error
+        self.done.set()
+
+
+def poll_cursor(cursor: PolledCursor, session: Session) -> None:
+    """Poll a cursor from the calling thread until its query finishes"""
+    while True:
+        values = cursor.poll()
+        if values is None:
+            return
+        query = session.query(Query).filter_by(id=cursor.query_id).one()
+        if query.status in cursor.stop_statuses:
+            cursor.cancel()
+            return
+        cursor.add_values(values)
+        if cursor.pending:
+            for key, value in cursor.pending.items():
+                setattr(query, key, value)
+            session.commit()
+            cursor.flushed()
+        time.sleep(cursor.interval)
+
+
+class CursorPoller:
+    """
+    Polls the cursors of all the queries running in a process from one thread,
+    started when a cursor is handed over and stopped when none is left.
+
+    :param session_factory: Creates the sessions used to read the status and write
+        the progress of the queries
+    """
+
+    def __init__(self, session_factory: Callable[[], Session]) -> None:
+        self.session_factory = session_factory
+        self._cursors: Dict[int, PolledCursor] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def wait(self, cursor: PolledCursor) -> None:
+        """Poll a cursor from the poller thread, and wait for its query to finish"""
+        with self._lock:
+            self._cursors[cursor.query_id] = cursor
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="cursor-poller", daemon=True
+                )
+                self._thread.start()
+        self._wakeup.set()
+        try:
+            cursor.done.wait()
+        finally:
+            with self._lock:
+                self._cursors.pop(cursor.query_id, None)
+        if cursor.error:
+            raise cursor.error
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                cursors = list(self._cursors.values())
+                if not cursors:
+                    self._thread = None
+                    return
+            now = time.time()
+            due = [cursor for cursor in cursors if cursor.next_poll <= now]
+            try:
+                self.poll_cursors(due)
+            except Exception:  # pylint: disable=broad-except
+                # pending values are kept and written on the next round
+                logger.exception("Failed to update the polled queries")
+            with self._lock:
+                for cursor in due:
+                    if cursor.done.is_set():
+                        self._cursors.pop(cursor.query_id, None)
+                cursors = list(self._cursors.values())
+            if cursors:
+                next_poll = min(cursor.next_poll for cursor in cursors)
+                self._wakeup.wait(max(next_poll - time.time(), 0))
+
+    def poll_cursors(self, cursors: List[PolledCursor]) -> None:
+        """Poll cursors once, cancel those stopped and write the progress of others"""
+        running = []
+        for cursor in cursors:
+            cursor.next_poll = time.time() + cursor.interval
+            try:
+                values = cursor.poll()
+            except Exception as ex:  # pylint: disable=broad-except
+                cursor.finish(ex)
+                continue
+            if values is None:
+                cursor.finish()
+            else:
+                cursor.add_values(values)
+                running.append(cursor)
+        if not running:
+            return
+
+        updated: List[PolledCursor] = []
+        session = self.session_factory()
+        try:
+            statuses = dict(
+                session.query(Query.id, Query.status).filter(
+                    Query.id.in_([cursor.query_id for cursor in running])
+                )
+            )
+            for cursor in running:
+                if statuses.get(cursor.query_id) in cursor.stop_statuses:
+                    try:
+                        cursor.cancel()
+                    except Exception:  # pylint: disable=broad-except
+                        logger.exception("Query %d: Failed to cancel", cursor.query_id)
+                    cursor.finish()
+                elif cursor.pending:
+                    updated.append(cursor)
+            if updated:
+                session.bulk_update_mappings(
+                    Query,
+                    [dict(cursor.pending, id=cursor.query_id) for cursor in updated],
+                )
+            session.commit()
+        finally:
+            session.close()
+        for cursor in updated:
+            cursor.flushed()
+
+
+_poller: Optional[CursorPoller] = None
+_poller_lock = threading.Lock()
+
+
+def get_cursor_poller(database_uri: str) -> CursorPoller:
+    """The poller of the process, writing to the metadata database at `database_uri`"""
+    global _poller  # pylint: disable=global-statement
+    with _poller_lock:
+        if _poller is None:
+            engine = sqlalchemy.create_engine(database_uri)
+            _poller = CursorPoller(sessionmaker(bind=engine))
+        return _poller
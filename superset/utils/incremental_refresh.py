@@ -0,0 +1,150 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+""" Incremental refresh of the cached data of time series queries.
+
+When the cached data of a time series query expires, the query is run again over
+its whole time range, even though with a relative range like "Last week" only the
+newest time buckets changed. Instead, the expired DataFrame is kept as the base of
+the refresh, and only these time ranges are queried:
+
+- the tail, from the last cached bucket, moved back to the first cached bucket
+  within an overlap window for data arriving late, to the end of the range
+- the head, when the start of the range moved, from the new start to the first
+  cached bucket after it, as the bucket the start falls into is now partial
+
+The results are merged with the cached buckets in between, and the buckets that
+fell out of the time range are trimmed.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from superset.utils.core import DTTM_ALIAS, TimeRangeEndpoint
+
+TimeWindow = Tuple[datetime, datetime]
+
+
+class IncrementalWindows(NamedTuple):
+    head: Optional[TimeWindow]
+    tail: TimeWindow
+    keep: pd.Series  # mask of the cached rows merged with the new ones
+
+
+def can_refresh_incrementally(datasource_type: str, query_obj: Dict[str, Any]) -> bool:
+    """Whether the cached data of a query can be refreshed incrementally"""
+    extras = query_obj.get("extras") or {}
+    time_grain = extras.get("time_grain_sqla") or ""
+    return bool(
+        datasource_type == "table"
+        and query_obj.get("is_timeseries")
+        and query_obj.get("granularity")
+        and query_obj.get("from_dttm")
+        and query_obj.get("to_dttm")
+        # the top series of a time range can differ from those of its parts
+        and not query_obj.get("timeseries_limit")
+        # buckets labelled with their end, e.g. weeks ending on Saturday
+        and not (time_grain.startswith("P") and "/" in time_grain)
+        # windows computed by the database span buckets outside of the refreshed ones
+        and not extras.get("post_processing")
+    )
+
+
+def get_cache_value_window(query_obj: Dict[str, Any]) -> Dict[str, str]:
+    """The time range of a query, stored with its cached value"""
+    return {
+        "from_dttm": query_obj["from_dttm"].isoformat(),
+        "to_dttm": query_obj["to_dttm"].isoformat(),
+    }
+
+
+def get_incremental_windows(  # pylint: disable=too-many-arguments
+    cache_value: Dict[str, Any],
+    from_dttm: datetime,
+    to_dttm: datetime,
+    shift: timedelta,
+    overlap: timedelta,
+    row_limit: Optional[int] = None,
+) -> Optional[IncrementalWindows]:
+    """
+    The time ranges to query to refresh cached data incrementally
+
+    :param cache_value: The expired cache value, with the DataFrame and the time
+        range it was queried for
+    :param from_dttm: Start of the time range to refresh the data for
+    :param to_dttm: End of the time range to refresh the data for
+    :param shift: Time added to the temporal column of the DataFrame, relative to
+        the time range, e.g. the offset of the datasource
+    :param overlap: Time before the last cached bucket to query again
+    :param row_limit: Row limit of the query
+    :return: The time ranges, or None if the data can't be refreshed incrementally
+    """
+    df = cache_value.get("df")
+    if (
+        not cache_value.get("from_dttm")
+        or not cache_value.get("to_dttm")
+        or df is None
+        or df.empty
+        or DTTM_ALIAS not in df.columns
+        or not pd.api.types.is_datetime64_dtype(df[DTTM_ALIAS])
+        or (row_limit and len(df.index) >= row_limit)
+    ):
+        return None
+    cached_from = pd.Timestamp(cache_value["from_dttm"]).to_pydatetime()
+    cached_to = pd.Timestamp(cache_value["to_dttm"]).to_pydatetime()
+    if from_dttm < cached_from or to_dttm < cached_to:
+        return None
+
+    dttm = df[DTTM_ALIAS] - shift
+    last_dttm = dttm.max()
+    if last_dttm < from_dttm:
+        return None
+    tail_start = dttm[dttm >= max(last_dttm - overlap, from_dttm)].min()
+    keep = dttm < tail_start
+    head = None
+    if from_dttm > cached_from:
+        keep &= dttm >= from_dttm
+        if not keep.any():
+            tail_start = from_dttm
+        elif dttm[keep].min() > from_dttm:
+            head = (from_dttm, dttm[keep].min().to_pydatetime())
+    return IncrementalWindows(
+        head, (pd.Timestamp(tail_start).to_pydatetime(), to_dttm), keep
+    )
+
+
+def get_window_time_range_endpoints(
+    window: TimeWindow, to_dttm: datetime, time_range_endpoints: Any
+) -> Any:
+    """
+    The time range endpoints to query a window of a time range with, the windows
+    that end before the end of the range exclude their end
+    """
+    if window[1] < to_dttm:
+        return (TimeRangeEndpoint.INCLUSIVE, TimeRangeEndpoint.EXCLUSIVE)
+    return time_range_endpoints
+
+
+def merge_incremental_df(
+    df: pd.DataFrame, windows: IncrementalWindows, dfs: List[pd.DataFrame]
+) -> pd.DataFrame:
+    """Merge the cached rows to keep with the results of the queried windows"""
+    frames = [df[windows.keep]] + [
+        window_df for window_df in dfs if not window_df.empty
+    ]
+    df = pd.concat(frames, ignore_index=True, sort=False)
+    return df.sort_values(DTTM_ALIAS, kind="mergesort").reset_index(drop=True)
@@ -0,0 +1,260 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+""" Versioned serialization of SQL Lab payloads stored in the results backend.
+
+A serialized payload is laid out as::
+
+    | magic | version | codec | meta size | index size | meta    | index   | data |
+    | 4B    | 1B      | 1B    | 4B        | 4B         | msgpack | msgpack |      |
+
+The query metadata (status, columns, query, ...) is stored as msgpack, separately
+from the result data. The data is split into batches of rows, each stored as an
+Arrow IPC stream compressed with a fast codec. The index lists the number of rows,
+the compressed and the uncompressed size of each batch, so a range of rows can be
+read by only decompressing the batches it spans.
+
+Version 1 payloads store the data as a single compressed Arrow IPC stream, and are
+laid out as::
+
+    | magic | version | codec | meta size | data size | meta    | data |
+    | 4B    | 1B      | 1B    | 4B        | 8B        | msgpack |      |
+
+Blobs written before this format existed are zlib compressed JSON or msgpack,
+and never start with the magic bytes, see `is_versioned_payload`.
+"""
+import struct
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import msgpack
+import pyarrow as pa
+
+from superset.exceptions import ResultsPayloadException
+from superset.utils.core import json_iso_dttm_ser
+
+MAGIC = b"SSRB"
+VERSION = 2
+HEADER = struct.Struct("!4sBBII")
+HEADER_V1 = struct.Struct("!4sBBIQ")
+DEFAULT_BATCH_SIZE = 10000
+
+# codec ids are persisted in the header, only ever append to this mapping
+CODECS: Dict[Optional[str], int] = {
+    None: 0,
+    "lz4": 1,
+    "zstd": 2,
+    "snappy": 3,
+    "gzip": 4,
+    "brotli": 5,
+}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODECS.items()}
+
+
+def is_versioned_payload(blob: Any) -> bool:
+    return isinstance(blob, bytes) and blob[: len(MAGIC)] == MAGIC
+
+
+def table_to_ipc(table: pa.Table) -> pa.Buffer:
+    sink = pa.BufferOutputStream()
+    writer = pa.RecordBatchStreamWriter(sink, table.schema)
+    writer.write_table(table)
+    writer.close()
+    return sink.getvalue()
+
+
+def ipc_to_table(buf: pa.Buffer) -> pa.Table:
+    return pa.ipc.open_stream(buf).read_all()
+
+
+def slice_table(
+    table: pa.Table,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+) -> pa.Table:
+    """Select a range of rows and a subset of the columns of a table"""
+    if columns is not None:
+        missing = [name for name in columns if name not in table.column_names]
+        if missing:
+            raise ResultsPayloadException(f"Unknown columns: {', '.join(missing)}")
+        table = pa.Table.from_arrays(
+            [table.column(name) for name in columns], names=columns
+        )
+    return table.slice(offset, limit)
+
+
+def _compress(buf: pa.Buffer, compression: Optional[str]) -> bytes:
+    if compression:
+        buf = pa.compress(buf, codec=compression)
+    return buf.to_pybytes()
+
+
+def _decompress(buf: pa.Buffer, size: int, compression: Optional[str]) -> pa.Buffer:
+    if compression:
+        return pa.decompress(buf, decompressed_size=size, codec=compression)
+    return buf
+
+
+def serialize_payload(
+    payload: Dict[str, Any],
+    compression: Optional[str] = "lz4",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> bytes:
+    """
+    Serialize a results payload whose `data` is a `pa.Table`
+
+    :param payload: The query results payload
+    :param compression: Arrow compression codec applied to the data
+    :param batch_size: Maximum number of rows stored in each batch
+    :return: The serialized payload, header included
+    """
+    if compression not in CODECS:
+        raise ResultsPayloadException(f"Unsupported compression codec: {compression}")
+
+    table: pa.Table = payload["data"]
+    meta = {key: value for key, value in payload.items() if key != "data"}
+    meta_bytes = msgpack.dumps(meta, default=json_iso_dttm_ser, use_bin_type=True)
+
+    index: List[List[int]] = []
+    segments: List[bytes] = []
+    batch_tables = [
+        pa.Table.from_batches([batch])
+        for batch in table.to_batches(max_chunksize=batch_size)
+    ]
+    # an empty table is still stored as one batch, to preserve its schema
+    for batch_table in batch_tables or [table]:
+        buf = table_to_ipc(batch_table)
+        segments.append(_compress(buf, compression))
+        index.append([batch_table.num_rows, len(segments[-1]), buf.size])
+    index_bytes = msgpack.dumps(index)
+
+    header = HEADER.pack(
+        MAGIC, VERSION, CODECS[compression], len(meta_bytes), len(index_bytes)
+    )
+    return b"".join([header, meta_bytes, index_bytes, *segments])
+
+
+class _Batch(NamedTuple):
+    num_rows: Optional[int]  # not stored in version 1 payloads
+    position: int
+    size: int
+    raw_size: int
+
+
+def _parse_payload(blob: bytes,) -> Tuple[Dict[str, Any], List[_Batch], Optional[str]]:
+    """Read the header, metadata and index of a payload"""
+    if not is_versioned_payload(blob):
+        raise ResultsPayloadException("Not a versioned results payload")
+    version, codec_id = blob[len(MAGIC)], blob[len(MAGIC) + 1]
+    if version > VERSION:
+        raise ResultsPayloadException(f"Unsupported results payload version: {version}")
+    if codec_id not in CODEC_NAMES:
+        raise ResultsPayloadException(f"Unsupported compression codec id: {codec_id}")
+
+    if version == 1:
+        _, _, _, meta_size, data_size = HEADER_V1.unpack_from(blob)
+        position = HEADER_V1.size
+        meta = msgpack.loads(blob[position : position + meta_size], raw=False)
+        position += meta_size
+        batches = [_Batch(None, position, len(blob) - position, data_size)]
+        return meta, batches, CODEC_NAMES[codec_id]
+
+    _, _, _, meta_size, index_size = HEADER.unpack_from(blob)
+    position = HEADER.size
+    meta = msgpack.loads(blob[position : position + meta_size], raw=False)
+    position += meta_size
+    index = msgpack.loads(blob[position : position + index_size])
+    position += index_size
+
+    batches = []
+    for num_rows, size, raw_size in index:
+        batches.append(_Batch(num_rows, position, size, raw_size))
+        position += size
+    return meta, batches, CODEC_NAMES[codec_id]
+
+
+def _read_batch(buf: pa.Buffer, batch: _Batch, compression: Optional[str]) -> pa.Table:
+    data = _decompress(
+        buf.slice(batch.position, batch.size), batch.raw_size, compression
+    )
+    return ipc_to_table(data)
+
+
+def iter_payload_tables(
+    blob: bytes, columns: Optional[List[str]] = None
+) -> Iterator[pa.Table]:
+    """
+    Lazily deserialize the data of a payload one stored batch at a time
+
+    :param blob: The serialized payload
+    :param columns: Names of the columns to read, all columns if None
+    :return: Iterator over tables of at most the batch size rows
+    """
+    _, batches, compression = _parse_payload(blob)
+    buf = pa.py_buffer(blob)
+    for batch in batches:
+        yield slice_table(_read_batch(buf, batch, compression), columns=columns)
+
+
+def deserialize_payload(
+    blob: bytes,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Deserialize a payload created by `serialize_payload`, optionally only reading a
+    range of rows and a subset of the columns.
+
+    :param blob: The serialized payload
+    :param offset: Index of the first row to read
+    :param limit: Maximum number of rows to read, all remaining rows if None
+    :param columns: Names of the columns to read, all columns if None
+    :return: The results payload, with the data as a `pa.Table`
+    """
+    payload, batches, compression = _parse_payload(blob)
+    buf = pa.py_buffer(blob)
+
+    if batches[0].num_rows is None:
+        table = _read_batch(buf, batches[0], compression)
+        payload["data"] = slice_table(table, offset, limit, columns)
+        return payload
+
+    end = None if limit is None else offset + limit
+    tables: List[pa.Table] = []
+    first_row = 0
+    for batch in batches:
+        last_row = first_row + batch.num_rows
+        # always read the first batch so the schema is known for empty ranges
+        if not tables or (last_row > offset and (end is None or first_row < end)):
+            batch_offset = max(offset - first_row, 0)
+            batch_limit = (
+                None if end is None else max(end - first_row, 0) - batch_offset
+            )
+            tables.append(
+                slice_table(
+                    _read_batch(buf, batch, compression),
+                    batch_offset,
+                    batch_limit,
+                    columns,
+                )
+            )
+        if end is not None and last_row >= end:
+            break
+        first_row = last_row
+
+    payload["data"] = pa.concat_tables(tables)
+    return payload
@@ -25,7 +25,12 @@ from superset.common.query_context import QueryContext
 from superset.legacy import update_time_range
 from superset.models.slice import Slice
 from superset.utils import core as utils
-from superset.views.base import api, BaseSupersetView, handle_api_exception
+from superset.views.base import (
+    api,
+    BaseSupersetView,
+    handle_api_exception,
+    json_error_response,
+)
 from superset.views.chart import api as chart_api  # pylint: disable=unused-import
 from superset.views.dashboard import (  # pylint: disable=unused-import
     api as dashboard_api,
@@ -45,7 +50,21 @@ class Api(BaseSupersetView):
         for the given query_obj.
         params: query_context: json_blob
         """
-        query_context = QueryContext(**json.loads(request.form.get("query_context")))
+        query_context_dict = json.loads(request.form.get("query_context"))
+        try:
+            utils.ChartDataResultFormat(
+                query_context_dict.get(
+                    "result_format", utils.ChartDataResultFormat.RECORDS
+                )
+            )
+        except ValueError:
+            return json_error_response(
+                "Invalid result format: {}".format(
+                    query_context_dict.get("result_format")
+                ),
+                status=400,
+            )
+        query_context = QueryContext(**query_context_dict)
         security_manager.assert_query_context_permission(query_context)
         payload_json = query_context.get_payload()
         return json.dumps(
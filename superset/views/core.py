@@ -17,9 +17,11 @@
 # pylint: disable=C,R,W
 import logging
 import re
+from collections import defaultdict
 from contextlib import closing
 from datetime import datetime, timedelta
-from typing import Any, cast, Dict, List, Optional, Union
+from functools import partial
+from typing import Any, cast, Dict, Iterator, List, Optional, Union
 from urllib import parse
 
 import backoff
@@ -27,7 +29,17 @@ import msgpack
 import pandas as pd
 import pyarrow as pa
 import simplejson as json
-from flask import abort, flash, g, Markup, redirect, render_template, request, Response
+from flask import (
+    abort,
+    flash,
+    g,
+    Markup,
+    redirect,
+    render_template,
+    request,
+    Response,
+    stream_with_context,
+)
 from flask_appbuilder import expose
 from flask_appbuilder.models.sqla.interface import SQLAInterface
 from flask_appbuilder.security.decorators import has_access, has_access_api
@@ -68,6 +80,7 @@ from superset.connectors.sqla.models import AnnotationDatasource
 from superset.constants import RouteMethod
 from superset.exceptions import (
     DatabaseNotFound,
+    ResultsPayloadException,
     SupersetException,
     SupersetSecurityException,
     SupersetTimeoutException,
@@ -80,8 +93,9 @@ from superset.models.sql_lab import Query, TabState
 from superset.models.user_attributes import UserAttribute
 from superset.sql_parse import ParsedQuery
 from superset.sql_validators import get_validator_by_name
-from superset.utils import core as utils, dashboard_import_export
+from superset.utils import core as utils, dashboard_import_export, results_payload
 from superset.utils.dashboard_filter_scopes_converter import copy_filter_scopes
+from superset.utils.cache import CacheBatch
 from superset.utils.dates import now_as_float
 from superset.utils.decorators import etag_cache, stats_timing
 from superset.views.database.filters import DatabaseFilter
@@ -107,6 +121,7 @@ from .utils import (
     bootstrap_user_data,
     get_datasource_info,
     get_form_data,
+    get_slice_form_data,
     get_viz,
 )
 
@@ -211,36 +226,107 @@ def check_slice_perms(self, slice_id):
     security_manager.assert_viz_permission(viz_obj)
 
 
-def _deserialize_results_payload(
-    payload: Union[bytes, str], query, use_msgpack: Optional[bool] = False
+def _read_results_blob(
+    blob: bytes,
+    query,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+) -> dict:
+    """Deserialize a payload read from the results backend, whichever the format"""
+    if results_payload.is_versioned_payload(blob):
+        return _deserialize_results_payload(
+            blob, query, offset=offset, limit=limit, columns=columns
+        )
+    payload = utils.zlib_decompress(blob, decode=not results_backend_use_msgpack)
+    return _deserialize_results_payload(
+        payload,
+        query,
+        cast(bool, results_backend_use_msgpack),
+        offset=offset,
+        limit=limit,
+        columns=columns,
+    )
+
+
+def _deserialize_results_payload(  # pylint: disable=too-many-arguments
+    payload: Union[bytes, str],
+    query,
+    use_msgpack: Optional[bool] = False,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
 ) -> dict:
+    """
+    Deserialize a results payload, only keeping the rows from `offset` to
+    `offset + limit` and the given `columns`. For versioned payloads, only the
+    batches of rows that are kept are decompressed and deserialized.
+    """
     logger.debug(f"Deserializing from msgpack: {use_msgpack}")
-    if use_msgpack:
+    if results_payload.is_versioned_payload(payload):
+        with stats_timing(
+            "sqllab.query.results_backend_arrow_deserialize", stats_logger
+        ):
+            ds_payload = results_payload.deserialize_payload(
+                cast(bytes, payload), offset, limit, columns
+            )
+        pa_table = ds_payload["data"]
+    elif use_msgpack:
+        # legacy payloads, stored before the versioned format was introduced
         with stats_timing(
             "sqllab.query.results_backend_msgpack_deserialize", stats_logger
         ):
             ds_payload = msgpack.loads(payload, raw=False)
 
         with stats_timing("sqllab.query.results_backend_pa_deserialize", stats_logger):
-            pa_table = pa.deserialize(ds_payload["data"])
-
-        df = result_set.SupersetResultSet.convert_table_to_df(pa_table)
-        ds_payload["data"] = dataframe.df_to_records(df) or []
-
-        db_engine_spec = query.database.db_engine_spec
-        all_columns, data, expanded_columns = db_engine_spec.expand_data(
-            ds_payload["selected_columns"], ds_payload["data"]
-        )
-        ds_payload.update(
-            {"data": data, "columns": all_columns, "expanded_columns": expanded_columns}
-        )
-
-        return ds_payload
+            pa_table = results_payload.slice_table(
+                pa.deserialize(ds_payload["data"]), offset, limit, columns
+            )
     else:
         with stats_timing(
             "sqllab.query.results_backend_json_deserialize", stats_logger
         ):
-            return json.loads(payload)  # type: ignore
+            ds_payload = json.loads(payload)  # type: ignore
+        if offset or limit is not None or columns is not None:
+            ds_payload = _slice_results_records(ds_payload, offset, limit, columns)
+        return ds_payload
+
+    if columns is not None:
+        ds_payload["selected_columns"] = [
+            col for col in ds_payload["selected_columns"] if col["name"] in columns
+        ]
+    df = result_set.SupersetResultSet.convert_table_to_df(pa_table)
+    ds_payload["data"] = dataframe.df_to_records(df) or []
+
+    db_engine_spec = query.database.db_engine_spec
+    all_columns, data, expanded_columns = db_engine_spec.expand_data(
+        ds_payload["selected_columns"], ds_payload["data"]
+    )
+    ds_payload.update(
+        {"data": data, "columns": all_columns, "expanded_columns": expanded_columns}
+    )
+
+    return ds_payload
+
+
+def _slice_results_records(
+    payload: dict, offset: int, limit: Optional[int], columns: Optional[List[str]]
+) -> dict:
+    """Select a range of rows and a subset of the columns of a JSON payload"""
+    end = None if limit is None else offset + limit
+    data = payload["data"][offset:end]
+    if columns is not None:
+        names = {col["name"] for col in payload.get("columns", [])}
+        missing = [name for name in columns if name not in names]
+        if missing:
+            raise ResultsPayloadException(f"Unknown columns: {', '.join(missing)}")
+        data = [{name: row.get(name) for name in columns} for row in data]
+        for key in ("columns", "selected_columns"):
+            payload[key] = [
+                col for col in payload.get(key, []) if col["name"] in columns
+            ]
+    payload["data"] = data
+    return payload
 
 
 class AccessRequestsModelView(SupersetModelView, DeleteMixin):
@@ -702,6 +788,16 @@ class Superset(BaseSupersetView):
         force = request.args.get("force") == "true"
         form_data = get_form_data()[0]
 
+        try:
+            result_format = utils.ChartDataResultFormat(
+                request.args.get("result_format", utils.ChartDataResultFormat.RECORDS)
+            )
+        except ValueError:
+            return json_error_response(
+                "Invalid result format: {}".format(request.args.get("result_format")),
+                status=400,
+            )
+
         try:
             datasource_id, datasource_type = get_datasource_info(
                 datasource_id, datasource_type, form_data
@@ -714,12 +810,155 @@ class Superset(BaseSupersetView):
             datasource_id=datasource_id,
             form_data=form_data,
             force=force,
+            result_format=result_format,
         )
 
         return self.generate_json(
             viz_obj, csv=csv, query=query, results=results, samples=samples
         )
 
+    @event_logger.log_this
+    @api
+    @has_access_api
+    @handle_api_exception
+    @expose("/dashboard_chart_data/", methods=["POST"])
+    def dashboard_chart_data(self):
+        """Serves the data of several charts, e.g. of a dashboard, in one request
+
+        The request body is a JSON object with the `slice_ids` of the charts, and
+        optionally `force` and the dashboard `extra_filters` applying to each chart,
+        by chart id, as resolved from the scopes of the dashboard filters.
+
+        The datasources of the charts and their permissions are resolved once, the
+        cached data of all charts is read at once, and charts missing the cache run
+        concurrently. The response is newline delimited JSON, with a line holding
+        the `slice_id`, the HTTP `status` and the `payload` `explore_json` would
+        respond with for each chart, sent as soon as the chart is loaded."""
+        params = request.get_json(silent=True) or {}
+        slice_ids = params.get("slice_ids")
+        if not isinstance(slice_ids, list) or not all(
+            isinstance(slice_id, int) for slice_id in slice_ids
+        ):
+            return json_error_response(
+                "`slice_ids` should be a list of chart ids", status=400
+            )
+        extra_filters = params.get("extra_filters") or {}
+        if not isinstance(extra_filters, dict):
+            return json_error_response(
+                "`extra_filters` should be the filters of each chart, by chart id",
+                status=400,
+            )
+        force = params.get("force") is True
+
+        slices = {
+            slc.id: slc
+            for slc in db.session.query(Slice).filter(Slice.id.in_(slice_ids))
+        }
+        datasource_ids = defaultdict(set)
+        for slc in slices.values():
+            datasource_ids[slc.datasource_type].add(slc.datasource_id)
+        datasources = {}
+        for datasource_type, ids in datasource_ids.items():
+            datasource_class = ConnectorRegistry.sources.get(datasource_type)
+            if datasource_class:
+                for datasource in db.session.query(datasource_class).filter(
+                    datasource_class.id.in_(ids)
+                ):
+                    datasources[(datasource_type, datasource.id)] = datasource
+        datasource_access = {
+            key: security_manager.datasource_access(datasource)
+            for key, datasource in datasources.items()
+        }
+
+        errors = []
+        viz_objs = {}
+        for slice_id in dict.fromkeys(slice_ids):
+            slc = slices.get(slice_id)
+            key = (slc.datasource_type, slc.datasource_id) if slc else None
+            if not slc:
+                errors.append((slice_id, 404, {"error": "Chart does not exist"}))
+            elif key not in datasources:
+                errors.append(
+                    (
+                        slice_id,
+                        404,
+                        {
+                            "error": "The datasource associated with this chart "
+                            "no longer exists"
+                        },
+                    )
+                )
+            elif not datasource_access[key]:
+                datasource = datasources[key]
+                errors.append(
+                    (
+                        slice_id,
+                        403,
+                        {
+                            "error": security_manager.get_datasource_access_error_msg(
+                                datasource
+                            ),
+                            "link": security_manager.get_datasource_access_link(
+                                datasource
+                            ),
+                        },
+                    )
+                )
+            else:
+                slice_form_data = get_slice_form_data(
+                    slc, {"extra_filters": extra_filters.get(str(slice_id)) or []}
+                )
+                viz_type = slice_form_data.get("viz_type", "table")
+                if viz_type not in viz.viz_types:
+                    errors.append(
+                        (slice_id, 400, {"error": f"Unknown viz type: {viz_type}"})
+                    )
+                    continue
+                viz_objs[slice_id] = viz.viz_types[viz_type](
+                    datasources[key], form_data=slice_form_data, force=force
+                )
+
+        for datasource in datasources.values():
+            datasource.load_query_relationships()
+        cache_batch = CacheBatch(cache, stats_logger)
+        viz.BaseViz.prefetch_cache_values(list(viz_objs.values()), cache_batch)
+
+        def chart_data_line(slice_id: int, viz_obj: viz.BaseViz) -> str:
+            try:
+                payload_json, has_error = viz_obj.payload_json_and_has_error(
+                    viz_obj.get_payload()
+                )
+                status = 400 if has_error else 200
+            except Exception as e:  # pylint: disable=broad-except
+                logger.exception(e)
+                payload = {"error": utils.error_msg_from_exception(e)}
+                if isinstance(e, SupersetSecurityException):
+                    payload["link"] = e.link
+                status = e.status if isinstance(e, SupersetException) else 500
+                payload_json = json.dumps(payload)
+            return '{{"slice_id": {}, "status": {}, "payload": {}}}\n'.format(
+                slice_id, status, payload_json
+            )
+
+        def generate() -> Iterator[str]:
+            for slice_id, status, payload in errors:
+                yield json.dumps(
+                    {"slice_id": slice_id, "status": status, "payload": payload}
+                ) + "\n"
+            with cache_batch:
+                for _i, line in utils.iter_concurrently(
+                    [
+                        partial(chart_data_line, slice_id, viz_obj)
+                        for slice_id, viz_obj in viz_objs.items()
+                    ],
+                    config["DASHBOARD_CHART_DATA_CONCURRENCY"],
+                ):
+                    yield line
+
+        return Response(
+            stream_with_context(generate()), mimetype="application/x-ndjson"
+        )
+
     @event_logger.log_this
     @has_access
     @expose("/import_dashboards", methods=["GET", "POST"])
@@ -2044,7 +2283,9 @@ class Superset(BaseSupersetView):
         """Serves a key off of the results backend
 
         It is possible to pass the `rows` query argument to limit the number
-        of rows returned.
+        of rows returned. A page of the results can be requested with the
+        `offset` and `limit` query arguments, and a subset of the columns with
+        the comma separated `columns` query argument.
         """
         if not results_backend:
             return json_error_response("Results backend isn't configured")
@@ -2076,16 +2317,37 @@ class Superset(BaseSupersetView):
                 security_manager.get_table_access_error_msg(rejected_tables), status=403
             )
 
-        payload = utils.zlib_decompress(blob, decode=not results_backend_use_msgpack)
-        obj: dict = _deserialize_results_payload(
-            payload, query, cast(bool, results_backend_use_msgpack)
-        )
-
+        rows: Optional[int] = None
         if "rows" in request.args:
             try:
                 rows = int(request.args["rows"])
             except ValueError:
                 return json_error_response("Invalid `rows` argument", status=400)
+
+        try:
+            offset = int(request.args.get("offset", 0))
+            limit: Optional[int] = (
+                int(request.args["limit"]) if "limit" in request.args else None
+            )
+            if offset < 0 or (limit is not None and limit < 0):
+                raise ValueError()
+        except ValueError:
+            return json_error_response(
+                "Invalid `offset` or `limit` argument", status=400
+            )
+        if limit is None and rows is not None:
+            # only the rows that end up being displayed need to be read
+            limit = rows or config["DISPLAY_MAX_ROW"]
+        columns = (
+            request.args["columns"].split(",") if "columns" in request.args else None
+        )
+
+        try:
+            obj: dict = _read_results_blob(blob, query, offset, limit, columns)
+        except ResultsPayloadException as e:
+            return json_error_response(utils.error_msg_from_exception(e), status=400)
+
+        if rows is not None:
             obj = apply_display_max_row_limit(obj, rows)
 
         return json_success(
@@ -2431,40 +2693,51 @@ class Superset(BaseSupersetView):
                 "Fetching CSV from results backend " "[{}]".format(query.results_key)
             )
             blob = results_backend.get(query.results_key)
-        if blob:
-            logger.info("Decompressing")
-            payload = utils.zlib_decompress(
-                blob, decode=not results_backend_use_msgpack
-            )
-            obj = _deserialize_results_payload(
-                payload, query, results_backend_use_msgpack
+        if blob and results_payload.is_versioned_payload(blob):
+            logger.info("Streaming stored results batches to CSV")
+            dfs = (
+                result_set.SupersetResultSet.convert_table_to_df(table)
+                for table in results_payload.iter_payload_tables(blob)
             )
+        elif blob:
+            logger.info("Decompressing")
+            obj = _read_results_blob(blob, query)
             columns = [c["name"] for c in obj["columns"]]
-            df = pd.DataFrame.from_records(obj["data"], columns=columns)
-            logger.info("Using pandas to convert to CSV")
-            csv = df.to_csv(index=False, **config["CSV_EXPORT"])
+            dfs = iter([pd.DataFrame.from_records(obj["data"], columns=columns)])
         else:
             logger.info("Running a query to turn into CSV")
             sql = query.select_sql or query.executed_sql
-            df = query.database.get_df(sql, query.schema)
-            # TODO(bkyryliuk): add compression=gzip for big files.
-            csv = df.to_csv(index=False, **config["CSV_EXPORT"])
-        response = Response(csv, mimetype="text/csv")
-        response.headers[
-            "Content-Disposition"
-        ] = f"attachment; filename={query.name}.csv"
+            dfs = query.database.get_df_batches(sql, query.schema)
+
+        compress = request.args.get("compression") == "gzip"
         event_info = {
             "event_type": "data_export",
             "client_id": client_id,
-            "row_count": len(df.index),
+            "row_count": 0,
             "database": query.database.name,
             "schema": query.schema,
             "sql": query.sql,
-            "exported_format": "csv",
+            "exported_format": "csv.gz" if compress else "csv",
         }
-        logger.info(
-            f"CSV exported: {repr(event_info)}", extra={"superset_event": event_info}
+
+        def count_rows(dfs: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+            for df in dfs:
+                event_info["row_count"] += len(df.index)
+                yield df
+            logger.info(
+                f"CSV exported: {repr(event_info)}",
+                extra={"superset_event": event_info},
+            )
+
+        csv = dataframe.df_batches_to_csv(
+            count_rows(dfs), compress=compress, index=False, **config["CSV_EXPORT"]
+        )
+        response = Response(
+            stream_with_context(csv),
+            mimetype="application/gzip" if compress else "text/csv",
         )
+        filename = f"{query.name}.csv.gz" if compress else f"{query.name}.csv"
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
         return response
 
     @api
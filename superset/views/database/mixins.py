@@ -22,6 +22,7 @@ from sqlalchemy import MetaData
 
 from superset import security_manager
 from superset.exceptions import SupersetException
+from superset.models.core import ENGINE_POOL_PARAMS
 from superset.utils import core as utils
 from superset.views.database.filters import DatabaseFilter
 
@@ -138,7 +139,14 @@ class DatabaseMixin:
             "If database flavor does not support schema or any schema is allowed "
             "to be accessed, just leave the list empty"
             "4. the ``version`` field is a string specifying the this db's version. "
-            "This should be used with Presto DBs so that the syntax is correct",
+            "This should be used with Presto DBs so that the syntax is correct<br/>"
+            "5. The ``engine_pool`` object enables pooling the connections of chart "
+            "queries, keeping one pool per impersonated user. Its ``pool_size``, "
+            "``max_overflow``, ``pool_recycle``, ``pool_pre_ping`` and "
+            "``pool_timeout`` keys are passed to the [sqlalchemy.create_engine]"
+            "(https://docs.sqlalchemy.org/en/latest/core/engines.html#"
+            "sqlalchemy.create_engine) call. Specify it as "
+            '**"engine_pool": {"pool_size": 5, "pool_recycle": 3600}**.',
             True,
         ),
         "encrypted_extra": utils.markdown(
@@ -234,6 +242,15 @@ class DatabaseMixin:
                     "{} is invalid.".format(key)
                 )
 
+        # this will check whether 'engine_pool' is configured correctly
+        for key in extra.get("engine_pool", {}):
+            if key not in ENGINE_POOL_PARAMS:
+                raise Exception(
+                    "The engine_pool in Extra field "
+                    "is not configured correctly. The key "
+                    "{} is invalid.".format(key)
+                )
+
     def check_encrypted_extra(self, database):  # pylint: disable=no-self-use
         # this will check whether json.loads(secure_extra) can succeed
         try:
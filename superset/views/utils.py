@@ -28,7 +28,7 @@ from superset.connectors.connector_registry import ConnectorRegistry
 from superset.exceptions import SupersetException
 from superset.legacy import update_time_range
 from superset.models.slice import Slice
-from superset.utils.core import QueryStatus, TimeRangeEndpoint
+from superset.utils.core import ChartDataResultFormat, QueryStatus, TimeRangeEndpoint
 
 FORM_DATA_KEY_BLACKLIST: List[str] = []
 if not app.config["ENABLE_JAVASCRIPT_CONTROLS"]:
@@ -79,7 +79,12 @@ def get_permissions(user):
 
 
 def get_viz(
-    slice_id=None, form_data=None, datasource_type=None, datasource_id=None, force=False
+    slice_id=None,
+    form_data=None,
+    datasource_type=None,
+    datasource_id=None,
+    force=False,
+    result_format=ChartDataResultFormat.RECORDS,
 ):
     if slice_id:
         slc = db.session.query(Slice).filter_by(id=slice_id).one()
@@ -89,7 +94,9 @@ def get_viz(
     datasource = ConnectorRegistry.get_datasource(
         datasource_type, datasource_id, db.session
     )
-    viz_obj = viz.viz_types[viz_type](datasource, form_data=form_data, force=force)
+    viz_obj = viz.viz_types[viz_type](
+        datasource, form_data=form_data, force=force, result_format=result_format
+    )
     return viz_obj
 
 
@@ -146,6 +153,29 @@ def get_form_data(slice_id=None, use_slice_data=False):
     return form_data, slc
 
 
+def get_slice_form_data(
+    slc: Slice, form_data: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Build the form data of a chart as `get_form_data` does, without a request
+
+    :param slc: The chart
+    :param form_data: Form data overriding the chart's, e.g. dashboard filters
+    :returns: The form data of the chart
+    """
+    slice_form_data = slc.form_data.copy()
+    slice_form_data.update(form_data or {})
+    slice_form_data["slice_id"] = slc.id
+    update_time_range(slice_form_data)
+
+    if app.config["SIP_15_ENABLED"]:
+        slice_form_data["time_range_endpoints"] = get_time_range_endpoints(
+            slice_form_data, slc, slc.id
+        )
+
+    return slice_form_data
+
+
 def get_datasource_info(
     datasource_id: Optional[int],
     datasource_type: Optional[str],
@@ -21,17 +21,17 @@ These objects represent the backend of all the visualizations that
 Superset can render.
 """
 import copy
+import functools
 import hashlib
 import inspect
 import logging
 import math
-import pickle as pkl
 import re
 import uuid
 from collections import defaultdict, OrderedDict
 from datetime import datetime, timedelta
 from itertools import product
-from typing import Any, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, TYPE_CHECKING
 
 import geohash
 import numpy as np
@@ -47,22 +47,40 @@ from pandas.tseries.frequencies import to_offset
 
 from superset import app, cache, get_css_manifest_files, security_manager
 from superset.constants import NULL_STRING
+from superset.dataframe import df_to_columnar, df_to_records
 from superset.exceptions import NullValueException, SpatialException
 from superset.models.helpers import QueryResult
 from superset.typing import VizData
 from superset.utils import core as utils
+from superset.utils.cache import (
+    acquire_cache_lock,
+    CacheBatch,
+    cache_timeout_with_grace_period,
+    is_cache_value_stale,
+    release_cache_lock,
+    wait_for_cache_lock,
+    wait_for_cache_value,
+)
 from superset.utils.core import (
+    ChartDataResultFormat,
     DTTM_ALIAS,
-    JS_MAX_INTEGER,
     merge_extra_filters,
     to_adhoc,
 )
+from superset.utils.incremental_refresh import (
+    can_refresh_incrementally,
+    get_cache_value_window,
+    get_incremental_windows,
+    get_window_time_range_endpoints,
+    merge_incremental_df,
+)
 
 if TYPE_CHECKING:
     from superset.connectors.base.models import BaseDatasource
 
 config = app.config
 stats_logger = config["STATS_LOGGER"]
+cache_codec = config["CHART_CACHE_CODEC"]
 relative_start = config["DEFAULT_RELATIVE_START_TIME"]
 relative_end = config["DEFAULT_RELATIVE_END_TIME"]
 logger = logging.getLogger(__name__)
@@ -89,12 +107,17 @@ class BaseViz:
     is_timeseries = False
     cache_type = "df"
     enforce_numerical_metrics = True
+    # whether the cached data can be refreshed incrementally, see `get_incremental_df`
+    supports_incremental_refresh = False
+    # formats `get_data` can return the data in, others fall back to records
+    result_formats: Set[ChartDataResultFormat] = {ChartDataResultFormat.RECORDS}
 
     def __init__(
         self,
         datasource: "BaseDatasource",
         form_data: Dict[str, Any],
         force: bool = False,
+        result_format: ChartDataResultFormat = ChartDataResultFormat.RECORDS,
     ):
         if not datasource:
             raise Exception(_("Viz is missing a datasource"))
@@ -114,7 +137,13 @@ class BaseViz:
         self.error_msg = ""
         self.results: Optional[QueryResult] = None
         self.error_message: Optional[str] = None
+        self.stacktrace: Optional[str] = None
         self.force = force
+        self.result_format = (
+            result_format
+            if result_format in self.result_formats
+            else ChartDataResultFormat.RECORDS
+        )
 
         # Keeping track of whether some data came from cache
         # this is useful to trigger the <CachedLabel /> when
@@ -123,6 +152,8 @@ class BaseViz:
         self._any_cache_key: Optional[str] = None
         self._any_cached_dttm: Optional[str] = None
         self._extra_chart_data: List[Tuple[str, pd.DataFrame]] = []
+        # batches cache reads with the other queries of the chart, or other charts
+        self.cache_batch = CacheBatch(cache, stats_logger)
 
         self.process_metrics()
 
@@ -144,17 +175,6 @@ class BaseViz:
         self.all_metrics = list(self.metric_dict.values())
         self.metric_labels = list(self.metric_dict.keys())
 
-    @staticmethod
-    def handle_js_int_overflow(data):
-        for d in data.get("records", dict()):
-            for k, v in list(d.items()):
-                if isinstance(v, int):
-                    # if an int is too big for Java Script to handle
-                    # convert it to a string
-                    if abs(v) > JS_MAX_INTEGER:
-                        d[k] = str(v)
-        return data
-
     def run_extra_queries(self):
         """Lifecycle method to use when more than one query is needed
 
@@ -200,11 +220,9 @@ class BaseViz:
 
         self.error_msg = ""
 
-        timestamp_format = None
+        granularity_col = None
         if self.datasource.type == "table":
             granularity_col = self.datasource.get_column(query_obj["granularity"])
-            if granularity_col:
-                timestamp_format = granularity_col.python_date_format
 
         # The datasource here can be different backend but the interface is common
         self.results = self.datasource.query(query_obj)
@@ -214,38 +232,21 @@ class BaseViz:
 
         df = self.results.df
         # Transform the timestamp we received from database to pandas supported
-        # datetime format. If no python_date_format is specified, the pattern will
-        # be considered as the default ISO date format
-        # If the datetime format is unix, the parse will use the corresponding
-        # parsing logic.
+        # datetime format, see `utils.normalize_dttm_col`
         if not df.empty:
-            if DTTM_ALIAS in df.columns:
-                if timestamp_format in ("epoch_s", "epoch_ms"):
-                    # Column has already been formatted as a timestamp.
-                    dttm_col = df[DTTM_ALIAS]
-                    one_ts_val = dttm_col[0]
-
-                    # convert time column to pandas Timestamp, but different
-                    # ways to convert depending on string or int types
-                    try:
-                        int(one_ts_val)
-                        is_integral = True
-                    except (ValueError, TypeError):
-                        is_integral = False
-                    if is_integral:
-                        unit = "s" if timestamp_format == "epoch_s" else "ms"
-                        df[DTTM_ALIAS] = pd.to_datetime(
-                            dttm_col, utc=False, unit=unit, origin="unix"
-                        )
-                    else:
-                        df[DTTM_ALIAS] = dttm_col.apply(pd.Timestamp)
-                else:
-                    df[DTTM_ALIAS] = pd.to_datetime(
-                        df[DTTM_ALIAS], utc=False, format=timestamp_format
-                    )
-                if self.datasource.offset:
-                    df[DTTM_ALIAS] += timedelta(hours=self.datasource.offset)
-                df[DTTM_ALIAS] += self.time_shift
+            inferred_format = utils.normalize_dttm_col(
+                df,
+                timestamp_format=granularity_col.python_date_format
+                if granularity_col
+                else None,
+                offset=self.datasource.offset,
+                time_shift=self.time_shift,
+                inferred_format=granularity_col.inferred_date_format
+                if granularity_col
+                else None,
+            )
+            if granularity_col:
+                granularity_col.inferred_date_format = inferred_format
 
             if self.enforce_numerical_metrics:
                 self.df_metrics_to_num(df)
@@ -344,6 +345,215 @@ class BaseViz:
             return self.datasource.database.cache_timeout
         return config["CACHE_DEFAULT_TIMEOUT"]
 
+    @property
+    def stale_cache_timeout(self) -> int:
+        """The cache timeout, plus the grace period stale data is served for"""
+        return cache_timeout_with_grace_period(
+            self.cache_timeout, config["CHART_CACHE_STALE_GRACE_PERIOD"]
+        )
+
+    def is_incremental(self, query_obj: Dict[str, Any]) -> bool:
+        """Whether the cached data of the query is refreshed incrementally"""
+        return bool(
+            config["CHART_INCREMENTAL_REFRESH"]
+            and self.supports_incremental_refresh
+            and can_refresh_incrementally(self.datasource.type, query_obj)
+        )
+
+    def get_incremental_df(
+        self,
+        query_obj: Dict[str, Any],
+        cache_key: str,
+        cache_value: Optional[Dict[str, Any]] = None,
+    ) -> Optional[pd.DataFrame]:
+        """
+        Refresh cached data by only querying the time ranges that may have changed,
+        see `superset.utils.incremental_refresh`
+
+        :param query_obj: The query object
+        :param cache_key: The cache key of the query
+        :param cache_value: The expired cache value, read from the cache when
+            forcing a refresh if None
+        :return: The refreshed data, or None if it can't be refreshed incrementally
+        """
+        try:
+            if cache_value is None and self.force:
+                cache_binary = cache.get(cache_key)
+                cache_value = cache_codec.loads(cache_binary) if cache_binary else None
+            if not cache_value:
+                return None
+            windows = get_incremental_windows(
+                cache_value,
+                query_obj["from_dttm"],
+                query_obj["to_dttm"],
+                shift=timedelta(hours=self.datasource.offset or 0) + self.time_shift,
+                overlap=timedelta(seconds=config["CHART_INCREMENTAL_REFRESH_OVERLAP"]),
+                row_limit=query_obj.get("row_limit"),
+            )
+            if not windows:
+                return None
+
+            dfs = []
+            queries = []
+            for window in filter(None, (windows.head, windows.tail)):
+                window_query_obj = copy.copy(query_obj)
+                window_query_obj["from_dttm"], window_query_obj["to_dttm"] = window
+                window_query_obj["extras"] = dict(
+                    query_obj["extras"],
+                    time_range_endpoints=get_window_time_range_endpoints(
+                        window,
+                        query_obj["to_dttm"],
+                        query_obj["extras"].get("time_range_endpoints"),
+                    ),
+                )
+                dfs.append(self.get_df(window_query_obj))
+                if self.status == utils.QueryStatus.FAILED:
+                    return None
+                queries.append(self.query)
+
+            df = merge_incremental_df(cache_value["df"], windows, dfs)
+            if query_obj.get("row_limit") and len(df.index) >= query_obj["row_limit"]:
+                return None
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Could not refresh cache key %s incrementally", cache_key)
+            logger.exception(e)
+            return None
+        self.query = ";\n\n".join(queries)
+        stats_logger.incr("incremental_refresh")
+        return df
+
+    def refresh_key(self) -> str:
+        """
+        The key of the lock on refreshing the stale cached data of the chart, taken
+        once for all its queries as refreshing the chart refreshes them all
+        """
+        refresh_dict = {
+            "form_data": self.form_data,
+            "datasource": self.datasource.uid,
+            "rls": security_manager.get_rls_ids(self.datasource),
+        }
+        json_data = self.json_dumps(refresh_dict, sort_keys=True)
+        return "refresh_" + hashlib.md5(json_data.encode("utf-8")).hexdigest()
+
+    def refresh_stale_cache(self) -> None:
+        """Refresh stale cached data in the background, unless already refreshing"""
+        refresh_key = self.refresh_key()
+        if not acquire_cache_lock(
+            cache, refresh_key, config["CHART_CACHE_LOCK_TIMEOUT"]
+        ):
+            return
+        from superset.tasks.cache import refresh_chart_cache
+
+        try:
+            refresh_chart_cache.delay(
+                self.datasource.type,
+                self.datasource.id,
+                self.form_data,
+                refresh_key,
+                utils.get_username(),
+            )
+            stats_logger.incr("refresh_stale_cache_key")
+        except Exception as e:
+            logger.warning("Could not refresh stale cache key {}".format(refresh_key))
+            logger.exception(e)
+            release_cache_lock(cache, refresh_key)
+
+    def get_df_payloads(
+        self, queries: List[Tuple[Dict[str, Any], Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Run sibling queries concurrently, see `get_df_payload`
+
+        :param queries: The query object and the extra cache key arguments of each
+            query
+        :return: The payload of each query, in order
+        """
+        self.datasource.load_query_relationships()
+        if cache:
+            self.cache_batch.prefetch(self.get_cache_keys(queries))
+        # each query runs on its own copy, as running it sets the status, query and
+        # error of the viz
+        viz_objs = [self.copy_for_query() for _ in queries]
+        with self.cache_batch:
+            payloads = utils.run_concurrently(
+                [
+                    functools.partial(
+                        viz_obj.get_df_payload, copy.deepcopy(query_obj), **kwargs
+                    )
+                    for viz_obj, (query_obj, kwargs) in zip(viz_objs, queries)
+                ],
+                config["CHART_DATA_QUERY_CONCURRENCY"],
+            )
+        for payload in payloads:
+            if payload["is_cached"]:
+                self._any_cache_key = payload["cache_key"]
+                self._any_cached_dttm = payload["cached_dttm"]
+        # the chart fails with the first of its queries failing
+        for payload in payloads:
+            if (
+                payload["status"] == utils.QueryStatus.FAILED
+                and self.status != utils.QueryStatus.FAILED
+            ):
+                self.status = payload["status"]
+                self.error_message = payload["error"]
+                self.stacktrace = payload["stacktrace"]
+        return payloads
+
+    def copy_for_query(self) -> "BaseViz":
+        """A shallow copy of the viz, with its own state of the last query run"""
+        viz_obj = copy.copy(self)
+        viz_obj.query = ""
+        viz_obj.status = None
+        viz_obj.results = None
+        viz_obj.error_message = None
+        viz_obj.stacktrace = None
+        viz_obj._any_cache_key = None
+        viz_obj._any_cached_dttm = None
+        return viz_obj
+
+    def get_cache_keys(
+        self, queries: Sequence[Tuple[Dict[str, Any], Dict[str, Any]]]
+    ) -> List[str]:
+        """
+        The cache keys of queries whose data may be read from the cache
+
+        :param queries: The query object and the extra cache key arguments of each
+            query
+        :return: The cache keys of the queries that don't force a refresh
+        """
+        cache_keys: List[str] = []
+        if self.force:
+            return cache_keys
+        for query_obj, kwargs in queries:
+            try:
+                if query_obj:
+                    cache_keys.append(self.cache_key(query_obj, **kwargs))
+            except Exception as e:  # pylint: disable=broad-except
+                # raised again when running the query
+                logger.info("Not prefetching cache value: {}".format(e))
+        return cache_keys
+
+    @staticmethod
+    def prefetch_cache_values(
+        viz_objs: Sequence["BaseViz"], cache_batch: CacheBatch
+    ) -> None:
+        """
+        Read the cached data of the main query of several charts in a single cache
+        round trip, instead of one round trip per chart in `get_df_payload`
+
+        :param viz_objs: The charts
+        :param cache_batch: The batch the charts then read their data from
+        """
+        cache_keys: List[str] = []
+        for viz_obj in viz_objs:
+            viz_obj.cache_batch = cache_batch
+            try:
+                cache_keys += viz_obj.get_cache_keys([(viz_obj.query_obj(), {})])
+            except Exception as e:  # pylint: disable=broad-except
+                logger.info("Not prefetching cache value: {}".format(e))
+        if cache:
+            cache_batch.prefetch(cache_keys)
+
     def get_json(self):
         return json.dumps(
             self.get_payload(), default=utils.json_int_dttm_ser, ignore_nan=True
@@ -376,10 +586,47 @@ class BaseViz:
         json_data = self.json_dumps(cache_dict, sort_keys=True)
         return hashlib.md5(json_data.encode("utf-8")).hexdigest()
 
+    def load_cache_value(
+        self, cache_key: str, cache_binary: bytes, cache_timeout: int, incremental: bool
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Load a value read from the cache, and refresh it if it's stale.
+
+        :return: The value to serve, and the expired value to refresh incrementally,
+            both None if the value couldn't be read
+        """
+        stats_logger.incr("loading_from_cache")
+        try:
+            cache_value = cache_codec.loads(cache_binary)
+        except Exception as e:
+            logger.exception(e)
+            logger.error("Error reading cache: " + utils.error_msg_from_exception(e))
+            return None, None
+        if incremental and is_cache_value_stale(
+            cache_value["dttm"], self.stale_cache_timeout
+        ):
+            # expired, only kept to be refreshed incrementally
+            return None, cache_value
+        stats_logger.incr("loaded_from_cache")
+        try:
+            if not cache_codec.is_current(cache_binary):
+                # rewrite values cached in another format, e.g. pickled
+                stats_logger.incr("rewrite_cache_key")
+                self.cache_batch.set(
+                    cache_key, cache_codec.dumps(cache_value), timeout=cache_timeout
+                )
+            if is_cache_value_stale(cache_value["dttm"], self.cache_timeout):
+                self.refresh_stale_cache()
+        except Exception as e:
+            logger.exception(e)
+            logger.error("Error reading cache: " + utils.error_msg_from_exception(e))
+        return cache_value, None
+
     def get_payload(self, query_obj=None):
         """Returns a payload of metadata and data"""
-        self.run_extra_queries()
-        payload = self.get_df_payload(query_obj)
+        with self.cache_batch:
+            self.run_extra_queries()
+            payload = self.get_df_payload(query_obj)
 
         df = payload.get("df")
         if self.status != utils.QueryStatus.FAILED:
@@ -387,6 +634,7 @@ class BaseViz:
                 payload["error"] = "No data"
             else:
                 payload["data"] = self.get_data(df)
+                payload["result_format"] = self.result_format
         if "df" in payload:
             del payload["df"]
         return payload
@@ -398,64 +646,105 @@ class BaseViz:
         cache_key = self.cache_key(query_obj, **kwargs) if query_obj else None
         logger.info("Cache key: {}".format(cache_key))
         is_loaded = False
-        stacktrace = None
+        stacktrace = self.stacktrace
         df = None
         cached_dttm = datetime.utcnow().isoformat().split(".")[0]
-        if cache_key and cache and not self.force:
-            cache_value = cache.get(cache_key)
-            if cache_value:
-                stats_logger.incr("loading_from_cache")
-                try:
-                    cache_value = pkl.loads(cache_value)
+        is_locked = False
+        incremental = bool(query_obj) and self.is_incremental(query_obj)
+        cache_timeout = self.stale_cache_timeout
+        if incremental:
+            # keep expired data as the base of incremental refreshes
+            cache_timeout = cache_timeout_with_grace_period(
+                cache_timeout, config["CHART_INCREMENTAL_REFRESH_RETENTION"]
+            )
+        base_value = None
+        try:
+            if cache_key and cache and not self.force:
+                cache_value = self.cache_batch.get(cache_key)
+                if not cache_value and config["CHART_CACHE_LOCK_WAIT"]:
+                    is_locked = acquire_cache_lock(
+                        cache, cache_key, config["CHART_CACHE_LOCK_TIMEOUT"]
+                    )
+                    if not is_locked:
+                        # another request is running the same query, wait for it
+                        stats_logger.incr("waiting_for_cache_lock")
+                        cache_value = wait_for_cache_value(
+                            cache, cache_key, config["CHART_CACHE_LOCK_WAIT"]
+                        )
+                if cache_value:
+                    cache_value, base_value = self.load_cache_value(
+                        cache_key, cache_value, cache_timeout, incremental
+                    )
+                if base_value and not is_locked and config["CHART_CACHE_LOCK_WAIT"]:
+                    # expired values are refreshed incrementally by a single
+                    # request too, the others wait for the refreshed value
+                    is_locked = acquire_cache_lock(
+                        cache, cache_key, config["CHART_CACHE_LOCK_TIMEOUT"]
+                    )
+                    if not is_locked:
+                        stats_logger.incr("waiting_for_cache_lock")
+                        cache_value = wait_for_cache_lock(
+                            cache, cache_key, config["CHART_CACHE_LOCK_WAIT"]
+                        )
+                        if cache_value:
+                            cache_value, base_value = self.load_cache_value(
+                                cache_key, cache_value, cache_timeout, incremental
+                            )
+                if cache_value:
                     df = cache_value["df"]
                     self.query = cache_value["query"]
                     self._any_cached_dttm = cache_value["dttm"]
                     self._any_cache_key = cache_key
                     self.status = utils.QueryStatus.SUCCESS
                     is_loaded = True
-                    stats_logger.incr("loaded_from_cache")
-                except Exception as e:
-                    logger.exception(e)
-                    logger.error(
-                        "Error reading cache: " + utils.error_msg_from_exception(e)
-                    )
-                logger.info("Serving from cache")
-
-        if query_obj and not is_loaded:
-            try:
-                df = self.get_df(query_obj)
-                if self.status != utils.QueryStatus.FAILED:
-                    stats_logger.incr("loaded_from_source")
-                    is_loaded = True
-            except Exception as e:
-                logger.exception(e)
-                if not self.error_message:
-                    self.error_message = "{}".format(e)
-                self.status = utils.QueryStatus.FAILED
-                stacktrace = utils.get_stacktrace()
+                    logger.info("Serving from cache")
 
-            if (
-                is_loaded
-                and cache_key
-                and cache
-                and self.status != utils.QueryStatus.FAILED
-            ):
+            if query_obj and not is_loaded:
                 try:
-                    cache_value = dict(dttm=cached_dttm, df=df, query=self.query)
-                    cache_value = pkl.dumps(cache_value, protocol=pkl.HIGHEST_PROTOCOL)
-
-                    logger.info(
-                        "Caching {} chars at key {}".format(len(cache_value), cache_key)
-                    )
-
-                    stats_logger.incr("set_cache_key")
-                    cache.set(cache_key, cache_value, timeout=self.cache_timeout)
+                    df = None
+                    if incremental and cache_key and cache:
+                        df = self.get_incremental_df(query_obj, cache_key, base_value)
+                    if df is None:
+                        df = self.get_df(query_obj)
+                    if self.status != utils.QueryStatus.FAILED:
+                        stats_logger.incr("loaded_from_source")
+                        is_loaded = True
                 except Exception as e:
-                    # cache.set call can fail if the backend is down or if
-                    # the key is too large or whatever other reasons
-                    logger.warning("Could not cache key {}".format(cache_key))
                     logger.exception(e)
-                    cache.delete(cache_key)
+                    if not self.error_message:
+                        self.error_message = "{}".format(e)
+                    self.status = utils.QueryStatus.FAILED
+                    stacktrace = utils.get_stacktrace()
+
+                if (
+                    is_loaded
+                    and cache_key
+                    and cache
+                    and self.status != utils.QueryStatus.FAILED
+                ):
+                    try:
+                        cache_value = dict(dttm=cached_dttm, df=df, query=self.query)
+                        if incremental:
+                            cache_value.update(get_cache_value_window(query_obj))
+                        cache_value = cache_codec.dumps(cache_value)
+
+                        logger.info(
+                            "Caching {} chars at key {}".format(
+                                len(cache_value), cache_key
+                            )
+                        )
+
+                        stats_logger.incr("set_cache_key")
+                        cache.set(cache_key, cache_value, timeout=cache_timeout)
+                    except Exception as e:
+                        # cache.set call can fail if the backend is down or if
+                        # the key is too large or whatever other reasons
+                        logger.warning("Could not cache key {}".format(cache_key))
+                        logger.exception(e)
+                        cache.delete(cache_key)
+        finally:
+            if is_locked:
+                release_cache_lock(cache, cache_key)
         return {
             "cache_key": self._any_cache_key,
             "cached_dttm": self._any_cached_dttm,
@@ -499,6 +788,8 @@ class BaseViz:
         return df.to_csv(index=include_index, **config["CSV_EXPORT"])
 
     def get_data(self, df: pd.DataFrame) -> VizData:
+        if self.result_format == ChartDataResultFormat.COLUMNAR:
+            return df_to_columnar(df)
         return df.to_dict(orient="records")
 
     @property
@@ -515,6 +806,7 @@ class TableViz(BaseViz):
     credits = 'a <a href="https://github.com/airbnb/superset">Superset</a> original'
     is_timeseries = False
     enforce_numerical_metrics = False
+    result_formats = {ChartDataResultFormat.RECORDS, ChartDataResultFormat.COLUMNAR}
 
     def should_be_timeseries(self):
         fd = self.form_data
@@ -601,11 +893,9 @@ class TableViz(BaseViz):
             axis=1,
         )
 
-        data = self.handle_js_int_overflow(
-            dict(records=df.to_dict(orient="records"), columns=list(df.columns))
-        )
-
-        return data
+        if self.result_format == ChartDataResultFormat.COLUMNAR:
+            return df_to_columnar(df)
+        return dict(records=df_to_records(df), columns=list(df.columns))
 
     def json_dumps(self, obj, sort_keys=False):
         return json.dumps(
@@ -1106,6 +1396,59 @@ class NVD3TimeSeriesViz(NVD3Viz):
     sort_series = False
     is_timeseries = True
     pivot_fill_value: Optional[int] = None
+    supports_incremental_refresh = True
+    # whether `process_data` can be computed by the database, see `get_post_processing`
+    supports_post_processing_pushdown = True
+
+    def query_obj(self):
+        d = super().query_obj()
+        post_processing = self.get_post_processing()
+        if post_processing:
+            d["extras"]["post_processing"] = post_processing
+        return d
+
+    def get_post_processing(self) -> Optional[Dict[str, Any]]:
+        """
+        The rolling window, cumulative sum or contribution of `process_data` that the
+        database computes instead with window functions, when the results are the
+        same, see `SqlaTable.get_post_processing_query`
+        """
+        fd = self.form_data
+        if not (
+            config["CHART_POST_PROCESSING_PUSHDOWN"]
+            and self.supports_post_processing_pushdown
+            and self.datasource.type == "table"
+            and self.datasource.database.db_engine_spec.allows_window_functions
+            # pandas fills missing values, which then count in windows and sums
+            and self.pivot_fill_value is None
+            # resampling comes first, and fills the gaps between time buckets
+            and not (fd.get("resample_rule") and fd.get("resample_method"))
+            # series are sorted by the sums of their values before post processing
+            and not self.sort_series
+        ):
+            return None
+
+        rolling_type = fd.get("rolling_type")
+        rolling_periods = int(fd.get("rolling_periods") or 0)
+        contribution = bool(fd.get("contribution"))
+        if rolling_type in ("mean", "std", "sum") and rolling_periods:
+            # windows over the rows of a series only span the same time buckets as
+            # in pandas if no series misses any, i.e. without groupby
+            if rolling_type == "std" or self.groupby or contribution:
+                return None
+        elif rolling_type == "cumsum":
+            if contribution:
+                return None
+        elif contribution:
+            rolling_type = None
+        else:
+            return None
+        return {
+            "rolling_type": rolling_type,
+            "rolling_periods": rolling_periods,
+            "min_periods": int(fd.get("min_periods") or 0),
+            "contribution": contribution,
+        }
 
     def to_series(self, df, classed="", title_suffix=""):
         cols = []
@@ -1117,13 +1460,15 @@ class NVD3TimeSeriesViz(NVD3Viz):
             else:
                 cols.append(col)
         df.columns = cols
-        series = df.to_dict("series")
+        # only keep the numeric series with at least one value
+        df = df.loc[:, [dtype.kind in "biufc" for dtype in df.dtypes]]
+        df = df.loc[:, df.notna().any().to_numpy()]
+        xs = df.index.tolist()
 
         chart_data = []
-        for name in df.T.index.tolist():
-            ys = series[name]
-            if df[name].dtype.kind not in "biufc":
-                continue
+        for i, name in enumerate(df.columns):
+            # native Python numbers, which serialize without the default hook
+            ys = df.iloc[:, i].tolist()
             if isinstance(name, list):
                 series_title = [str(title) for title in name]
             elif isinstance(name, tuple):
@@ -1143,20 +1488,7 @@ class NVD3TimeSeriesViz(NVD3Viz):
                 elif isinstance(series_title, (list, tuple)):
                     series_title = series_title + (title_suffix,)
 
-            values = []
-            non_nan_cnt = 0
-            for ds in df.index:
-                if ds in ys:
-                    d = {"x": ds, "y": ys[ds]}
-                    if not np.isnan(ys[ds]):
-                        non_nan_cnt += 1
-                else:
-                    d = {}
-                values.append(d)
-
-            if non_nan_cnt == 0:
-                continue
-
+            values = [{"x": x, "y": y} for x, y in zip(xs, ys)]
             d = {"key": series_title, "values": values}
             if classed:
                 d["classed"] = classed
@@ -1198,7 +1530,9 @@ class NVD3TimeSeriesViz(NVD3Viz):
             dfs.sort_values(ascending=False, inplace=True)
             df = df[dfs.index]
 
-        rolling_type = fd.get("rolling_type")
+        # computed by the database already
+        post_processing = self.get_post_processing()
+        rolling_type = fd.get("rolling_type") if not post_processing else None
         rolling_periods = int(fd.get("rolling_periods") or 0)
         min_periods = int(fd.get("min_periods") or 0)
 
@@ -1215,7 +1549,7 @@ class NVD3TimeSeriesViz(NVD3Viz):
         if min_periods:
             df = df[min_periods:]
 
-        if fd.get("contribution"):
+        if fd.get("contribution") and not post_processing:
             dft = df.T
             df = (dft / dft.sum()).T
 
@@ -1229,6 +1563,7 @@ class NVD3TimeSeriesViz(NVD3Viz):
         if not isinstance(time_compare, list):
             time_compare = [time_compare]
 
+        queries = []
         for option in time_compare:
             query_object = self.query_obj()
             delta = utils.parse_past_timedelta(option)
@@ -1244,8 +1579,12 @@ class NVD3TimeSeriesViz(NVD3Viz):
                 )
             query_object["from_dttm"] -= delta
             query_object["to_dttm"] -= delta
+            queries.append((query_object, {"time_compare": option}))
 
-            df2 = self.get_df_payload(query_object, time_compare=option).get("df")
+        payloads = self.get_df_payloads(queries)
+        for option, payload in zip(time_compare, payloads):
+            delta = utils.parse_past_timedelta(option)
+            df2 = payload.get("df")
             if df2 is not None and DTTM_ALIAS in df2:
                 label = "{} offset".format(option)
                 df2[DTTM_ALIAS] += delta
@@ -1838,18 +2177,22 @@ class FilterBoxViz(BaseViz):
         qry = super().query_obj()
         filters = self.form_data.get("filter_configs") or []
         qry["row_limit"] = self.filter_row_limit
-        self.dataframes = {}
+        queries = []
         for flt in filters:
             col = flt.get("column")
             if not col:
                 raise Exception(
                     _("Invalid filter configuration, please select a column")
                 )
-            qry["groupby"] = [col]
             metric = flt.get("metric")
-            qry["metrics"] = [metric] if metric else []
-            df = self.get_df_payload(query_obj=qry).get("df")
-            self.dataframes[col] = df
+            filter_qry = copy.deepcopy(qry)
+            filter_qry.update(groupby=[col], metrics=[metric] if metric else [])
+            queries.append((filter_qry, {}))
+        payloads = self.get_df_payloads(queries)
+        self.dataframes = {
+            filter_qry["groupby"][0]: payload.get("df")
+            for (filter_qry, kwargs), payload in zip(queries, payloads)
+        }
 
     def get_data(self, df: pd.DataFrame) -> VizData:
         filters = self.form_data.get("filter_configs") or []
@@ -2660,6 +3003,8 @@ class PartitionViz(NVD3TimeSeriesViz):
 
     viz_type = "partition"
     verbose_name = _("Partition Diagram")
+    # aggregates the processed data of the levels of the partition again
+    supports_post_processing_pushdown = False
 
     def query_obj(self):
         query_obj = super().query_obj()
@@ -16,8 +16,18 @@
 # under the License.
 """Unit tests for Superset with caching"""
 import json
+from unittest.mock import call, Mock, patch
 
-from superset import cache, db
+from superset import app, cache, db
+from superset.utils.cache import (
+    acquire_cache_lock,
+    CacheBatch,
+    cache_timeout_with_grace_period,
+    is_cache_value_stale,
+    release_cache_lock,
+    wait_for_cache_lock,
+    wait_for_cache_value,
+)
 from superset.utils.core import QueryStatus
 
 from .base_tests import SupersetTestCase
@@ -51,3 +61,134 @@ class CacheTests(SupersetTestCase):
         self.assertEqual(resp_from_cache["status"], QueryStatus.SUCCESS)
         self.assertEqual(resp["data"], resp_from_cache["data"])
         self.assertEqual(resp["query"], resp_from_cache["query"])
+
+    def test_cache_lock(self):
+        self.assertTrue(acquire_cache_lock(cache, "key", timeout=10))
+        self.assertFalse(acquire_cache_lock(cache, "key", timeout=10))
+
+        # the holder hasn't stored a value yet
+        self.assertIsNone(wait_for_cache_value(cache, "key", timeout=0.2))
+
+        cache.set("key", "value")
+        self.assertEqual(wait_for_cache_value(cache, "key", timeout=0.2), "value")
+
+        # no need to wait once the lock is released without a value
+        cache.delete("key")
+        release_cache_lock(cache, "key")
+        self.assertIsNone(wait_for_cache_value(cache, "key", timeout=60))
+        self.assertTrue(acquire_cache_lock(cache, "key", timeout=10))
+
+        # values already cached are only returned once the lock is released
+        cache.set("key", "value")
+        self.assertEqual(wait_for_cache_lock(cache, "key", timeout=0.2), "value")
+        release_cache_lock(cache, "key")
+        self.assertEqual(wait_for_cache_lock(cache, "key", timeout=60), "value")
+
+    def test_cache_value_waits_for_lock(self):
+        self.login(username="admin")
+        slc = self.get_slice("Girls", db.session)
+        cache_key = slc.viz.cache_key(slc.viz.query_obj())
+        slc.viz.get_df_payload()
+        cache_value = cache.get(cache_key)
+        cache.delete(cache_key)
+
+        # another request holds the lock, and stores its result while we wait
+        self.assertTrue(acquire_cache_lock(cache, cache_key, timeout=10))
+        with patch("superset.viz.wait_for_cache_value", return_value=cache_value):
+            with patch.object(type(slc.viz), "get_df") as get_df:
+                payload = slc.viz.get_df_payload()
+        release_cache_lock(cache, cache_key)
+        get_df.assert_not_called()
+        self.assertEqual(payload["cache_key"], cache_key)
+        self.assertEqual(payload["status"], QueryStatus.SUCCESS)
+
+    def test_expired_incremental_value_waits_for_lock(self):
+        self.login(username="admin")
+        slc = self.get_slice("Girls", db.session)
+        cache_key = slc.viz.cache_key(slc.viz.query_obj())
+        slc.viz.get_df_payload()
+        cache_value = cache.get(cache_key)
+
+        # age the cached value past its cache timeout
+        codec = app.config["CHART_CACHE_CODEC"]
+        expired_value = codec.loads(cache_value)
+        expired_value["dttm"] = "2020-01-01T00:00:00"
+        cache.set(cache_key, codec.dumps(expired_value))
+
+        # another request holds the lock to refresh it, and stores the refreshed
+        # value while we wait
+        self.assertTrue(acquire_cache_lock(cache, cache_key, timeout=10))
+        viz_type = type(slc.viz)
+        with patch.object(viz_type, "is_incremental", return_value=True), patch(
+            "superset.viz.wait_for_cache_lock", return_value=cache_value
+        ) as wait, patch.object(viz_type, "get_incremental_df") as get_incremental_df:
+            payload = slc.viz.get_df_payload()
+        release_cache_lock(cache, cache_key)
+        wait.assert_called_once()
+        get_incremental_df.assert_not_called()
+        self.assertEqual(payload["cache_key"], cache_key)
+        self.assertEqual(payload["status"], QueryStatus.SUCCESS)
+        self.assertNotEqual(payload["cached_dttm"], "2020-01-01T00:00:00")
+
+    def test_is_cache_value_stale(self):
+        self.assertFalse(is_cache_value_stale(None, 60))
+        self.assertFalse(is_cache_value_stale("2020-01-01T00:00:00", 0))
+        self.assertTrue(is_cache_value_stale("2020-01-01T00:00:00", 60))
+        self.assertEqual(cache_timeout_with_grace_period(60, 30), 90)
+        self.assertEqual(cache_timeout_with_grace_period(0, 30), 0)
+
+    @patch.dict(app.config, {"CHART_CACHE_STALE_GRACE_PERIOD": 3600})
+    def test_stale_cache_value(self):
+        self.login(username="admin")
+        slc = self.get_slice("Girls", db.session)
+        viz_obj = slc.viz
+        query_obj = viz_obj.query_obj()
+        # the chart's main query, and another one e.g. of a time comparison
+        queries = [(query_obj, {}), (query_obj, {"time_compare": "1 week ago"})]
+        viz_obj.get_df_payloads(queries)
+
+        # age the cached values past their cache timeout
+        codec = app.config["CHART_CACHE_CODEC"]
+        for query_obj, kwargs in queries:
+            cache_key = viz_obj.cache_key(query_obj, **kwargs)
+            cache_value = codec.loads(cache.get(cache_key))
+            cache_value["dttm"] = "2020-01-01T00:00:00"
+            cache.set(cache_key, codec.dumps(cache_value))
+
+        with patch("superset.tasks.cache.refresh_chart_cache.delay") as delay:
+            payloads = viz_obj.get_df_payloads(queries)
+            slc.viz.get_df_payload()
+        release_cache_lock(cache, viz_obj.refresh_key())
+
+        # the stale values are served, and the chart refreshed once in the background
+        for payload in payloads:
+            self.assertTrue(payload["is_cached"])
+            self.assertEqual(payload["cached_dttm"], "2020-01-01T00:00:00")
+        self.assertEqual(delay.call_count, 1)
+        self.assertEqual(delay.call_args[0][3], viz_obj.refresh_key())
+
+    def test_cache_batch(self):
+        cache.set("key1", "value1")
+        stats_logger = Mock()
+        batch = CacheBatch(cache, stats_logger)
+        batch.prefetch(["key1", "key2", "key1"])
+        self.assertEqual((batch.hits, batch.misses), (1, 1))
+        stats_logger.timing.assert_has_calls(
+            [call("cache_batch_hits", 1), call("cache_batch_misses", 1)]
+        )
+
+        with patch.object(cache, "get") as get:
+            self.assertEqual(batch.get("key1"), "value1")
+            self.assertIsNone(batch.get("key2"))
+            get.assert_not_called()
+        # prefetched values are only served once
+        self.assertEqual(batch.get("key1"), "value1")
+
+        with batch:
+            with batch:
+                batch.set("key2", "value2", timeout=10)
+            self.assertIsNone(cache.get("key2"))
+        self.assertEqual(cache.get("key2"), "value2")
+
+        batch.set("key3", "value3")
+        self.assertEqual(cache.get("key3"), "value3")
@@ -24,6 +24,7 @@ import unittest
 import unittest.mock as mock
 
 import flask
+import pyarrow as pa
 from flask import current_app
 
 from tests.test_app import app
@@ -306,7 +307,7 @@ class CeleryTestCase(SupersetTestCase):
             )
             expand_data.assert_not_called()
 
-        self.assertIsInstance(data, bytes)
+        self.assertIsInstance(data, pa.Table)
 
     def test_default_payload_serialization(self):
         use_new_deserialization = False
@@ -20,6 +20,7 @@ import cgi
 import csv
 import datetime
 import doctest
+import gzip
 import io
 import json
 import logging
@@ -55,7 +56,7 @@ from superset.models.datasource_access_request import DatasourceAccessRequest
 from superset.models.slice import Slice
 from superset.models.sql_lab import Query
 from superset.result_set import SupersetResultSet
-from superset.utils import core as utils
+from superset.utils import core as utils, results_payload
 from superset.views import core as views
 from superset.views.database.views import DatabaseView
 
@@ -209,6 +210,25 @@ class CoreTests(SupersetTestCase):
         resp = json.loads(self.get_resp("/api/v1/query/", {"query_context": data}))
         self.assertEqual(resp[0]["rowcount"], 100)
 
+    def test_api_v1_query_endpoint_columnar(self):
+        self.login(username="admin")
+        qc_dict = self._get_query_context_dict()
+        qc_dict["result_format"] = "columnar"
+        data = json.dumps(qc_dict)
+        resp = json.loads(self.get_resp("/api/v1/query/", {"query_context": data}))
+        self.assertEqual(resp[0]["result_format"], "columnar")
+        self.assertEqual(resp[0]["data"]["rowcount"], 100)
+        self.assertEqual(
+            [column["name"] for column in resp[0]["data"]["columns"]],
+            ["name", "sum__num"],
+        )
+
+        qc_dict["result_format"] = "invalid"
+        resp = self.client.post(
+            "/api/v1/query/", data={"query_context": json.dumps(qc_dict)}
+        )
+        self.assertEqual(resp.status_code, 400)
+
     def test_old_slice_json_endpoint(self):
         self.login(username="admin")
         slc = self.get_slice("Girls", db.session)
@@ -227,6 +247,82 @@ class CoreTests(SupersetTestCase):
         resp = self.get_resp(slc.explore_json_url)
         assert '"Jennifer"' in resp
 
+    def test_slice_json_endpoint_columnar(self):
+        self.login(username="admin")
+        slc = self.get_slice("Girls", db.session)
+        json_endpoint = "/superset/explore_json/{}/{}/?result_format=columnar".format(
+            slc.datasource_type, slc.datasource_id
+        )
+        data = self.get_json_resp(
+            json_endpoint, {"form_data": json.dumps(slc.viz.form_data)}
+        )
+        self.assertEqual(data["result_format"], "columnar")
+        names = [column["name"] for column in data["data"]["columns"]]
+        self.assertEqual(len(data["data"]["data"]), len(names))
+        self.assertIn("Jennifer", data["data"]["data"][names.index("name")])
+
+        resp = self.client.get(json_endpoint.replace("columnar", "invalid"))
+        self.assertEqual(resp.status_code, 400)
+
+    def test_dashboard_chart_data_endpoint(self):
+        self.login(username="admin")
+        girls = self.get_slice("Girls", db.session)
+        genders = self.get_slice("Genders", db.session)
+        resp = self.client.post(
+            "/superset/dashboard_chart_data/",
+            json={"slice_ids": [girls.id, genders.id, 0], "force": True},
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, "application/x-ndjson")
+        lines = {
+            line["slice_id"]: line
+            for line in map(json.loads, resp.data.decode("utf-8").splitlines())
+        }
+        self.assertEqual(set(lines), {girls.id, genders.id, 0})
+        self.assertEqual(lines[0]["status"], 404)
+        self.assertEqual(lines[girls.id]["status"], 200)
+        self.assertEqual(lines[genders.id]["status"], 200)
+        self.assertIn("Jennifer", json.dumps(lines[girls.id]["payload"]["data"]))
+
+        # dashboard filters only apply to the charts in their scope
+        resp = self.client.post(
+            "/superset/dashboard_chart_data/",
+            json={
+                "slice_ids": [girls.id, genders.id],
+                "extra_filters": {
+                    str(genders.id): [{"col": "gender", "op": "in", "val": ["boy"]}]
+                },
+                "force": True,
+            },
+        )
+        lines = {
+            line["slice_id"]: line
+            for line in map(json.loads, resp.data.decode("utf-8").splitlines())
+        }
+        self.assertEqual(lines[genders.id]["payload"]["rowcount"], 1)
+        self.assertGreater(lines[girls.id]["payload"]["rowcount"], 1)
+
+        # the data is now read from the cache
+        resp = self.client.post(
+            "/superset/dashboard_chart_data/", json={"slice_ids": [girls.id]}
+        )
+        line = json.loads(resp.data.decode("utf-8"))
+        self.assertTrue(line["payload"]["is_cached"])
+
+        resp = self.client.post(
+            "/superset/dashboard_chart_data/", json={"slice_ids": "all"}
+        )
+        self.assertEqual(resp.status_code, 400)
+
+        resp = self.client.post(
+            "/superset/dashboard_chart_data/",
+            json={
+                "slice_ids": [girls.id],
+                "extra_filters": [{"col": "gender", "op": "in", "val": ["boy"]}],
+            },
+        )
+        self.assertEqual(resp.status_code, 400)
+
     def test_old_slice_csv_endpoint(self):
         self.login(username="admin")
         slc = self.get_slice("Girls", db.session)
@@ -589,6 +685,18 @@ class CoreTests(SupersetTestCase):
         self.assertEqual(list(expected_data), list(data))
         self.logout()
 
+    def test_csv_endpoint_gzip(self):
+        self.login("admin")
+        sql = "SELECT name FROM birth_names WHERE name = 'James' LIMIT 1"
+        client_id = "{}".format(random.getrandbits(64))[:10]
+        self.run_sql(sql, client_id, raise_on_error=True)
+
+        resp = self.client.get(f"/superset/csv/{client_id}?compression=gzip")
+        self.assertEqual(resp.mimetype, "application/gzip")
+        data = csv.reader(io.StringIO(gzip.decompress(resp.data).decode("utf-8")))
+        self.assertEqual([["name"], ["James"]], list(data))
+        self.logout()
+
     def test_extra_table_metadata(self):
         self.login("admin")
         dbid = utils.get_example_database().id
@@ -957,6 +1065,49 @@ class CoreTests(SupersetTestCase):
 
         app.config["RESULTS_BACKEND_USE_MSGPACK"] = use_msgpack
 
+    @mock.patch("superset.views.core.results_backend")
+    @mock.patch("superset.views.core.db")
+    def test_results_pagination(self, mock_superset_db, mock_results_backend):
+        query_mock = mock.Mock()
+        query_mock.sql = "SELECT *"
+        query_mock.database.db_engine_spec = BaseEngineSpec
+        query_mock.schema = "superset"
+        mock_superset_db.session.query().filter_by().one_or_none.return_value = (
+            query_mock
+        )
+
+        data = [(i, f"row_{i}") for i in range(100)]
+        cursor_descr = (("a", "int"), ("b", "string"))
+        results = SupersetResultSet(data, cursor_descr, BaseEngineSpec)
+        payload = {
+            "status": utils.QueryStatus.SUCCESS,
+            "query": {"rows": 100},
+            "data": results.pa_table,
+            "columns": results.columns,
+            "selected_columns": results.columns,
+            "expanded_columns": [],
+        }
+        mock_results_backend.get.return_value = results_payload.serialize_payload(
+            payload, batch_size=30
+        )
+
+        result = json.loads(self.get_resp("/superset/results/key/?offset=25&limit=10"))
+        self.assertEqual(
+            result["data"], [{"a": i, "b": f"row_{i}"} for i in range(25, 35)]
+        )
+
+        result = json.loads(self.get_resp("/superset/results/key/?columns=b&rows=3"))
+        self.assertEqual(
+            result["data"], [{"b": "row_0"}, {"b": "row_1"}, {"b": "row_2"}]
+        )
+        self.assertEqual([col["name"] for col in result["columns"]], ["b"])
+        self.assertTrue(result["displayLimitReached"])
+
+        resp = self.client.get("/superset/results/key/?columns=c")
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get("/superset/results/key/?offset=-1")
+        self.assertEqual(resp.status_code, 400)
+
     def test_results_default_deserialization(self):
         use_new_deserialization = False
         data = [("a", 4, 4.0, "2019-08-18T16:39:16.660000")]
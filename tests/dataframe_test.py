@@ -15,11 +15,13 @@
 # specific language governing permissions and limitations
 # under the License.
 # isort:skip_file
+import gzip
+
 import numpy as np
 import pandas as pd
 
 import tests.test_app
-from superset.dataframe import df_to_records
+from superset.dataframe import df_batches_to_csv, df_to_columnar, df_to_records
 from superset.db_engine_specs import BaseEngineSpec
 from superset.result_set import SupersetResultSet
 
@@ -51,3 +53,89 @@ class SupersetDataFrameTestCase(SupersetTestCase):
                 {"a": 2, "b": 100, "c": "c2"},
             ],
         )
+
+    def test_js_max_int_vectorized(self):
+        big = 1239162456494753670
+        df = pd.DataFrame(
+            {
+                "int": pd.Series([1, -big], dtype="int64"),
+                "uint": pd.Series([big, 2], dtype="uint64"),
+                "nullable": pd.Series([None, -(2 ** 70)], dtype="object"),
+                "mixed": pd.Series([big, "a"], dtype="object"),
+                "float": [1.5, float(big)],
+                "small": [1, 2],
+            }
+        )
+        self.assertEqual(
+            df_to_records(df),
+            [
+                {
+                    "int": 1,
+                    "uint": str(big),
+                    "nullable": None,
+                    "mixed": str(big),
+                    "float": 1.5,
+                    "small": 1,
+                },
+                {
+                    "int": str(-big),
+                    "uint": 2,
+                    "nullable": str(-(2 ** 70)),
+                    "mixed": "a",
+                    "float": float(big),
+                    "small": 2,
+                },
+            ],
+        )
+        self.assertEqual(df_to_records(df.iloc[:0]), [])
+
+    def test_df_to_columnar(self):
+        df = pd.DataFrame(
+            {
+                "ds": pd.to_datetime(["2020-01-01", None]),
+                "name": ["a", None],
+                "count": pd.Series([1, 1239162456494753670], dtype="int64"),
+                "ratio": [0.5, np.nan],
+                "flag": [True, False],
+            }
+        )
+        self.assertEqual(
+            df_to_columnar(df),
+            {
+                "columns": [
+                    {"name": "ds", "type": "DATETIME"},
+                    {"name": "name", "type": "STRING"},
+                    {"name": "count", "type": "INT"},
+                    {"name": "ratio", "type": "FLOAT"},
+                    {"name": "flag", "type": "BOOLEAN"},
+                ],
+                "data": [
+                    [1577836800000, None],
+                    ["a", None],
+                    [1, "1239162456494753670"],
+                    [0.5, None],
+                    [True, False],
+                ],
+                "rowcount": 2,
+            },
+        )
+
+    def test_df_batches_to_csv(self):
+        dfs = [
+            pd.DataFrame({"a": [1, 2], "b": ["x", "y"]}),
+            pd.DataFrame({"a": [3], "b": ["z"]}),
+        ]
+        csv = b"".join(df_batches_to_csv(iter(dfs), index=False))
+        self.assertEqual(csv, b"a,b\n1,x\n2,y\n3,z\n")
+
+        csv = b"".join(df_batches_to_csv(iter(dfs), compress=True, index=False))
+        self.assertEqual(gzip.decompress(csv), b"a,b\n1,x\n2,y\n3,z\n")
+
+        empty = iter([pd.DataFrame(columns=["a", "b"])])
+        csv = b"".join(df_batches_to_csv(empty, index=False))
+        self.assertEqual(csv, b"a,b\n")
+
+        # float columns are written as is, whether or not batches have nulls
+        dfs = [pd.DataFrame({"a": [1.0, np.nan]}), pd.DataFrame({"a": [2.0]})]
+        csv = b"".join(df_batches_to_csv(iter(dfs), index=False))
+        self.assertEqual(csv, b"a\n1.0\n\n2.0\n")
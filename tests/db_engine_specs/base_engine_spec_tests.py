@@ -232,3 +232,15 @@ class DbEngineSpecsTests(DbEngineSpecTestCase):
         ]
         result = BaseEngineSpec.pyodbc_rows_to_tuples(data)
         self.assertListEqual(result, data)
+
+    def test_fetch_data_in_batches(self):
+        rows = [(i,) for i in range(10)]
+        cursor = mock.Mock()
+        cursor.fetchmany.side_effect = lambda size: [
+            rows.pop(0) for _ in range(min(size, len(rows)))
+        ]
+        batches = list(BaseEngineSpec.fetch_data_in_batches(cursor, 7, 3))
+        self.assertEqual(batches, [[(0,), (1,), (2,)], [(3,), (4,), (5,)], [(6,)]])
+
+        batches = list(BaseEngineSpec.fetch_data_in_batches(cursor, None, 2))
+        self.assertEqual(batches, [[(7,), (8,)], [(9,)]])
@@ -20,7 +20,11 @@ import pandas as pd
 from sqlalchemy.engine.result import RowProxy
 from sqlalchemy.sql import select
 
+from superset import db
 from superset.db_engine_specs.presto import PrestoEngineSpec
+from superset.models.sql_lab import Query
+from superset.utils.core import get_example_database, QueryStatus
+from superset.utils.cursor_poller import CursorPoller
 from tests.db_engine_specs.base_tests import DbEngineSpecTestCase
 
 
@@ -360,6 +364,67 @@ class PrestoTests(DbEngineSpecTestCase):
         query_result = str(result.compile(compile_kwargs={"literal_binds": True}))
         self.assertEqual("SELECT  \nWHERE ds = '01-01-19' AND hour = 1", query_result)
 
+    @mock.patch.dict(
+        "superset.db_engine_specs.presto.config",
+        {"LATEST_PARTITION_CACHE_TIMEOUT": 600},
+    )
+    def test_presto_latest_partition_cache(self):
+        db = mock.Mock(id=-1, impersonate_user=False)
+        db.get_indexes = mock.Mock(return_value=[{"column_names": ["ds"]}])
+        db.get_extra = mock.Mock(return_value={})
+        db.get_df = mock.Mock(return_value=pd.DataFrame({"ds": ["01-01-19"]}))
+        PrestoEngineSpec.invalidate_latest_partition("test_table", "test_schema", db)
+
+        for _ in range(2):
+            result = PrestoEngineSpec.latest_partition("test_table", "test_schema", db)
+            self.assertEqual((["ds"], ("01-01-19",)), result)
+        self.assertEqual(db.get_df.call_count, 1)
+
+        PrestoEngineSpec.invalidate_latest_partition("test_table", "test_schema", db)
+        PrestoEngineSpec.latest_partition("test_table", "test_schema", db)
+        self.assertEqual(db.get_df.call_count, 2)
+
+    def test_cursor_poller(self):
+        queries = [
+            Query(
+                client_id=f"cursor_poller_{i}",
+                database=get_example_database(),
+                sql="SELECT 1",
+                status=status,
+            )
+            for i, status in enumerate(
+                [QueryStatus.RUNNING, QueryStatus.RUNNING, QueryStatus.STOPPED]
+            )
+        ]
+        db.session.add_all(queries)
+        db.session.commit()
+        query_ids = [query.id for query in queries]
+        stats = {"stats": {"state": "RUNNING", "completedSplits": 1, "totalSplits": 4}}
+        cursors = [mock.Mock(poll=mock.Mock(return_value=stats)) for _ in queries]
+        cursors[1].poll.return_value = None
+        polled_cursors = [
+            PrestoEngineSpec.get_polled_cursor(cursor, query)
+            for cursor, query in zip(cursors, queries)
+        ]
+
+        CursorPoller(db.session).poll_cursors(polled_cursors)
+        self.assertEqual(
+            [False, True, True], [cursor.done.is_set() for cursor in polled_cursors]
+        )
+        cursors[0].cancel.assert_not_called()
+        cursors[2].cancel.assert_called_once_with()
+        self.assertEqual({"progress": 25}, polled_cursors[0].values)
+        progress = dict(
+            db.session.query(Query.id, Query.progress).filter(Query.id.in_(query_ids))
+        )
+        self.assertEqual(25, progress[query_ids[0]])
+        self.assertEqual(0, progress[query_ids[1]])
+
+        db.session.query(Query).filter(Query.id.in_(query_ids)).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+
     def test_convert_dttm(self):
         dttm = self.get_dttm()
 
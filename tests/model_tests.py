@@ -15,11 +15,13 @@
 # specific language governing permissions and limitations
 # under the License.
 # isort:skip_file
+import json
 import textwrap
 import unittest
 
 import pandas
 from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import NullPool, QueuePool
 
 import tests.test_app
 from superset import app
@@ -106,6 +108,25 @@ class DatabaseModelTestCase(SupersetTestCase):
         user_name = make_url(model.get_sqla_engine(user_name=example_user).url).username
         self.assertNotEqual(example_user, user_name)
 
+    def test_database_engine_pool(self):
+        uri = "mysql://root@localhost"
+        model = Database(database_name="test_database", sqlalchemy_uri=uri)
+        self.assertIsInstance(model.get_sqla_engine().pool, NullPool)
+
+        model.extra = json.dumps({"engine_pool": {"pool_size": 3, "pool_recycle": 60}})
+        engine = model.get_sqla_engine()
+        self.assertIsInstance(engine.pool, QueuePool)
+        self.assertEqual(engine.pool.size(), 3)
+        self.assertIs(model.get_sqla_engine(), engine)
+        self.assertIsInstance(model.get_sqla_engine(nullpool=True).pool, NullPool)
+
+        # impersonated users don't share pools
+        model.impersonate_user = True
+        engine = model.get_sqla_engine(user_name="alice")
+        self.assertIs(model.get_sqla_engine(user_name="alice"), engine)
+        self.assertIsNot(model.get_sqla_engine(user_name="bob"), engine)
+        self.assertEqual(make_url(engine.url).username, "alice")
+
     def test_select_star(self):
         db = get_example_database()
         table_name = "energy_usage"
@@ -171,6 +192,25 @@ class DatabaseModelTestCase(SupersetTestCase):
             df = main_db.get_df("USE superset; SELECT ';';", None)
             self.assertEqual(df.iat[0, 0], ";")
 
+    def test_get_df_in_batches(self):
+        main_db = get_example_database()
+        sql = "SELECT name, num FROM birth_names ORDER BY name, num LIMIT 10"
+        df = main_db.get_df(sql)
+        self.assertEqual(len(df), 10)
+        pandas.testing.assert_frame_equal(main_db.get_df(sql, batch_size=3), df)
+
+        sql = "SELECT name, num FROM birth_names WHERE name = 'not a name'"
+        df = main_db.get_df(sql, batch_size=3)
+        self.assertEqual(list(df.columns), ["name", "num"])
+        self.assertTrue(df.empty)
+
+    def test_keep_integer_nulls(self):
+        data = [(1, 1.0), (None, None)]
+        df = pandas.DataFrame.from_records(data, columns=["a", "b"])
+        df = Database._keep_integer_nulls(df, data)
+        self.assertEqual(df["a"].tolist(), [1, None])
+        self.assertEqual(df["b"].dtype.kind, "f")
+
 
 class SqlaTableModelTestCase(SupersetTestCase):
     def test_get_timestamp_expression(self):
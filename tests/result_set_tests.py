@@ -19,6 +19,7 @@ from datetime import datetime
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 import tests.test_app
 from superset.dataframe import df_to_records
@@ -234,3 +235,60 @@ class SupersetResultSetTestCase(SupersetTestCase):
         ]
         results = SupersetResultSet(data, cursor_descr, BaseEngineSpec)
         self.assertEqual(results.columns, [])
+
+    def test_from_batches(self):
+        data = [(i, f"v{i}", i * 1.5) for i in range(10)]
+        cursor_descr = (("a", "int"), ("b", "string"), ("c", "float"))
+        batches = [data[i : i + 3] for i in range(0, len(data), 3)]
+        results = SupersetResultSet.from_batches(
+            iter(batches), cursor_descr, BaseEngineSpec
+        )
+        expected = SupersetResultSet(data, cursor_descr, BaseEngineSpec)
+        self.assertEqual(results.size, 10)
+        self.assertEqual(results.columns, expected.columns)
+        self.assertTrue(results.to_pandas_df().equals(expected.to_pandas_df()))
+
+    def test_from_batches_type_reconciliation(self):
+        batches = [[(None, 1)], [(1, 1.5)], [(2, "foo")]]
+        cursor_descr = (("a", None), ("b", None))
+        results = SupersetResultSet.from_batches(
+            iter(batches), cursor_descr, BaseEngineSpec
+        )
+        self.assertEqual(results.columns[0]["type"], "INT")
+        self.assertEqual(results.columns[1]["type"], "STRING")
+        df = results.to_pandas_df()
+        self.assertEqual(
+            df_to_records(df),
+            [{"a": None, "b": "1"}, {"a": 1, "b": "1.5"}, {"a": 2, "b": "foo"}],
+        )
+
+    def test_convert_db_type(self):
+        self.assertEqual(SupersetResultSet.convert_db_type("BIGINT"), pa.int64())
+        self.assertEqual(SupersetResultSet.convert_db_type("double"), pa.float64())
+        self.assertEqual(SupersetResultSet.convert_db_type("BOOLEAN"), pa.bool_())
+        self.assertEqual(SupersetResultSet.convert_db_type("VARCHAR(255)"), pa.string())
+        self.assertIsNone(SupersetResultSet.convert_db_type("TIMESTAMP"))
+        self.assertIsNone(SupersetResultSet.convert_db_type("ARRAY(VARCHAR)"))
+        self.assertIsNone(SupersetResultSet.convert_db_type(None))
+
+    def test_type_directed_conversion(self):
+        data = [(None, 1, "a", [1, 2]), (None, "2", "b", None)]
+        cursor_descr = (
+            ("empty", "int"),
+            ("mismatch", "int"),
+            ("text", "varchar"),
+            ("nested", "array"),
+        )
+        results = SupersetResultSet(data, cursor_descr, BaseEngineSpec)
+        self.assertEqual(results.pa_table.column("empty").type, pa.int64())
+        self.assertEqual(results.pa_table.column("mismatch").type, pa.string())
+        self.assertEqual(results.pa_table.column("text").type, pa.string())
+        self.assertEqual(results.pa_table.column("nested").type, pa.string())
+        df = results.to_pandas_df()
+        self.assertEqual(
+            df_to_records(df),
+            [
+                {"empty": None, "mismatch": "1", "text": "a", "nested": "[1, 2]"},
+                {"empty": None, "mismatch": '"2"', "text": "b", "nested": "null"},
+            ],
+        )
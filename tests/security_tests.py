@@ -817,6 +817,31 @@ class SecurityManagerTests(SupersetTestCase):
         with self.assertRaises(SupersetSecurityException):
             security_manager.assert_viz_permission(test_viz)
 
+    def test_user_permissions_cache_invalidation(self):
+        user = self.get_user(username="gamma")
+        role = security_manager.find_role("Gamma")
+        pv = security_manager.add_permission_view_menu("can_test", "CacheTestView")
+        security_manager.invalidate_security_cache()
+        with patch.object(
+            security_manager,
+            "_query_permissions",
+            wraps=security_manager._query_permissions,
+        ) as query_permissions:
+            permissions = security_manager.get_user_permissions(user)
+            self.assertNotIn(("can_test", "CacheTestView"), permissions)
+            security_manager.get_user_permissions(user)
+            self.assertEqual(query_permissions.call_count, 1)
+
+        # committing a change of the permissions of a role invalidates the cache
+        security_manager.add_permission_role(role, pv)
+        permissions = security_manager.get_user_permissions(user)
+        self.assertIn(("can_test", "CacheTestView"), permissions)
+
+        security_manager.del_permission_role(role, pv)
+        permissions = security_manager.get_user_permissions(user)
+        self.assertNotIn(("can_test", "CacheTestView"), permissions)
+        security_manager.del_permission_view_menu("can_test", "CacheTestView")
+
 
 class RowLevelSecurityTests(SupersetTestCase):
     """
@@ -884,3 +909,23 @@ class RowLevelSecurityTests(SupersetTestCase):
         )
         sql = tbl.get_query_str(query_obj)
         self.assertNotIn("gender = 'male'", sql)
+
+    def test_rls_filters_are_cached(self):
+        g.user = self.get_user(username="gamma")
+        tbl = self.get_table_by_name("birth_names")
+        security_manager.invalidate_security_cache()
+        with patch.object(
+            security_manager,
+            "_query_rls_filters",
+            wraps=security_manager._query_rls_filters,
+        ) as query_rls_filters:
+            clauses = [f.clause for f in security_manager.get_rls_filters(tbl)]
+            self.assertEqual(clauses, ["gender = 'male'"])
+            security_manager.get_rls_filters(tbl)
+            self.assertEqual(query_rls_filters.call_count, 1)
+
+        # committing a change of a filter invalidates the cache
+        self.rls_entry.clause = "gender = 'female'"
+        db.session.commit()
+        clauses = [f.clause for f in security_manager.get_rls_filters(tbl)]
+        self.assertEqual(clauses, ["gender = 'female'"])
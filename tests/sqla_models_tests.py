@@ -15,10 +15,23 @@
 # specific language governing permissions and limitations
 # under the License.
 # isort:skip_file
+from datetime import datetime
+from unittest.mock import patch
+
+from sqlalchemy import column, desc, func, select, text
+from sqlalchemy.dialects import postgresql
+
 import tests.test_app
-from superset.connectors.sqla.models import SqlaTable, TableColumn
+from superset import app
+from superset.connectors.sqla.models import (
+    SqlaTable,
+    SqlaTableRollup,
+    SqlMetric,
+    TableColumn,
+)
 from superset.db_engine_specs.druid import DruidEngineSpec
-from superset.utils.core import get_example_database
+from superset.models.core import Database
+from superset.utils.core import get_example_database, TimeRangeEndpoint
 
 from .base_tests import SupersetTestCase
 
@@ -65,6 +78,31 @@ class DatabaseModelTestCase(SupersetTestCase):
         self.assertTrue(table.has_calls_to_cache_key_wrapper(query_obj))
         self.assertListEqual(extra_cache_keys, ["user_1", "user_2"])
 
+    @patch("superset.jinja_context.current_username")
+    def test_extra_cache_keys_renderings_reused(self, current_username):
+        current_username.return_value = "user_1"
+        query = "SELECT '{{ cache_key_wrapper(current_username()) }}' as user"
+        table = SqlaTable(
+            table_name="test_extra_cache_keys_renderings_reused_table",
+            sql=query,
+            database=get_example_database(),
+        )
+        query_obj = {
+            "granularity": None,
+            "from_dttm": None,
+            "to_dttm": None,
+            "groupby": ["user"],
+            "metrics": [],
+            "is_timeseries": False,
+            "filter": [],
+            "extras": {},
+        }
+        with app.test_request_context():
+            self.assertListEqual(table.get_extra_cache_keys(query_obj), ["user_1"])
+            sqla_query = table.get_sqla_query(**query_obj)
+        self.assertListEqual(sqla_query.extra_cache_keys, ["user_1"])
+        self.assertEqual(current_username.call_count, 1)
+
     def test_has_no_extra_cache_keys(self):
         query = "SELECT 'abc' as user"
         table = SqlaTable(
@@ -85,3 +123,140 @@ class DatabaseModelTestCase(SupersetTestCase):
         extra_cache_keys = table.get_extra_cache_keys(query_obj)
         self.assertFalse(table.has_calls_to_cache_key_wrapper(query_obj))
         self.assertListEqual(extra_cache_keys, [])
+
+    def test_get_post_processing_query(self):
+        table = SqlaTable(
+            table_name="test_get_post_processing_query_table",
+            database=Database(
+                database_name="test_postgres", sqlalchemy_uri="postgresql://db"
+            ),
+        )
+        metric = table.make_sqla_column_compatible(func.sum(column("num")), "sum__num")
+        timestamp = table.make_sqla_column_compatible(column("ds"), "__timestamp")
+        groupby = table.make_sqla_column_compatible(column("name"), "name")
+
+        def get_sql(groupby_exprs, post_processing):
+            qry = (
+                select(groupby_exprs + [timestamp, metric])
+                .select_from(text("t"))
+                .group_by(*groupby_exprs, timestamp)
+                .order_by(desc(metric))
+                .limit(100)
+            )
+            qry = table.get_post_processing_query(
+                qry, [metric], timestamp, groupby_exprs, post_processing
+            )
+            self.assertEqual(
+                [col.name for col in qry.columns],
+                [expr.name for expr in groupby_exprs] + ["__timestamp", "sum__num"],
+            )
+            return str(qry.compile(dialect=postgresql.dialect()))
+
+        sql = get_sql(
+            [], {"rolling_type": "mean", "rolling_periods": 7, "min_periods": 2}
+        )
+        # the windows are computed over the ordered and limited aggregates
+        self.assertIn(
+            "avg(time_series.sum__num) OVER (ORDER BY time_series.__timestamp "
+            "ROWS BETWEEN 6 PRECEDING AND CURRENT ROW)",
+            sql,
+        )
+        self.assertIn("count(time_series.sum__num) OVER (ORDER BY", sql)
+        self.assertIn("LIMIT %(param_1)s) AS time_series", sql)
+
+        sql = get_sql([groupby], {"rolling_type": "cumsum"})
+        self.assertIn(
+            "sum(time_series.sum__num) OVER (PARTITION BY time_series.name "
+            "ORDER BY time_series.__timestamp "
+            "ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)",
+            sql,
+        )
+
+        sql = get_sql([groupby], {"contribution": True})
+        self.assertIn("OVER (PARTITION BY time_series.__timestamp)", sql)
+
+    @patch.dict(app.config, {"ENABLE_ROLLUP_TABLES": True})
+    def test_get_rollup(self):
+        table = SqlaTable(
+            id=1,
+            table_name="events",
+            main_dttm_col="ds",
+            database=Database(database_name="test_sqlite", sqlalchemy_uri="sqlite://"),
+            columns=[
+                TableColumn(column_name="ds", type="TIMESTAMP", is_dttm=True),
+                TableColumn(column_name="country", type="VARCHAR(255)"),
+                TableColumn(column_name="city", type="VARCHAR(255)"),
+            ],
+            metrics=[
+                SqlMetric(metric_name="count", expression="COUNT(*)"),
+                SqlMetric(metric_name="users", expression="COUNT(DISTINCT user)"),
+            ],
+        )
+        hourly = SqlaTableRollup(
+            table=table,
+            schema="rollups",
+            rollup_table_name="events_hourly",
+            time_column="ds",
+            time_grain="PT1H",
+            dimensions='["country", "city"]',
+            metrics='{"count": "SUM(cnt)", "MAX(num)": "MAX(max_num)"}',
+            row_count=1000,
+        )
+        daily = SqlaTableRollup(
+            table=table,
+            schema="rollups",
+            rollup_table_name="events_daily",
+            time_column="ds",
+            time_grain="P1D",
+            dimensions='["country"]',
+            metrics='{"count": "SUM(cnt)"}',
+            row_count=10,
+        )
+        query_obj = {
+            "groupby": ["country"],
+            "metrics": ["count"],
+            "granularity": "ds",
+            "from_dttm": datetime(2020, 1, 1),
+            "to_dttm": datetime(2020, 2, 1),
+            "is_timeseries": True,
+            "filter": [{"col": "country", "op": "==", "val": "FR"}],
+            "extras": {
+                "time_grain_sqla": "P1W",
+                "time_range_endpoints": (
+                    TimeRangeEndpoint.INCLUSIVE,
+                    TimeRangeEndpoint.EXCLUSIVE,
+                ),
+            },
+        }
+
+        def get_rollup(**kwargs):
+            return table.get_rollup({**query_obj, **kwargs})
+
+        self.assertEqual(get_rollup(), daily)
+        self.assertEqual(get_rollup(groupby=["city"]), hourly)
+        self.assertEqual(
+            get_rollup(extras={**query_obj["extras"], "time_grain_sqla": "PT1H"}),
+            hourly,
+        )
+        self.assertEqual(get_rollup(from_dttm=datetime(2020, 1, 1, 12)), hourly)
+        self.assertIsNone(get_rollup(from_dttm=datetime(2020, 1, 1, 12, 30)))
+        self.assertIsNone(get_rollup(metrics=["users"]))
+        self.assertIsNone(get_rollup(filter=[{"col": "ds", "op": "==", "val": 1}]))
+        self.assertIsNone(get_rollup(extras={"where": "city = 'Paris'"}))
+        self.assertIsNone(get_rollup(extras={"time_grain_sqla": "P1D"}))
+
+        adhoc_metric = {
+            "expressionType": "SIMPLE",
+            "column": {"column_name": "num"},
+            "aggregate": "MAX",
+            "label": "max_num",
+        }
+        self.assertEqual(get_rollup(metrics=[adhoc_metric]), hourly)
+        sql = table.get_query_str({**query_obj, "metrics": [adhoc_metric]})
+        self.assertTrue(sql.startswith("-- Rollup: rollups.events_hourly\n"))
+        self.assertIn("MAX(max_num) AS max_num", sql)
+        self.assertIn("FROM rollups.events_hourly", sql)
+        self.assertNotIn(hourly.get_table(), table.database.tables)
+
+        with patch.dict(app.config, {"ENABLE_ROLLUP_TABLES": False}):
+            self.assertIsNone(get_rollup())
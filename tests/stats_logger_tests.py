@@ -32,6 +32,8 @@ class StatsdStatsLoggerTest(TestCase):
         logger.gauge("foo3")
         client.gauge.assert_called_once()
         client.gauge.assert_called_with("foo3")
+        logger.set_gauge("foo5", 2)
+        client.gauge.assert_called_with("foo5", 2)
         logger.timing("foo4", 1.234)
         client.timing.assert_called_once()
         client.timing.assert_called_with("foo4", 1.234)
@@ -15,6 +15,7 @@
 # specific language governing permissions and limitations
 # under the License.
 # isort:skip_file
+import pickle
 import unittest
 import uuid
 from datetime import date, datetime, time, timedelta
@@ -22,7 +23,9 @@ from decimal import Decimal
 from unittest.mock import Mock, patch
 
 import numpy
-from flask import Flask
+import pandas
+import pyarrow as pa
+from flask import Flask, g
 from flask_caching import Cache
 from sqlalchemy.exc import ArgumentError
 
@@ -30,24 +33,34 @@ import tests.test_app
 from superset import app, db, security_manager
 from superset.exceptions import SupersetException
 from superset.models.core import Database
+from superset.utils import results_payload
+from superset.utils.cache_codec import ArrowCacheCodec, PickleCacheCodec
 from superset.utils.cache_manager import CacheManager
+from superset.utils.incremental_refresh import (
+    get_incremental_windows,
+    get_window_time_range_endpoints,
+)
 from superset.utils.core import (
     base_json_conv,
     convert_legacy_filters_into_adhoc,
     datetime_f,
+    DTTM_ALIAS,
     format_timedelta,
     get_or_create_db,
     get_since_until,
     get_stacktrace,
+    iter_concurrently,
     json_int_dttm_ser,
     json_iso_dttm_ser,
     JSONEncodedDict,
     memoized,
     merge_extra_filters,
     merge_request_params,
+    normalize_dttm_col,
     parse_human_timedelta,
     parse_js_uri_path_item,
     parse_past_timedelta,
+    run_concurrently,
     split,
     TimeRangeEndpoint,
     validate_json,
@@ -153,6 +166,62 @@ class UtilsTestCase(SupersetTestCase):
         got_str = zlib_decompress(blob)
         self.assertEqual(json_str, got_str)
 
+    def test_results_payload_serialization(self):
+        table = pa.Table.from_arrays(
+            [pa.array([1, 2, None]), pa.array(["a", "b", "c"])], names=["a", "b"]
+        )
+        payload = {
+            "status": "success",
+            "data": table,
+            "query": {"end_time": datetime(2020, 1, 1)},
+        }
+        for compression in (None, "lz4", "zstd"):
+            blob = results_payload.serialize_payload(payload, compression)
+            self.assertTrue(results_payload.is_versioned_payload(blob))
+            deserialized = results_payload.deserialize_payload(blob)
+            self.assertTrue(deserialized["data"].equals(table))
+            self.assertEqual(deserialized["status"], "success")
+            self.assertEqual(deserialized["query"], {"end_time": "2020-01-01T00:00:00"})
+
+        self.assertFalse(results_payload.is_versioned_payload(zlib_compress("{}")))
+        with self.assertRaises(SupersetException):
+            results_payload.serialize_payload(payload, "zip")
+
+    def test_cache_codec(self):
+        df = pandas.DataFrame(
+            {
+                "__timestamp": pandas.to_datetime(["2020-01-01", "2020-01-02"]),
+                "name": ["a", None],
+                "sum__num": [1, 2],
+                "count": pandas.Series([1, None], dtype=object),
+                "id": [2 ** 53 + 1, 2 ** 60 + 3],
+            }
+        )
+        value = {"dttm": "2020-01-01T00:00:00", "df": df, "query": "SELECT 1"}
+        legacy_blob = pickle.dumps(value)
+
+        codec = ArrowCacheCodec()
+        blob = codec.dumps(value)
+        self.assertTrue(codec.is_current(blob))
+        self.assertFalse(codec.is_current(legacy_blob))
+        for loaded in (codec.loads(blob), codec.loads(legacy_blob)):
+            self.assertEqual(loaded["query"], "SELECT 1")
+            self.assertEqual(loaded["dttm"], "2020-01-01T00:00:00")
+            pandas.testing.assert_frame_equal(loaded["df"], df)
+            self.assertEqual(loaded["df"]["count"].tolist(), [1, None])
+            self.assertEqual(loaded["df"]["id"].tolist(), [2 ** 53 + 1, 2 ** 60 + 3])
+
+        # frames Arrow can't represent are pickled within a versioned value
+        mixed = {"dttm": None, "df": pandas.DataFrame({"a": [1, "b"]}), "query": ""}
+        blob = codec.dumps(mixed)
+        self.assertTrue(codec.is_current(blob))
+        self.assertEqual(codec.loads(blob)["df"]["a"].tolist(), [1, "b"])
+
+        codec = PickleCacheCodec()
+        self.assertTrue(codec.is_current(legacy_blob))
+        self.assertFalse(codec.is_current(blob))
+        pandas.testing.assert_frame_equal(codec.loads(legacy_blob)["df"], df)
+
     @patch("superset.utils.core.to_adhoc", mock_to_adhoc)
     def test_merge_extra_filters(self):
         # does nothing if no extra filters
@@ -658,6 +727,53 @@ class UtilsTestCase(SupersetTestCase):
         self.assertEqual(instance.watcher, 4)
         self.assertEqual(result1, result8)
 
+    def test_memoized_lru(self):
+        evicted = []
+
+        @memoized(max_size=2, on_evict=evicted.append)
+        def test_function(a):
+            return [a]
+
+        one = test_function(1)
+        test_function(2)
+        self.assertIs(test_function(1), one)
+        test_function(3)
+        self.assertEqual(evicted, [[2]])
+        self.assertIs(test_function(1), one)
+        info = test_function.cache_info()
+        self.assertEqual((info.hits, info.misses, info.size), (2, 3, 2))
+
+        test_function.clear()
+        self.assertEqual(evicted, [[2], [3], [1]])
+
+    def test_memoized_timeout(self):
+        evicted = []
+
+        @memoized(timeout=60, on_evict=evicted.append)
+        def test_function(a):
+            return [a]
+
+        with patch("superset.utils.core.monotonic", return_value=0):
+            one = test_function(1)
+        with patch("superset.utils.core.monotonic", return_value=59):
+            self.assertIs(test_function(1), one)
+        with patch("superset.utils.core.monotonic", return_value=60):
+            self.assertIsNot(test_function(1), one)
+        self.assertEqual(evicted, [one])
+
+    def test_memoized_shared_between_instances(self):
+        class test_class:
+            def __init__(self, x):
+                self.x = x
+
+            @memoized(watch=("x",), shared=True)
+            def test_method(self, a):
+                return [a, self.x]
+
+        result = test_class(1).test_method(2)
+        self.assertIs(test_class(1).test_method(2), result)
+        self.assertIsNot(test_class(3).test_method(2), result)
+
     @patch("superset.utils.core.parse_human_datetime", mock_parse_human_datetime)
     def test_get_since_until(self):
         result = get_since_until()
@@ -950,3 +1066,134 @@ class UtilsTestCase(SupersetTestCase):
                 get_time_range_endpoints(form_data={"datasource": "1__table"}, slc=slc),
                 (TimeRangeEndpoint.INCLUSIVE, TimeRangeEndpoint.EXCLUSIVE),
             )
+
+    def test_run_concurrently(self):
+        def get_user(value):
+            return value, g.user
+
+        funcs = [lambda value=value: get_user(value) for value in range(3)]
+        with app.test_request_context():
+            g.user = "admin"
+            self.assertEqual(
+                run_concurrently(funcs, max_workers=3),
+                [(0, "admin"), (1, "admin"), (2, "admin")],
+            )
+            self.assertEqual(
+                run_concurrently(funcs, max_workers=1),
+                [(0, "admin"), (1, "admin"), (2, "admin")],
+            )
+
+        with app.app_context():
+            g.user = "gamma"
+            self.assertEqual(
+                run_concurrently(funcs[:2], max_workers=2), [(0, "gamma"), (1, "gamma")]
+            )
+
+            def fail():
+                raise SupersetException("failed")
+
+            with self.assertRaises(SupersetException):
+                run_concurrently([funcs[0], fail], max_workers=2)
+
+            self.assertEqual(
+                sorted(iter_concurrently(funcs, max_workers=2)),
+                [(0, (0, "gamma")), (1, (1, "gamma")), (2, (2, "gamma"))],
+            )
+
+    def test_normalize_dttm_col(self):
+        def normalize(values, timestamp_format=None, inferred_format=None):
+            df = pandas.DataFrame({DTTM_ALIAS: values})
+            fmt = normalize_dttm_col(
+                df, timestamp_format, 0, timedelta(), inferred_format
+            )
+            return fmt, df[DTTM_ALIAS].tolist()
+
+        expected = [datetime(2020, 1, 1), datetime(2020, 1, 2)]
+        self.assertEqual(
+            normalize([1577836800, 1577923200], "epoch_s"), (None, expected)
+        )
+        self.assertEqual(
+            normalize(["1577836800000", "1577923200000"], "epoch_ms"), (None, expected)
+        )
+        self.assertEqual(
+            normalize(["01/01/2020", "02/01/2020"], "%d/%m/%Y"), (None, expected)
+        )
+        self.assertEqual(normalize(["2020-01-01", "2020-01-02"]), (None, expected))
+        self.assertEqual(normalize(expected, "epoch_s"), (None, expected))
+        self.assertEqual(
+            normalize(["01/01/2020 00:00", "01/02/2020 00:00"]),
+            ("%m/%d/%Y %H:%M", expected),
+        )
+        # formats inferred for previous results that don't match are dropped
+        self.assertEqual(
+            normalize(["12/31/2019", "01/13/2020"], inferred_format="%d/%m/%Y"),
+            (None, [datetime(2019, 12, 31), datetime(2020, 1, 13)]),
+        )
+
+        # numbers are only epochs with an epoch format, as before
+        self.assertEqual(
+            normalize([1577836800000]), (None, [pandas.Timestamp(1577836800000)])
+        )
+
+        df = pandas.DataFrame({DTTM_ALIAS: [1577836800]})
+        normalize_dttm_col(df, "epoch_s", 2, timedelta(days=1))
+        self.assertEqual(df[DTTM_ALIAS][0], datetime(2020, 1, 2, 2))
+
+    def test_get_incremental_windows(self):
+        cache_value = {
+            "df": pandas.DataFrame(
+                {
+                    DTTM_ALIAS: pandas.date_range("2020-01-01", periods=7, freq="D"),
+                    "y": range(7),
+                }
+            ),
+            "from_dttm": "2020-01-01T00:00:00",
+            "to_dttm": "2020-01-08T00:00:00",
+        }
+
+        # the buckets within the overlap of the last one are queried again
+        windows = get_incremental_windows(
+            cache_value,
+            datetime(2020, 1, 1),
+            datetime(2020, 1, 8, 12),
+            shift=timedelta(),
+            overlap=timedelta(days=1),
+        )
+        self.assertIsNone(windows.head)
+        self.assertEqual(windows.tail, (datetime(2020, 1, 6), datetime(2020, 1, 8, 12)))
+        self.assertEqual(windows.keep.tolist(), [True] * 5 + [False] * 2)
+
+        # the bucket the new start falls into is partial, and queried again
+        windows = get_incremental_windows(
+            cache_value,
+            datetime(2020, 1, 2, 12),
+            datetime(2020, 1, 9),
+            shift=timedelta(hours=1),
+            overlap=timedelta(),
+        )
+        self.assertEqual(
+            windows.head, (datetime(2020, 1, 2, 12), datetime(2020, 1, 2, 23))
+        )
+        self.assertEqual(windows.tail, (datetime(2020, 1, 6, 23), datetime(2020, 1, 9)))
+        self.assertEqual(
+            windows.keep.tolist(), [False, False, True, True, True, True, False]
+        )
+        self.assertEqual(
+            get_window_time_range_endpoints(windows.head, datetime(2020, 1, 9), None),
+            (TimeRangeEndpoint.INCLUSIVE, TimeRangeEndpoint.EXCLUSIVE),
+        )
+        self.assertIsNone(
+            get_window_time_range_endpoints(windows.tail, datetime(2020, 1, 9), None)
+        )
+
+        # cached data reaching the row limit may be truncated
+        self.assertIsNone(
+            get_incremental_windows(
+                cache_value,
+                datetime(2020, 1, 1),
+                datetime(2020, 1, 9),
+                shift=timedelta(),
+                overlap=timedelta(),
+                row_limit=7,
+            )
+        )
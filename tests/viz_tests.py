@@ -29,7 +29,7 @@ import superset.viz as viz
 from superset import app
 from superset.constants import NULL_STRING
 from superset.exceptions import SpatialException
-from superset.utils.core import DTTM_ALIAS
+from superset.utils.core import DTTM_ALIAS, QueryStatus
 
 from .base_tests import SupersetTestCase
 from .utils import load_fixture
@@ -165,6 +165,49 @@ class BaseVizTestCase(SupersetTestCase):
         test_viz = viz.BaseViz(datasource, form_data={})
         self.assertEqual(app.config["CACHE_DEFAULT_TIMEOUT"], test_viz.cache_timeout)
 
+    @patch.dict(app.config, {"CHART_DATA_QUERY_CONCURRENCY": 2})
+    def test_get_df_payloads_keep_query_state_apart(self):
+        def get_df(viz_obj, query_obj):
+            viz_obj.query = query_obj["sql"]
+            viz_obj.status = query_obj["status"]
+            return pd.DataFrame({"a": [1]})
+
+        test_viz = viz.BaseViz(self.get_datasource_mock(), form_data={})
+        queries = [
+            ({"sql": "SELECT 1", "status": QueryStatus.FAILED}, {}),
+            ({"sql": "SELECT 2", "status": QueryStatus.SUCCESS}, {}),
+        ]
+        with patch.object(
+            viz.BaseViz, "get_df", autospec=True, side_effect=get_df
+        ), patch.object(viz.BaseViz, "cache_key", return_value=None):
+            payloads = test_viz.get_df_payloads(queries)
+        self.assertEqual(
+            [QueryStatus.FAILED, QueryStatus.SUCCESS],
+            [payload["status"] for payload in payloads],
+        )
+        self.assertEqual(
+            ["SELECT 1", "SELECT 2"], [payload["query"] for payload in payloads]
+        )
+        self.assertEqual(test_viz.status, QueryStatus.FAILED)
+
+    def test_get_df_payloads_fail_viz(self):
+        def get_df(viz_obj, query_obj):
+            if query_obj["sql"] == "SELECT 2":
+                raise Exception("Extra query failed")
+            return pd.DataFrame({"a": [1]})
+
+        test_viz = viz.BaseViz(self.get_datasource_mock(), form_data={})
+        queries = [({"sql": "SELECT 1"}, {}), ({"sql": "SELECT 2"}, {})]
+        with patch.object(
+            viz.BaseViz, "get_df", autospec=True, side_effect=get_df
+        ), patch.object(viz.BaseViz, "cache_key", return_value=None):
+            test_viz.get_df_payloads(queries)
+            # the failure of an extra query is reported by the chart's payload
+            payload = test_viz.get_df_payload({"sql": "SELECT 1"})
+        self.assertEqual(payload["status"], QueryStatus.FAILED)
+        self.assertEqual(payload["error"], "Extra query failed")
+        self.assertIn("Extra query failed", payload["stacktrace"])
+
 
 class TableVizTestCase(SupersetTestCase):
     def test_get_data_applies_percentage(self):
@@ -1135,6 +1178,134 @@ class TimeSeriesVizTestCase(SupersetTestCase):
         ]
         self.assertEqual(expected, viz_data)
 
+    def test_to_series(self):
+        datasource = self.get_datasource_mock()
+        index = pd.to_datetime(["2019-01-01", "2019-01-02"])
+        df = pd.DataFrame(
+            {
+                "a": [1, 2],
+                "": [0.5, np.nan],
+                "nan": [np.nan, np.nan],
+                "text": ["x", "y"],
+            },
+            index=index,
+        )
+
+        test_viz = viz.NVD3TimeSeriesViz(datasource, {"metrics": ["y"]})
+        chart_data = test_viz.to_series(df, classed="shift", title_suffix="1 day ago")
+        self.assertEqual(
+            [(series["key"], series["classed"]) for series in chart_data],
+            [(("a", "1 day ago"), "shift"), (("N/A", "1 day ago"), "shift")],
+        )
+        self.assertEqual(
+            chart_data[0]["values"], [{"x": index[0], "y": 1}, {"x": index[1], "y": 2}]
+        )
+        self.assertEqual(chart_data[1]["values"][0], {"x": index[0], "y": 0.5})
+        self.assertTrue(np.isnan(chart_data[1]["values"][1]["y"]))
+
+    @patch.dict(app.config, {"CHART_INCREMENTAL_REFRESH_OVERLAP": 0})
+    def test_get_incremental_df(self):
+        datasource = self.get_datasource_mock()
+        datasource.offset = 0
+        test_viz = viz.NVD3TimeSeriesViz(datasource, {"metrics": ["y"]})
+        test_viz.query = "SELECT 1"
+        cache_value = {
+            "df": pd.DataFrame(
+                {
+                    DTTM_ALIAS: pd.date_range("2020-01-01", periods=7, freq="D"),
+                    "y": [1, 2, 3, 4, 5, 6, 7],
+                }
+            ),
+            "from_dttm": "2020-01-01T00:00:00",
+            "to_dttm": "2020-01-08T00:00:00",
+        }
+        query_obj = {
+            "from_dttm": datetime(2020, 1, 2),
+            "to_dttm": datetime(2020, 1, 9),
+            "extras": {"time_range_endpoints": None},
+            "row_limit": 100,
+        }
+        tail_df = pd.DataFrame(
+            {
+                DTTM_ALIAS: pd.date_range("2020-01-07", periods=2, freq="D"),
+                "y": [70, 80],
+            }
+        )
+
+        with patch.object(test_viz, "get_df", return_value=tail_df) as get_df:
+            df = test_viz.get_incremental_df(query_obj, "key", cache_value)
+        get_df.assert_called_once()
+        window_query_obj = get_df.call_args[0][0]
+        self.assertEqual(window_query_obj["from_dttm"], datetime(2020, 1, 7))
+        self.assertEqual(window_query_obj["to_dttm"], datetime(2020, 1, 9))
+        self.assertEqual(df["y"].tolist(), [2, 3, 4, 5, 6, 70, 80])
+        self.assertEqual(df[DTTM_ALIAS].min(), datetime(2020, 1, 2))
+
+        # the window can't move back in time
+        query_obj["from_dttm"] = datetime(2019, 12, 31)
+        with patch.object(test_viz, "get_df") as get_df:
+            self.assertIsNone(
+                test_viz.get_incremental_df(query_obj, "key", cache_value)
+            )
+        get_df.assert_not_called()
+
+    @patch.dict(app.config, {"CHART_POST_PROCESSING_PUSHDOWN": True})
+    def test_post_processing_pushdown(self):
+        datasource = self.get_datasource_mock()
+        datasource.database.db_engine_spec.allows_window_functions = True
+        form_data = {
+            "metrics": ["y"],
+            "rolling_type": "mean",
+            "rolling_periods": 2,
+            "min_periods": 1,
+        }
+
+        test_viz = viz.NVD3TimeSeriesViz(datasource, form_data)
+        self.assertEqual(
+            test_viz.get_post_processing(),
+            {
+                "rolling_type": "mean",
+                "rolling_periods": 2,
+                "min_periods": 1,
+                "contribution": False,
+            },
+        )
+        df = pd.DataFrame(
+            {
+                DTTM_ALIAS: pd.to_datetime(["2019-01-01", "2019-01-02", "2019-01-03"]),
+                "y": [1.0, 1.5, 2.5],
+            }
+        )
+        # the rolling mean was computed by the database, only rows are trimmed
+        self.assertEqual(test_viz.process_data(df)["y"].tolist(), [1.5, 2.5])
+
+        # rows of series grouped by can span different time buckets
+        test_viz = viz.NVD3TimeSeriesViz(datasource, dict(form_data, groupby=["name"]))
+        self.assertIsNone(test_viz.get_post_processing())
+        # resampling fills the gaps between time buckets first
+        test_viz = viz.NVD3TimeSeriesViz(
+            datasource, dict(form_data, resample_rule="1D", resample_method="sum")
+        )
+        self.assertIsNone(test_viz.get_post_processing())
+
+        test_viz = viz.NVD3TimeSeriesViz(
+            datasource, {"metrics": ["y"], "groupby": ["name"], "contribution": True}
+        )
+        self.assertTrue(test_viz.get_post_processing()["contribution"])
+        self.assertEqual(
+            test_viz.query_obj()["extras"]["post_processing"],
+            test_viz.get_post_processing(),
+        )
+        self.assertIsNone(
+            viz.NVD3TimeSeriesStackedViz(
+                datasource, {"metrics": ["y"], "contribution": True}
+            ).get_post_processing()
+        )
+        # series are sorted by the sums of their values before post processing
+        self.assertIsNone(
+            viz.NVD3TimeSeriesBarViz(datasource, form_data).get_post_processing()
+        )
+
     def test_process_data_resample(self):
         datasource = self.get_datasource_mock()
 